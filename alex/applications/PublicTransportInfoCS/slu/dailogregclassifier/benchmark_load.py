@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Compares the time needed to load the pickled DAILogRegClassifier models and their compiled versions created by
+compile_model.py, and the latency of the first parse after loading, which includes the page faults on the memory-mapped
+arrays of the compiled models.
+"""
+
+from __future__ import unicode_literals
+
+if __name__ == '__main__':
+    import autopath
+
+import argparse
+import time
+
+from alex.applications.PublicTransportInfoCS.preprocessing import PTICSSLUPreprocessing
+from alex.components.asr.utterance import Utterance
+from alex.components.slu.base import CategoryLabelDatabase
+from alex.components.slu.dailrclassifier import DAILogRegClassifier
+
+
+def benchmark_load(name, fn_model, preprocessing, utterance, repeat):
+    load_times = []
+    parse_times = []
+    for i in range(repeat):
+        DAILogRegClassifier.get_fvc.clear()
+
+        start = time.time()
+        slu = DAILogRegClassifier(preprocessing.cldb, preprocessing)
+        slu.load_model(fn_model)
+        if slu.inference_classifiers is None:
+            slu.compile_inference()
+        load_times.append(time.time() - start)
+
+        start = time.time()
+        slu.parse_X_vectorized(utterance)
+        parse_times.append(time.time() - start)
+
+    print "  %-10s load: %8.2f ms  first parse: %8.2f ms" % \
+          (name, 1000.0 * min(load_times), 1000.0 * min(parse_times))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measures the load time of the pickled and the compiled DAILogRegClassifier models.")
+    parser.add_argument('models', nargs='*',
+                        default=['./dailogreg.trn.model', './dailogreg.asr.model', './dailogreg.nbl.model'],
+                        help='the pickled models, their compiled versions must be in the directories with '
+                             'the .compiled suffix')
+    parser.add_argument('--utterance', action="store", default='chtěl bych jet z anděla na florenc',
+                        help='the utterance parsed after loading the model')
+    parser.add_argument('--repeat', action="store", default=3, type=int,
+                        help='the number of measurements, the minimum is reported')
+    args = parser.parse_args()
+
+    cldb = CategoryLabelDatabase('../../data/database.py')
+    preprocessing = PTICSSLUPreprocessing(cldb)
+    utterance = Utterance(args.utterance)
+
+    for fn_model in args.models:
+        print "=" * 120
+        print "Loading", fn_model
+        print "-" * 120
+        benchmark_load('pickle', fn_model, preprocessing, utterance, args.repeat)
+        benchmark_load('compiled', fn_model + '.compiled', preprocessing, utterance, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Compares the per-turn latency of the per-classifier loop (``parse_X_loop``) and the vectorized inference
+(``parse_X_vectorized``) of the DAILogRegClassifier on the PTI test sets. It also checks that both parsers
+produce the same dialogue act confusion networks.
+"""
+
+from __future__ import unicode_literals
+
+import time
+
+if __name__ == '__main__':
+    import autopath
+from alex.applications.PublicTransportInfoCS.preprocessing import PTICSSLUPreprocessing
+from alex.components.asr.utterance import Utterance, UtteranceNBList
+from alex.components.slu.base import CategoryLabelDatabase
+from alex.components.slu.dailrclassifier import DAILogRegClassifier
+from alex.corpustools.wavaskey import load_wavaskey
+
+
+def time_parser(parse, observations):
+    """
+    Parses all observations and returns the parsed confusion networks and the latencies of the individual turns.
+    """
+    # do not let the cache filled by the other parser influence the measurement
+    DAILogRegClassifier.get_fvc.clear()
+
+    confnets = []
+    latencies = []
+    for obs in observations:
+        start = time.time()
+        confnets.append(parse(obs))
+        latencies.append(time.time() - start)
+
+    return confnets, sorted(latencies)
+
+
+def print_latencies(name, latencies):
+    n = len(latencies)
+    print "  %-12s mean: %8.2f ms  median: %8.2f ms  95%%: %8.2f ms  max: %8.2f ms" % \
+          (name,
+           1000.0 * sum(latencies) / n,
+           1000.0 * latencies[n // 2],
+           1000.0 * latencies[int(n * 0.95)],
+           1000.0 * latencies[-1])
+
+
+def benchmark_parse(fn_model, fn_input, constructor, limit=1000):
+    """
+    Measures the per-turn latency of both parsers on the given input.
+
+    :param fn_model: the trained SLU model
+    :param fn_input: the observations in the wavaskey format
+    :param constructor: the class of the observations
+    :param limit: the maximum number of observations to parse
+    """
+    print "=" * 120
+    print "Benchmarking", fn_model, "on", fn_input
+    print "-" * 120
+
+    cldb = CategoryLabelDatabase('../../data/database.py')
+    preprocessing = PTICSSLUPreprocessing(cldb)
+    slu = DAILogRegClassifier(cldb, preprocessing)
+    slu.load_model(fn_model)
+
+    observations = load_wavaskey(fn_input, constructor, limit=limit).values()
+
+    confnets_loop, latencies_loop = time_parser(slu.parse_X_loop, observations)
+    confnets_vectorized, latencies_vectorized = time_parser(slu.parse_X_vectorized, observations)
+
+    print "  Classifiers:", len(slu.trained_classifiers)
+    print "  Features:   ", len(slu.inference_features_mapping)
+    print "  Turns:      ", len(observations)
+    print_latencies('loop', latencies_loop)
+    print_latencies('vectorized', latencies_vectorized)
+    print "  Speed-up:    %.2fx" % (sum(latencies_loop) / sum(latencies_vectorized))
+
+    mismatches = 0
+    for cn_loop, cn_vectorized in zip(confnets_loop, confnets_vectorized):
+        if len(cn_loop) != len(cn_vectorized) or \
+                any(dai not in cn_vectorized or abs(p - cn_vectorized.get_prob(dai)) > 1e-9 for p, dai in cn_loop):
+            mismatches += 1
+    print "  Mismatching confusion networks:", mismatches
+
+
+if __name__ == "__main__":
+    benchmark_parse('./dailogreg.trn.model', '../test.trn', Utterance)
+    benchmark_parse('./dailogreg.asr.model', '../test.asr', Utterance)
+    benchmark_parse('./dailogreg.nbl.model', '../test.nbl', UtteranceNBList)
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Converts the pickled DAILogRegClassifier models into the compiled format which is memory-mapped when it is loaded
+(see DAILogRegClassifier.save_compiled_model). The compiled model can be used in the configuration instead of
+the pickled one, the directory is passed as the model file name.
+"""
+
+from __future__ import unicode_literals
+
+if __name__ == '__main__':
+    import autopath
+
+import argparse
+
+from alex.components.slu.dailrclassifier import DAILogRegClassifier
+
+
+def compile_model(fn_model, dir_compiled):
+    slu = DAILogRegClassifier(None, None)
+    slu.load_model(fn_model)
+    slu.save_compiled_model(dir_compiled)
+
+    print "Compiled", fn_model, "into", dir_compiled
+    print "  Classifiers:", len(slu.inference_classifiers)
+    print "  Features:   ", slu.inference_weights.shape[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Converts the pickled DAILogRegClassifier models into the compiled memory-mapped format.")
+    parser.add_argument('models', nargs='*',
+                        default=['./dailogreg.trn.model.all', './dailogreg.asr.model.all', './dailogreg.nbl.model.all',
+                                 './dailogreg.trn.model', './dailogreg.asr.model', './dailogreg.nbl.model'],
+                        help='the pickled models, the compiled models are stored in the directories with '
+                             'the .compiled suffix')
+    args = parser.parse_args()
+
+    for fn_model in args.models:
+        compile_model(fn_model, fn_model + '.compiled')
+
+
+if __name__ == '__main__':
+    main()
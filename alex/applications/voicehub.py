@@ -17,6 +17,7 @@ from alex.components.hub.nlg import NLG
 from alex.components.hub.tts import TTS
 from alex.components.hub.messages import Command, DMDA, ASRHyp, TTSText
 from alex.components.hub.calldb import CallDB
+from alex.components.hub.ringbuffer import AudioRingBuffer
 
 
 class VoiceHub(Hub):
@@ -49,11 +50,19 @@ class VoiceHub(Hub):
             cfg = self.cfg
 
             vio_commands, vio_child_commands = multiprocessing.Pipe()  # used to send commands to VoipIO
-            vio_record, vio_child_record = multiprocessing.Pipe()      # I read from this connection recorded audio
             vio_play, vio_child_play = multiprocessing.Pipe()          # I write in audio to be played
 
             vad_commands, vad_child_commands = multiprocessing.Pipe()   # used to send commands to VAD
-            vad_audio_out, vad_child_audio_out = multiprocessing.Pipe() # used to read output audio from VAD
+
+            if cfg['Hub']['shared_memory_audio']:
+                # the recorded audio is passed from VoipIO to VAD and from VAD to ASR through shared memory
+                vio_record = vio_child_record = AudioRingBuffer(cfg)
+                vad_audio_out = vad_child_audio_out = AudioRingBuffer(cfg)
+                audio_connections = []
+            else:
+                vio_record, vio_child_record = multiprocessing.Pipe()       # I read from this connection recorded audio
+                vad_audio_out, vad_child_audio_out = multiprocessing.Pipe() # used to read output audio from VAD
+                audio_connections = [vio_record, vio_child_record, vad_audio_out, vad_child_audio_out]
 
             asr_commands, asr_child_commands = multiprocessing.Pipe()          # used to send commands to ASR
             asr_hypotheses_out, asr_child_hypotheses = multiprocessing.Pipe()  # used to read ASR hypotheses
@@ -72,13 +81,11 @@ class VoiceHub(Hub):
             command_connections = [vio_commands, vad_commands, asr_commands, slu_commands,
                                    dm_commands, nlg_commands, tts_commands]
 
-            non_command_connections = [vio_record, vio_child_record,
-                                       vio_play, vio_child_play,
-                                       vad_audio_out, vad_child_audio_out,
-                                       asr_hypotheses_out, asr_child_hypotheses,
-                                       slu_hypotheses_out, slu_child_hypotheses,
-                                       dm_actions_out, dm_child_actions,
-                                       nlg_text_out, nlg_child_text]
+            non_command_connections = audio_connections + [vio_play, vio_child_play,
+                                                           asr_hypotheses_out, asr_child_hypotheses,
+                                                           slu_hypotheses_out, slu_child_hypotheses,
+                                                           dm_actions_out, dm_child_actions,
+                                                           nlg_text_out, nlg_child_text]
 
             vio = self.voice_io_cls(self.cfg, vio_child_commands, vio_child_record, vio_child_play, self.close_event)
             vad = VAD(self.cfg, vad_child_commands, vio_record, vad_child_audio_out, self.close_event)
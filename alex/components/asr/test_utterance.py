@@ -92,6 +92,8 @@ class TestUtteranceConfusionNetwork(unittest.TestCase):
         correct_nblist.add(A1*B1*C3, Utterance("A1 B1 C3"))
         correct_nblist.add(A1*B3*C2, Utterance("A1 B3 C2"))
         correct_nblist.add(A1*B2*C3, Utterance("A1 B2 C3"))
+        correct_nblist.add(A2*B1*C1, Utterance("A2 B1 C1"))
+        correct_nblist.add(A3*B1*C1, Utterance("A3 B1 C1"))
         correct_nblist.merge()
         correct_nblist.add_other()
 
@@ -115,7 +117,16 @@ class TestUtteranceConfusionNetwork(unittest.TestCase):
         s.append(unicode(correct_nblist))
         s.append("")
 
-        self.assertEqual(unicode(gen_nblist), unicode(correct_nblist))
+        # the probabilities of the hypotheses are computed from their log probabilities
+        self.assertEqual([utt for p, utt in gen_nblist.n_best], [utt for p, utt in correct_nblist.n_best],
+                         '\n'.join(s))
+        for (p, utt), (correct_p, correct_utt) in zip(gen_nblist.n_best, correct_nblist.n_best):
+            self.assertAlmostEqual(p, correct_p)
+
+        # the hypotheses less probable than prune_prob are not generated
+        gen_nblist = confnet.get_utterance_nblist(10, prune_prob=0.05)
+        self.assertEqual([utt for p, utt in gen_nblist.n_best], [utt for p, utt in correct_nblist.n_best[:5]] +
+                                                                [Utterance('_other_')])
 
     def test_repr_basic(self):
         A1, A2, A3 = 0.90, 0.05, 0.05
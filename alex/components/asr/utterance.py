@@ -8,12 +8,13 @@ from __future__ import unicode_literals
 import copy
 import re
 from collections import namedtuple
-from itertools import izip, product
+from itertools import islice, izip, product
+from math import exp
 from operator import add, itemgetter, mul
 
 from alex.components.slu.exceptions import SLUException
 from alex.corpustools.wavaskey import load_wavaskey, save_wavaskey
-from alex.ml.hypothesis import Hypothesis, NBList
+from alex.ml.hypothesis import Hypothesis, NBList, gen_nbest_indices
 from alex.ml.exceptions import NBListException
 from alex.utils import text
 from alex.utils.text import Escaper
@@ -646,6 +647,12 @@ class UtteranceNBList(ASRHypothesis, NBList):
         """
         return self.get_best()
 
+    def _fact_key(self, fact):
+        # Utterance defines __eq__ but not __hash__, the utterances are equal iff they have the same words
+        if isinstance(fact, basestring):
+            return tuple(fact.split())
+        return tuple(fact)
+
     def get_best(self):
         if self.n_best[0][1] == '_other_' and len(self.n_best) > 1:
             return self.n_best[1][1]
@@ -1498,6 +1505,18 @@ class UtteranceConfusionNetwork(ASRHypothesis, Abstracted):
 
         return Utterance(' '.join(s))
 
+    # FIXME Make this method aware of _long_links.
+    def gen_utterance_nbest(self):
+        """Generates the utterance hypotheses from the most probable to the least probable one.
+
+        The hypotheses are expanded lazily, so the caller can stop when it has got enough of them.
+        It assumes that the confusion network is sorted.
+
+        :return: an iterator over (probability, utterance) tuples
+        """
+        for log_prob, hyp_index in gen_nbest_indices([[p for p, word in alts] for alts in self._cn]):
+            yield exp(log_prob), self.get_hyp_index_utterance(hyp_index)
+
     # FIXME Make this method aware of _long_links.
     def get_utterance_nblist(self, n=10, prune_prob=0.005):
         """Parses the confusion network and generates n best hypotheses.
@@ -1510,37 +1529,12 @@ class UtteranceConfusionNetwork(ASRHypothesis, Abstracted):
 
         """
 
-        open_hyp = []
-        closed_hyp = {}
-
-        # create index for the best hypothesis
-        best_hyp = tuple([0] * len(self._cn))
-        best_prob = self.get_prob(best_hyp)
-        open_hyp.append((best_prob, best_hyp))
-
-        i = 0
-        while open_hyp and i < n:
-            i += 1
-
-            current_prob, current_hyp_index = open_hyp.pop(0)
-
-            if current_hyp_index not in closed_hyp:
-                # process only those hypotheses which were not processed so far
-
-                closed_hyp[current_hyp_index] = current_prob
-
-                # print "current_prob, current_hyp_index:", current_prob,
-                # current_hyp_index
-
-                for hyp_index in self.get_next_worse_candidates(current_hyp_index):
-                    prob = self.get_prob(hyp_index)
-                    open_hyp.append((prob, hyp_index))
-
-                open_hyp.sort(reverse=True)
-
         nblist = UtteranceNBList()
-        for idx in closed_hyp:
-            nblist.add(closed_hyp[idx], self.get_hyp_index_utterance(idx))
+        for prob, utterance in islice(self.gen_utterance_nbest(), n):
+            if prob < prune_prob:
+                # the following hypotheses are even less probable
+                break
+            nblist.add(prob, utterance)
 
         # print nblist
         # print
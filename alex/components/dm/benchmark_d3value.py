@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Measures the time of the operations of the dialogue state update on a slot with many values, e.g. a stop, tracked by
+D3DiscreteValue and by D3ArrayDiscreteValue.
+
+The slot starts either as a new slot of a dialogue, with the value 'none' only, or with a distribution over all its
+values. In every turn, the slot is scaled and a few values observed by SLU are added to it, then it is normalised, one
+value is denied and the most probable values are looked up as the dialogue state update and the policy do. At the end
+of the turn, the slot is copied to the turn history.
+"""
+
+if __name__ == '__main__':
+    import autopath
+
+import argparse
+import time
+
+from copy import deepcopy
+
+import numpy as np
+
+from alex.components.dm.dddstate import D3DiscreteValue, D3ArrayDiscreteValue, D3ValueVocabulary
+
+
+def benchmark(name, value, values, n_turns):
+    random = np.random.RandomState(0)
+
+    history = []
+    turn_times = []
+    for turn in range(n_turns):
+        observed = [values[i] for i in random.randint(len(values), size=5)]
+        probs = random.dirichlet(np.ones(len(observed)))
+
+        start = time.time()
+
+        value.scale(0.5)
+        for v, p in zip(observed, probs):
+            value.add(v, 0.5 * float(p))
+        value.normalise()
+        value.distribute(observed[0], 0.5)
+        value.mph()
+        value.tmphs()
+        history.append(deepcopy(value))
+
+        turn_times.append(time.time() - start)
+
+    print "  %-12s mean turn: %10.3f ms  max turn: %10.3f ms  most probable value: %s" % \
+          (name, 1000.0 * np.mean(turn_times), 1000.0 * np.max(turn_times), value.mph()[1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures the time of the operations on a slot per dialogue turn.")
+    parser.add_argument('--values', action="store", default=5000, type=int,
+                        help='the number of values of the slot')
+    parser.add_argument('--turns', action="store", default=20, type=int,
+                        help='the number of dialogue turns')
+    args = parser.parse_args()
+
+    values = ['none'] + ['stop%d' % i for i in range(args.values)]
+    priors = [("a new slot", {'none': 1.0}),
+              ("a distribution over all values", dict((v, 1.0 / len(values)) for v in values))]
+
+    print "Values: %d, turns: %d" % (args.values, args.turns)
+    for prior_name, prior in priors:
+        print "The slot starts as %s:" % prior_name
+        benchmark('dictionary', D3DiscreteValue(prior), values, args.turns)
+        benchmark('vectorized', D3ArrayDiscreteValue(prior, vocabulary=D3ValueVocabulary(values)), values,
+                  args.turns)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,26 +4,39 @@
 from __future__ import unicode_literals
 from collections import defaultdict
 from copy import deepcopy
+from itertools import count
+
+import numpy as np
 
 from alex.components.dm.base import DiscreteValue, DialogueState
 from alex.components.dm.exceptions import DeterministicDiscriminativeDialogueStateException
 from alex.components.slu.da import DialogueAct, DialogueActItem, DialogueActConfusionNetwork
 
+# every change of a D3DiscreteValue gets a new version from this counter, so the versions are unique across
+# all instances and a changed or a replaced slot can be detected by comparing the versions
+_versions = count(1)
+
 
 class D3DiscreteValue(DiscreteValue):
     """This is a simple implementation of a probabilistic slot. It serves for the case of simple MDP approach or
     UFAL DSTC 1.0-like dialogue state deterministic update.
+
+    The ``version`` of the slot changes whenever its distribution is changed by any of its methods.
     """
 
     def __init__(self, values={}, name="", desc=""):
         self.name = name
         self.desc = desc
+        self.version = next(_versions)
 
         if values:
             self.values = defaultdict(float, values)
         else:
             self.values = defaultdict(float, {'none': 1.0, })
 
+    def _changed(self):
+        self.version = next(_versions)
+
     def __str__(self):
         return unicode(self).encode('ascii', 'replace')
 
@@ -34,6 +47,9 @@ class D3DiscreteValue(DiscreteValue):
         return unicode(self.items())
 
     def __getitem__(self, value):
+        if value not in self.values:
+            # the default probability is added to the values
+            self._changed()
         return self.values[value]
 
     def get(self, value, default_prob):
@@ -47,6 +63,7 @@ class D3DiscreteValue(DiscreteValue):
 
     def reset(self):
         self.values = defaultdict(float, {'none': 1.0, })
+        self._changed()
 
     def set(self, value, prob=None):
         """This function sets a probability of a specific value.
@@ -61,6 +78,8 @@ class D3DiscreteValue(DiscreteValue):
         else:
             raise DeterministicDiscriminativeDialogueStateException('Unsupported D3DiscreteValue set value.')
 
+        self._changed()
+
     def normalise(self):
         """This function normalises the sum of all probabilities to 1.0"""
 
@@ -74,16 +93,21 @@ class D3DiscreteValue(DiscreteValue):
             for value in self.values:
                 self.values[value] /= s
 
+        self._changed()
+
     def scale(self, weight):
         """This function scales each probability by the weigh.t"""
 
         for value in self.values:
             self.values[value] *= weight
 
+        self._changed()
+
     def add(self, value, prob):
         """This function adds probability to the given value."""
 
         self.values[value] += prob
+        self._changed()
 
     def distribute(self, value, dist_prob):
         """This function distributes a portion of probability mass assigned to the ``value`` to other values
@@ -182,11 +206,333 @@ class D3DiscreteValue(DiscreteValue):
         pass
 
 
+class D3ValueVocabulary(object):
+    """An append-only mapping of the values of a slot to the positions in the probability vectors of
+    D3ArrayDiscreteValue. The vocabulary of a slot is shared by all its copies and it only grows, therefore
+    the positions of the values never change.
+    """
+
+    def __init__(self, values=()):
+        self.values = []
+        self.index = {}
+
+        for value in values:
+            self.intern(value)
+
+    def __len__(self):
+        return len(self.values)
+
+    def intern(self, value):
+        """Returns the position of the value, the value is added to the vocabulary if it is not there yet."""
+        try:
+            return self.index[value]
+        except KeyError:
+            self.index[value] = len(self.values)
+            self.values.append(value)
+            return self.index[value]
+
+
+class D3ArrayDiscreteValue(D3DiscreteValue):
+    """This is an implementation of a probabilistic slot with the same interface as D3DiscreteValue which stores
+    the probabilities in a numpy vector indexed by a vocabulary of the values of the slot. It is meant for the slots
+    with large sets of values, e.g. the stops, for which the operations over all values, such as normalise(), scale(),
+    distribute() or mph(), are computed by numpy instead of looping over a dictionary.
+
+    The vector covers all values of the vocabulary, but only the values which were set or accessed by the methods of
+    the slot are its values, the others are masked out by the ``present`` vector, so the behaviour is the same as the
+    behaviour of D3DiscreteValue. The only difference is that the ties in mph() and tmphs() are broken by
+    the order of the values in the vocabulary instead of the order of a dictionary.
+
+    A copy stores only the positions and the probabilities of the values of the slot, e.g. the copies of the slots in
+    the turn history. The vectors of a copy are rebuilt when the copy is used.
+    """
+
+    def __init__(self, values={}, name="", desc="", vocabulary=None):
+        self.name = name
+        self.desc = desc
+        self.vocabulary = vocabulary if vocabulary is not None else D3ValueVocabulary(['none'])
+        self._probs = np.zeros(len(self.vocabulary))
+        self._present = np.zeros(len(self.vocabulary), dtype=bool)
+        self._sparse = None
+        self.version = next(_versions)
+
+        self._set_values(values if values else {'none': 1.0, })
+
+    def __deepcopy__(self, memo):
+        # the vocabulary is shared by the copies, the sparse values are never changed, so they are shared too
+        value = object.__new__(type(self))
+        value.__dict__.update(self.__dict__)
+        if self._sparse is None:
+            indexes = np.flatnonzero(self._present)
+            value._sparse = (indexes, self._probs[indexes])
+        value._probs = value._present = None
+        return value
+
+    def _densify(self):
+        indexes, probs = self._sparse
+        self._probs = np.zeros(len(self.vocabulary))
+        self._probs[indexes] = probs
+        self._present = np.zeros(len(self.vocabulary), dtype=bool)
+        self._present[indexes] = True
+        self._sparse = None
+
+    @property
+    def probs(self):
+        """The vector of the probabilities of the values of the vocabulary."""
+        if self._sparse is not None:
+            self._densify()
+        return self._probs
+
+    @probs.setter
+    def probs(self, probs):
+        if self._sparse is not None:
+            self._densify()
+        self._probs = probs
+
+    @property
+    def present(self):
+        """The vector marking the values of the vocabulary which are the values of the slot."""
+        if self._sparse is not None:
+            self._densify()
+        return self._present
+
+    @present.setter
+    def present(self, present):
+        if self._sparse is not None:
+            self._densify()
+        self._present = present
+
+    @property
+    def values(self):
+        """A dictionary with the probabilities of the values. Its changes are not propagated to the slot."""
+        return defaultdict(float, self._iter_items())
+
+    def _iter_items(self):
+        vocabulary = self.vocabulary.values
+        for i in np.flatnonzero(self.present):
+            yield vocabulary[i], float(self.probs[i])
+
+    def _index(self, value):
+        """Returns the position of the value in the probability vector and makes it one of the values of the slot.
+
+        The vectors may be reallocated, therefore the position must be obtained before indexing them.
+        """
+        i = self.vocabulary.intern(value)
+
+        if i >= len(self.probs):
+            # the vocabulary grew since the vectors were allocated
+            size = len(self.vocabulary)
+            self.probs = np.concatenate([self.probs, np.zeros(size - len(self.probs))])
+            self.present = np.concatenate([self.present, np.zeros(size - len(self.present), dtype=bool)])
+
+        self.present[i] = True
+        return i
+
+    def _set_values(self, values):
+        self.probs[:] = 0.0
+        self.present[:] = False
+
+        for value, prob in values.iteritems():
+            i = self._index(value)
+            self.probs[i] = prob
+
+    def __getitem__(self, value):
+        i = self.vocabulary.index.get(value)
+        if i is None or i >= len(self.present) or not self.present[i]:
+            # the default probability is added to the values
+            i = self._index(value)
+            self._changed()
+        return float(self.probs[i])
+
+    def get(self, value, default_prob):
+        i = self.vocabulary.index.get(value)
+        if i is None or i >= len(self.present) or not self.present[i]:
+            return default_prob
+        return float(self.probs[i])
+
+    def __iter__(self):
+        vocabulary = self.vocabulary.values
+        return iter([vocabulary[i] for i in np.flatnonzero(self.present)])
+
+    def items(self):
+        indexes = np.flatnonzero(self.present)
+        # the stable sort keeps the values with the same probability in the order of the vocabulary
+        indexes = indexes[np.argsort(-self.probs[indexes], kind='mergesort')]
+
+        vocabulary = self.vocabulary.values
+        return [(vocabulary[i], float(self.probs[i])) for i in indexes]
+
+    def reset(self):
+        self._set_values({'none': 1.0, })
+        self._changed()
+
+    def set(self, value, prob=None):
+        """This function sets a probability of a specific value.
+
+        *WARNING* This can lead to un-normalised probabilities.
+        """
+        if isinstance(value, dict) and not prob:
+            # rewrite the complete set of values
+            self._set_values(value)
+        elif isinstance(value, basestring) and isinstance(prob, float):
+            i = self._index(value)
+            self.probs[i] = prob
+        else:
+            raise DeterministicDiscriminativeDialogueStateException('Unsupported D3DiscreteValue set value.')
+
+        self._changed()
+
+    def normalise(self):
+        """This function normalises the sum of all probabilities to 1.0"""
+
+        # the probabilities of the values which are not present are always zero
+        s = self.probs.sum()
+        if s < 1e-9:
+            # this is a backup solution with unknown consequences
+            n = np.count_nonzero(self.present)
+            if n:
+                self.probs[self.present] = 1.0 / n
+        else:
+            self.probs /= s
+
+        self._changed()
+
+    def scale(self, weight):
+        """This function scales each probability by the weight."""
+
+        self.probs *= weight
+        self._changed()
+
+    def add(self, value, prob):
+        """This function adds probability to the given value."""
+
+        i = self._index(value)
+        self.probs[i] += prob
+        self._changed()
+
+    def distribute(self, value, dist_prob):
+        """This function distributes a portion of probability mass assigned to the ``value`` to other values
+         with a weight ``prob``."""
+
+        i = self._index(value)
+        others = self.present.copy()
+        others[i] = False
+
+        value_prob = self.probs[i]
+        non_value_prob = self.probs[others].sum()
+
+        # first deny the value proportionally to the denied probability
+        self.probs[i] = (1.0 - dist_prob) * value_prob
+
+        # second redistribute the denied probability mass to to other values proportionally to their own probability
+        # if all other values have probability close to zero, then distribute the probability mass uniformly
+        if non_value_prob > 1e-9:
+            self.probs[others] += dist_prob * value_prob * self.probs[others] / non_value_prob
+        elif others.any():
+            self.probs[others] += dist_prob * value_prob / np.count_nonzero(others)
+
+        self._changed()
+
+    def mph(self):
+        """The function returns the most probable value and its probability
+        in a tuple.
+        """
+
+        indexes = np.flatnonzero(self.present)
+        if not len(indexes):
+            return (-1.0, None)
+
+        probs = self.probs[indexes]
+        max_prob = probs.max()
+
+        # the first most probable value which is not 'none' is preferred
+        vocabulary = self.vocabulary.values
+        max_values = [vocabulary[i] for i in indexes[probs == max_prob]]
+        max_value = next((value for value in max_values if value != 'none'), max_values[0])
+
+        return (float(max_prob), max_value)
+
+    def tmphs(self):
+        """This function returns two most probable values and their probabilities.
+
+        The function returns a tuple consisting of two tuples (probability, value).
+
+        :rtype: tuple
+        """
+
+        items = self.topk(2)
+        items += [(None, -1.0)] * (2 - len(items))
+
+        return tuple((prob, value) for value, prob in items)
+
+    def topk(self, k):
+        """Returns the list of at most k most probable values and their probabilities as (value, probability) tuples
+        in the same order as items().
+
+        Only the k most probable values are sorted, therefore it is much faster than items() for the slots with
+        many values.
+        """
+
+        indexes = np.flatnonzero(self.present)
+        probs = self.probs[indexes]
+
+        if k < len(indexes):
+            # all values with the same probability as the k-th one are kept so that the ties are broken by the order
+            # of the vocabulary as in items()
+            kth_prob = -np.partition(-probs, k - 1)[k - 1]
+            indexes = indexes[probs >= kth_prob]
+            probs = self.probs[indexes]
+
+        indexes = indexes[np.argsort(-probs, kind='mergesort')[:k]]
+
+        vocabulary = self.vocabulary.values
+        return [(vocabulary[i], float(self.probs[i])) for i in indexes]
+
+
+class D3Slots(defaultdict):
+    """The slots of the dialogue state. A missing slot is created on its first access as D3ArrayDiscreteValue if
+    the slot has a vocabulary, otherwise as D3DiscreteValue.
+    """
+
+    def __init__(self, vocabularies=None, *args, **kwargs):
+        super(D3Slots, self).__init__(D3DiscreteValue, *args, **kwargs)
+        self.vocabularies = vocabularies if vocabularies is not None else {}
+
+    def __missing__(self, slot):
+        if slot in self.vocabularies:
+            self[slot] = D3ArrayDiscreteValue(vocabulary=self.vocabularies[slot])
+            return self[slot]
+
+        return super(D3Slots, self).__missing__(slot)
+
+    def __reduce__(self):
+        return type(self), (self.vocabularies, ), None, None, self.iteritems()
+
+    def __copy__(self):
+        return type(self)(self.vocabularies, self)
+
+    def __deepcopy__(self, memo):
+        # the vocabularies are shared by the copies
+        slots = type(self)(self.vocabularies)
+        memo[id(self)] = slots
+        for slot, value in self.iteritems():
+            slots[slot] = deepcopy(value, memo)
+        return slots
+
+
 class DeterministicDiscriminativeDialogueState(DialogueState):
     """This is a trivial implementation of a dialogue state and its update.
 
     It uses only the best dialogue act from the input.
     Based on this it updates its state.
+
+    After every update, the user and system dialogue acts, a snapshot of the slots and the set of the slots changed
+    since the previous turn are appended to ``turns``. The snapshots share the copies of the slots which did not
+    change, therefore only the changed slots are copied and compared with the previous turn.
+
+    The slots listed in the ``vectorized_slots`` option are tracked by D3ArrayDiscreteValue with the vocabulary
+    initialised by the values of the slot in the ontology. It is meant for the slots with many values, such as
+    the stops; the vocabularies are kept across the restarts of the state.
     """
     slots = None
 
@@ -199,6 +545,12 @@ class DeterministicDiscriminativeDialogueState(DialogueState):
         self.type = cfg['DM']['DeterministicDiscriminativeDialogueState']['type']
         self.session_logger = cfg['Logging']['session_logger']
         self.system_logger = cfg['Logging']['system_logger']
+
+        self.slot_vocabularies = {}
+        for slot in cfg['DM']['DeterministicDiscriminativeDialogueState'].get('vectorized_slots', []):
+            values = self.ontology['slots'].get(slot, []) if 'slots' in self.ontology else []
+            self.slot_vocabularies[slot] = D3ValueVocabulary(['none'] + sorted(values))
+
         self.restart()
 
     def __unicode__(self):
@@ -271,7 +623,7 @@ class DeterministicDiscriminativeDialogueState(DialogueState):
         Nevertheless, remember the turn history.
         """
         # initialize slots
-        self.slots = defaultdict(D3DiscreteValue)
+        self.slots = D3Slots(self.slot_vocabularies)
         # initialize other variables
         if 'variables' in self.ontology:
             for var_name in self.ontology['variables']:
@@ -321,12 +673,40 @@ class DeterministicDiscriminativeDialogueState(DialogueState):
         self.turn_number += 1
 
         # store the result
-        self.turns.append([deepcopy(user_da), deepcopy(system_da), deepcopy(self.slots)])
+        slots, changed_slots = self._snapshot_slots()
+        self.turns.append([deepcopy(user_da), deepcopy(system_da), slots, changed_slots])
 
         # print the dialogue state if requested
         if self.debug:
             self.system_logger.debug(unicode(self))
 
+    def _snapshot_slots(self):
+        """Returns a copy of the slots and the set of the slots changed since the previous turn.
+
+        The slots which did not change since the previous turn are not copied, the copy from the previous turn is
+        shared instead.
+        """
+        prev_slots = self.turns[-1][2] if self.turns else {}
+
+        slots = D3Slots(self.slot_vocabularies)
+        changed_slots = set()
+        for slot, value in self.slots.iteritems():
+            # dict.get() does not add the missing slots to the previous turn
+            prev_value = dict.get(prev_slots, slot)
+
+            if isinstance(value, D3DiscreteValue):
+                unchanged = isinstance(prev_value, D3DiscreteValue) and prev_value.version == value.version
+            else:
+                unchanged = type(prev_value) is type(value) and prev_value == value
+
+            if unchanged:
+                slots[slot] = prev_value
+            else:
+                slots[slot] = deepcopy(value)
+                changed_slots.add(slot)
+
+        return slots, changed_slots
+
     def _resolve_user_da_in_context(self, user_da, system_da):
         """Resolves and converts meaning of some user dialogue acts
         given the context."""
@@ -614,7 +994,8 @@ class DeterministicDiscriminativeDialogueState(DialogueState):
             cur_slots = self.turns[-1][2]
             prev_slots = self.turns[-2][2]
 
-            for slot in cur_slots:
+            # the values of the other slots are the same as in the previous turn
+            for slot in self.turns[-1][3]:
                 if any([1 for x in ['rh_', 'ch_', 'sh_', "ludait"] if slot.startswith(x)]):
                     continue
 
@@ -649,7 +1030,8 @@ class DeterministicDiscriminativeDialogueState(DialogueState):
             cur_slots = self.turns[-1][2]
             prev_slots = self.turns[-2][2]
 
-            for slot in cur_slots:
+            # the probabilities of the other slots are the same as in the previous turn
+            for slot in self.turns[-1][3]:
                 if not isinstance(cur_slots[slot], D3DiscreteValue):
                     continue
 
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+if __name__ == "__main__":
+    import autopath
+
+import random
+import unittest
+
+from copy import deepcopy
+
+from alex.components.dm import Ontology
+from alex.components.dm.dddstate import D3DiscreteValue, D3ArrayDiscreteValue, D3ValueVocabulary, \
+    DeterministicDiscriminativeDialogueState
+from alex.components.slu.da import DialogueAct, DialogueActItem, DialogueActConfusionNetwork
+from alex.utils.config import Config
+
+
+class NullLogger(object):
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+class TestD3ArrayDiscreteValue(unittest.TestCase):
+    def assertSameValues(self, value, array_value):
+        self.assertEqual(sorted(value), sorted(array_value))
+        for v in value:
+            self.assertAlmostEqual(value.get(v, None), array_value.get(v, None))
+
+    def test_operations(self):
+        rnd = random.Random(0)
+        names = ['none', 'a', 'b', 'c', 'd']
+        vocabulary = D3ValueVocabulary(['none', 'a'])
+
+        for i in range(20):
+            value = D3DiscreteValue()
+            array_value = D3ArrayDiscreteValue(vocabulary=vocabulary)
+
+            for j in range(20):
+                name = rnd.choice(names)
+                op, args = rnd.choice([('add', (name, rnd.random())), ('set', (name, rnd.random())),
+                                       ('scale', (rnd.random(), )), ('normalise', ()),
+                                       ('distribute', (name, rnd.random())), ('__getitem__', (name, ))])
+                getattr(value, op)(*args)
+                getattr(array_value, op)(*args)
+                if rnd.random() < 0.3:
+                    # the copies keep only the values of the slot
+                    array_value = deepcopy(array_value)
+
+                self.assertSameValues(value, array_value)
+                # the ties may be broken differently, therefore only the probabilities are compared
+                self.assertAlmostEqual(value.mph()[0], array_value.mph()[0])
+                for (prob, v), (array_prob, array_v) in zip(value.tmphs(), array_value.tmphs()):
+                    self.assertAlmostEqual(prob, array_prob)
+
+        # the values which were not in the vocabulary were added to it
+        self.assertEqual(sorted(vocabulary.values), sorted(names))
+
+    def test_ties(self):
+        value = D3ArrayDiscreteValue({'none': 0.4, 'b': 0.4, 'a': 0.2},
+                                     vocabulary=D3ValueVocabulary(['none', 'a', 'b']))
+        self.assertEqual(value.mph(), (0.4, 'b'))
+        self.assertEqual(value.items(), [('none', 0.4), ('b', 0.4), ('a', 0.2)])
+        self.assertEqual(value.tmphs(), ((0.4, 'none'), (0.4, 'b')))
+        self.assertEqual(value.topk(1), [('none', 0.4)])
+        self.assertEqual(value.topk(5), value.items())
+
+        value.reset()
+        self.assertEqual(value.tmphs(), ((1.0, 'none'), (-1.0, None)))
+        self.assertEqual(value.values, {'none': 1.0})
+
+    def test_copy(self):
+        value = D3ArrayDiscreteValue({'a': 1.0})
+        copy = deepcopy(value)
+        self.assertIs(copy.vocabulary, value.vocabulary)
+        self.assertEqual(copy.version, value.version)
+
+        copy.add('b', 1.0)
+        self.assertEqual(value.get('b', None), None)
+        self.assertEqual(copy.get('b', None), 1.0)
+        self.assertEqual(value.items(), [('a', 1.0)])
+
+        # the copy stores only the values of the slot until it is used, also when the vocabulary grows meanwhile
+        copy = deepcopy(value)
+        copy_of_copy = deepcopy(copy)
+        self.assertEqual(list(copy._sparse[0]), [value.vocabulary.index['a']])
+        self.assertIs(copy_of_copy._sparse, copy._sparse)
+
+        value.add('c', 0.5)
+        self.assertEqual(copy.items(), [('a', 1.0)])
+        copy.add('c', 2.0)
+        self.assertEqual(copy.items(), [('c', 2.0), ('a', 1.0)])
+        self.assertEqual(copy_of_copy.items(), [('a', 1.0)])
+        self.assertEqual(value.items(), [('a', 1.0), ('c', 0.5)])
+
+
+class TestDeterministicDiscriminativeDialogueState(unittest.TestCase):
+    def setUp(self):
+        cfg = Config.load_configs(config={}, use_default=False, log=False)
+        cfg.update({
+            'DM': {
+                'basic': {'debug': False},
+                'DeterministicDiscriminativeDialogueState': {'type': 'UFAL_DSTC_1.0_approx',
+                                                              'vectorized_slots': ['to_stop']},
+            },
+            'Logging': {'session_logger': NullLogger(), 'system_logger': NullLogger()},
+        })
+
+        ontology = Ontology()
+        ontology.ontology = {
+            'slots': {'from_stop': set(['Central', 'Park']), 'to_stop': set(['Central', 'Park'])},
+            'slot_attributes': {'from_stop': [], 'to_stop': []},
+            'context_resolution': {},
+            'last_talked_about': {},
+        }
+
+        self.ds = DeterministicDiscriminativeDialogueState(cfg, ontology)
+        self.ds.last_system_da = DialogueAct('hello()')
+
+    def update(self, *dais):
+        user_da = DialogueActConfusionNetwork()
+        for prob, dai in dais:
+            user_da.add(prob, DialogueActItem(dai=dai))
+        self.ds.update(user_da, DialogueAct('hello()'))
+
+    def test_version(self):
+        value = D3DiscreteValue()
+        version = value.version
+
+        value.get('a', 0.0)
+        self.assertEqual(value.version, version)
+
+        for change in [lambda: value.add('a', 0.5), lambda: value.normalise(), lambda: value['b'],
+                       lambda: value.distribute('a', 0.5), lambda: value.reset()]:
+            change()
+            self.assertNotEqual(value.version, version)
+            version = value.version
+
+    def test_turn_history(self):
+        self.update((1.0, 'inform(from_stop="Central")'))
+        self.update((1.0, 'inform(to_stop="Park")'))
+
+        prev_slots, cur_slots = self.ds.turns[-2][2], self.ds.turns[-1][2]
+        self.assertIn('to_stop', self.ds.turns[-1][3])
+        self.assertNotIn('from_stop', self.ds.turns[-1][3])
+        # the unchanged slots are shared, the changed ones are copied
+        self.assertIs(prev_slots['from_stop'], cur_slots['from_stop'])
+        self.assertIsNot(cur_slots['to_stop'], self.ds['to_stop'])
+        self.assertEqual(cur_slots['to_stop'].mph(), (1.0, 'Park'))
+        self.assertEqual(self.ds.get_changed_slots(0.5).keys(), ['to_stop'])
+        self.assertTrue(self.ds.has_state_changed(0.5))
+
+        # the changes made between the turns are in the next snapshot
+        self.ds['from_stop'].reset()
+        self.update()
+        self.assertEqual(self.ds.turns[-1][3], set(['from_stop']))
+        self.assertEqual(self.ds.turns[-2][2]['from_stop'].mph(), (1.0, 'Central'))
+        self.assertEqual(self.ds.turns[-1][2]['from_stop'].mph(), (1.0, 'none'))
+        self.assertEqual(self.ds.get_changed_slots(0.5), {})
+        # only the probabilities of the current values are compared
+        self.assertFalse(self.ds.has_state_changed(0.5))
+
+        self.update()
+        self.assertEqual(self.ds.turns[-1][3], set())
+        self.assertFalse(self.ds.has_state_changed(0.1))
+
+    def test_vectorized_slots(self):
+        self.assertIsInstance(self.ds['to_stop'], D3ArrayDiscreteValue)
+        self.assertNotIsInstance(self.ds['from_stop'], D3ArrayDiscreteValue)
+        self.assertEqual(self.ds['to_stop'].vocabulary.values, ['none', 'Central', 'Park'])
+
+        self.update((0.7, 'inform(to_stop="Park")'), (0.2, 'inform(to_stop="Zoo")'))
+        self.assertEqual(self.ds['to_stop'].mph(), (0.7, 'Park'))
+        self.assertIsInstance(self.ds.turns[-1][2]['to_stop'], D3ArrayDiscreteValue)
+        self.assertEqual(self.ds.get_changed_slots(0.5).keys(), ['to_stop'])
+
+        # the vocabulary is kept across the restarts
+        self.ds.restart()
+        self.assertEqual(self.ds['to_stop'].mph(), (1.0, 'none'))
+        self.assertEqual(self.ds['to_stop'].vocabulary.values, ['none', 'Central', 'Park', 'Zoo'])
+
+
+if __name__ == '__main__':
+    unittest.main()
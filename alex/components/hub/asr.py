@@ -16,6 +16,7 @@ from alex.components.asr.exceptions import ASRException
 from alex.components.asr.utterance import UtteranceNBList, UtteranceConfusionNetwork
 from alex.components.hub.messages import Command, Frame, ASRHyp
 from alex.utils.procname import set_proc_name
+from alex.utils.mproc import wait_for_input, LatencyStats
 
 
 class ASR(multiprocessing.Process):
@@ -47,8 +48,8 @@ class ASR(multiprocessing.Process):
             cfg: a Config object specifying the configuration to use
             commands: our end of a pipe (multiprocessing.Pipe) for receiving
                 commands
-            audio_in: our end of a pipe (multiprocessing.Pipe) for receiving
-                audio frames (from VAD)
+            audio_in: our end of a pipe (multiprocessing.Pipe) or an
+                AudioRingBuffer for receiving audio frames (from VAD)
             asr_hypotheses_out: our end of a pipe (multiprocessing.Pipe) for
                 sending ASR hypotheses
 
@@ -72,6 +73,8 @@ class ASR(multiprocessing.Process):
 
         self.recognition_on = False
 
+        self.latency_stats = LatencyStats('ASR', self.cfg['Hub']['latency_report_interval'])
+
     def recv_input_locally(self):
         """ Copy all input from input connections into local queue objects.
 
@@ -84,6 +87,7 @@ class ASR(multiprocessing.Process):
 
         while self.audio_in.poll():
             frame = self.audio_in.recv()
+            self.latency_stats.add('VAD->ASR', frame.get_age())
             self.local_audio_in.append(frame)
 
     def process_pending_commands(self):
@@ -241,7 +245,9 @@ class ASR(multiprocessing.Process):
                     print 'Received close event in: %s' % multiprocessing.current_process().name
                     return
 
-                time.sleep(self.cfg['Hub']['main_loop_sleep_time'])
+                if not self.local_audio_in:
+                    # Wait until a command or audio arrives.
+                    wait_for_input([self.commands, self.audio_in], self.cfg['Hub']['main_loop_max_wait_time'])
 
                 s = (time.time(), time.clock())
 
@@ -255,6 +261,10 @@ class ASR(multiprocessing.Process):
                 for i in range(self.cfg['ASR']['n_rawa']):
                     self.read_audio_write_asr_hypotheses()
 
+                report = self.latency_stats.pop_report()
+                if report:
+                    self.system_logger.info(report)
+
                 d = (time.time() - s[0], time.clock() - s[1])
                 if d[0] > 0.200:
                     print "EXEC Time inner loop: ASR t = {t:0.4f} c = {c:0.4f}\n".format(t=d[0], c=d[1])
@@ -15,6 +15,7 @@ from alex.components.slu.da import DialogueAct, DialogueActItem, DialogueActConf
 from alex.components.hub.messages import Command, SLUHyp, DMDA
 from alex.components.dm.common import dm_factory, get_dm_type
 from alex.components.dm.exceptions import DMException
+from alex.utils.cache import pop_cache_report
 from alex.utils.procname import set_proc_name
 
 
@@ -293,6 +294,10 @@ class DM(multiprocessing.Process):
                 # process the incoming SLU hypothesis
                 self.read_slu_hypotheses_write_dialogue_act()
 
+                report = pop_cache_report(self.cfg['Hub']['latency_report_interval'])
+                if report:
+                    self.cfg['Logging']['system_logger'].info(report)
+
                 # Print out the execution time if it took longer than the threshold.
                 d = (time.time() - s[0], time.clock() - s[1])
                 if d[0] > 0.200:
@@ -29,6 +29,11 @@ class Message(InstanceID):
         return '{dt}-{tz}'.format(dt=self.time.strftime('%Y-%m-%d-%H-%M-%S.%f'),
             tz=time.tzname[time.localtime().tm_isdst])
 
+    def get_age(self):
+        """ Return the time in seconds elapsed since the message was created.
+        """
+        return (datetime.now() - self.time).total_seconds()
+
 class Command(Message):
     def __init__(self, command, source=None, target=None):
         Message.__init__(self, source, target)
@@ -107,3 +112,20 @@ class Frame(Message):
 
     def __getitem__(self, key):
         return self.payload[key]
+
+
+class RawFrame(Frame):
+    """ A frame of audio received from the AudioRingBuffer.
+
+    It does not get an instance id and a creation time so that it is cheap to create one for every chunk of audio.
+    Its age is the length of the audio which was buffered after it when it was read from the buffer.
+    """
+    def __init__(self, payload, age=0.0):
+        self.payload = payload
+        self.age = age
+
+    def __unicode__(self):
+        return "RawFrame Len: %d " % len(self.payload)
+
+    def get_age(self):
+        return self.age
@@ -10,6 +10,7 @@ from alex.components.hub.messages import Command, DMDA, TTSText
 from alex.components.dm.exceptions import DMException
 
 from alex.utils.procname import set_proc_name
+from alex.utils.mproc import wait_for_input, LatencyStats
 
 
 class NLG(multiprocessing.Process):
@@ -32,6 +33,8 @@ class NLG(multiprocessing.Process):
         nlg_type = get_nlg_type(cfg)
         self.nlg = nlg_factory(nlg_type, cfg)
 
+        self.latency_stats = LatencyStats('NLG', self.cfg['Hub']['latency_report_interval'])
+
     def process_da(self, da):
         if da != "silence()":
             text = self.nlg.generate(da)
@@ -104,6 +107,7 @@ class NLG(multiprocessing.Process):
     def read_dialogue_act_write_text(self):
         if self.dialogue_act_in.poll():
             data_da = self.dialogue_act_in.recv()
+            self.latency_stats.add('DM->NLG', data_da.get_age())
 
             if isinstance(data_da, DMDA):
                 self.process_da(data_da.da)
@@ -123,7 +127,8 @@ class NLG(multiprocessing.Process):
                     print 'Received close event in: %s' % multiprocessing.current_process().name
                     return
 
-                time.sleep(self.cfg['Hub']['main_loop_sleep_time'])
+                # Wait until a command or a dialogue act arrives.
+                wait_for_input([self.commands, self.dialogue_act_in], self.cfg['Hub']['main_loop_max_wait_time'])
 
                 s = (time.time(), time.clock())
 
@@ -134,6 +139,10 @@ class NLG(multiprocessing.Process):
                 # process the incoming DM dialogue acts
                 self.read_dialogue_act_write_text()
 
+                report = self.latency_stats.pop_report()
+                if report:
+                    self.cfg['Logging']['system_logger'].info(report)
+
                 d = (time.time() - s[0], time.clock() - s[1])
                 if d[0] > 0.200:
                     print "EXEC Time inner loop: NLG t = {t:0.4f} c = {c:0.4f}\n".format(t=d[0], c=d[1])
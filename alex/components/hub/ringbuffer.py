@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# This code is PEP8-compliant. See http://www.python.org/dev/peps/pep-0008.
+
+import ctypes
+import errno
+import fcntl
+import multiprocessing
+import os
+
+from collections import deque
+
+from alex.components.hub.messages import Frame, RawFrame
+
+
+class AudioRingBuffer(object):
+    """
+    AudioRingBuffer passes recorded audio from one process to another through a ring buffer of raw PCM samples
+    in shared memory. It is an alternative to sending pickled Frame objects through a multiprocessing.Pipe.
+
+    The commands (e.g. speech_start() and speech_end()) are sent through a side channel together with the position
+    in the audio stream where they were sent. Therefore, the consumer receives the commands and the audio in the same
+    order as they were sent.
+
+    The object implements the send(), poll(), recv() and fileno() methods of the multiprocessing connections so that
+    the components can use it instead of the pipe end for the audio. There must be exactly one producer process
+    and one consumer process.
+
+    The producer never blocks. If the consumer lags so much that the buffer is full, the new audio is dropped and
+    the number of overruns is incremented.
+
+    """
+
+    def __init__(self, cfg, buffer_time=10.0):
+        """
+        Arguments:
+            cfg: a Config object specifying the configuration to use
+            buffer_time: the length of the audio in seconds which can be stored in the buffer
+
+        """
+        self.frame_size = cfg['Audio']['samples_per_frame'] * 2
+        self.bytes_per_second = cfg['Audio']['sample_rate'] * 2.0
+        self.size = int(buffer_time * self.bytes_per_second)
+
+        self.buffer = multiprocessing.RawArray(ctypes.c_char, self.size)
+
+        # positions are the total numbers of written and read bytes, the position in the buffer is modulo its size
+        self.write_pos = multiprocessing.RawValue(ctypes.c_longlong, 0)
+        self.read_pos = multiprocessing.RawValue(ctypes.c_longlong, 0)
+        self.overruns = multiprocessing.RawValue(ctypes.c_longlong, 0)
+
+        # the side channel for the commands
+        self.commands_in, self.commands_out = multiprocessing.Pipe(duplex=False)
+        self.local_commands = deque()
+
+        # every write wakes up the consumer waiting on fileno()
+        self.notify_in, self.notify_out = os.pipe()
+        for fd in [self.notify_in, self.notify_out]:
+            fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+
+    def _notify(self):
+        try:
+            os.write(self.notify_out, b'\0')
+        except OSError as e:
+            # the pipe is full, so the consumer will be woken up anyway
+            if e.errno != errno.EAGAIN:
+                raise
+
+    def _clear_notifications(self):
+        try:
+            while os.read(self.notify_in, 4096):
+                pass
+        except OSError as e:
+            if e.errno != errno.EAGAIN:
+                raise
+
+    def _recv_commands(self):
+        while self.commands_in.poll():
+            self.local_commands.append(self.commands_in.recv())
+
+    def _next_command_pos(self):
+        if self.local_commands:
+            return self.local_commands[0][0]
+
+        return None
+
+    def write(self, data):
+        """Writes raw PCM data into the buffer.
+
+        Returns False if the data was dropped because the buffer is full.
+        """
+        n = len(data)
+        write_pos = self.write_pos.value
+
+        if n > self.size - (write_pos - self.read_pos.value):
+            self.overruns.value += 1
+            return False
+
+        start = write_pos % self.size
+        first = min(n, self.size - start)
+        ctypes.memmove(ctypes.addressof(self.buffer) + start, data, first)
+        if first < n:
+            ctypes.memmove(ctypes.addressof(self.buffer), data[first:], n - first)
+
+        # publish the data only after it was copied
+        self.write_pos.value = write_pos + n
+        self._notify()
+
+        return True
+
+    def read(self, n):
+        """Reads at most n bytes of raw PCM data from the buffer.
+
+        It never reads past the position of the next pending command.
+        """
+        read_pos = self.read_pos.value
+        end_pos = self.write_pos.value
+        next_command_pos = self._next_command_pos()
+        if next_command_pos is not None:
+            end_pos = min(end_pos, next_command_pos)
+
+        n = min(n, end_pos - read_pos)
+        if n <= 0:
+            return b''
+
+        start = read_pos % self.size
+        first = min(n, self.size - start)
+        data = self.buffer[start:start + first]
+        if first < n:
+            data += self.buffer[0:n - first]
+
+        self.read_pos.value = read_pos + n
+
+        return data
+
+    def get_buffered_time(self):
+        """Returns the length in seconds of the audio waiting in the buffer."""
+        return (self.write_pos.value - self.read_pos.value) / self.bytes_per_second
+
+    def send(self, obj):
+        """Sends a Frame or a Command.
+
+        Only the payload of the frames is stored in the shared memory.
+        """
+        if isinstance(obj, Frame):
+            self.write(obj.payload)
+        else:
+            self.commands_out.send((self.write_pos.value, obj))
+            self._notify()
+
+    def poll(self):
+        """Returns whether there is a command or audio to be received."""
+        # clear the notifications first so that no notification of a new write is lost
+        self._clear_notifications()
+        self._recv_commands()
+
+        read_pos = self.read_pos.value
+        next_command_pos = self._next_command_pos()
+        if next_command_pos is not None and next_command_pos <= read_pos:
+            return True
+
+        return self.write_pos.value > read_pos
+
+    def recv(self):
+        """Receives the next Command or a RawFrame of at most one frame of audio.
+
+        The poll() method must be called before to check that there is something to be received.
+        """
+        self._recv_commands()
+
+        next_command_pos = self._next_command_pos()
+        if next_command_pos is not None and next_command_pos <= self.read_pos.value:
+            return self.local_commands.popleft()[1]
+
+        data = self.read(self.frame_size)
+
+        return RawFrame(data, self.get_buffered_time())
+
+    def fileno(self):
+        """Returns the file descriptor which becomes readable when something is sent."""
+        return self.notify_in
@@ -9,7 +9,9 @@ from alex.components.slu.da import DialogueActNBList, DialogueActConfusionNetwor
 from alex.components.hub.messages import Command, ASRHyp, SLUHyp
 from alex.components.slu.common import slu_factory
 from alex.components.slu.exceptions import SLUException
+from alex.utils.cache import pop_cache_report
 from alex.utils.procname import set_proc_name
+from alex.utils.mproc import wait_for_input, LatencyStats
 
 
 class SLU(multiprocessing.Process):
@@ -53,6 +55,8 @@ class SLU(multiprocessing.Process):
         # Load the SLU.
         self.slu = slu_factory(cfg)
 
+        self.latency_stats = LatencyStats('SLU', self.cfg['Hub']['latency_report_interval'])
+
     def process_pending_commands(self):
         """
         Process all pending commands.
@@ -91,6 +95,7 @@ class SLU(multiprocessing.Process):
     def read_asr_hypotheses_write_slu_hypotheses(self):
         if self.asr_hypotheses_in.poll():
             data_asr = self.asr_hypotheses_in.recv()
+            self.latency_stats.add('ASR->SLU', data_asr.get_age())
 
             if isinstance(data_asr, ASRHyp):
                 slu_hyp = self.slu.parse(data_asr.hyp)
@@ -140,7 +145,8 @@ class SLU(multiprocessing.Process):
                     print 'Received close event in: %s' % multiprocessing.current_process().name
                     return
 
-                time.sleep(self.cfg['Hub']['main_loop_sleep_time'])
+                # Wait until a command or an ASR hypothesis arrives.
+                wait_for_input([self.commands, self.asr_hypotheses_in], self.cfg['Hub']['main_loop_max_wait_time'])
 
                 s = (time.time(), time.clock())
 
@@ -151,6 +157,14 @@ class SLU(multiprocessing.Process):
                 # process the incoming ASR hypotheses
                 self.read_asr_hypotheses_write_slu_hypotheses()
 
+                report = self.latency_stats.pop_report()
+                if report:
+                    self.cfg['Logging']['system_logger'].info(report)
+
+                report = pop_cache_report(self.cfg['Hub']['latency_report_interval'])
+                if report:
+                    self.cfg['Logging']['system_logger'].info(report)
+
                 d = (time.time() - s[0], time.clock() - s[1])
                 if d[0] > 0.200:
                     print "EXEC Time inner loop: SLU t = {t:0.4f} c = {c:0.4f}\n".format(t=d[0], c=d[1])
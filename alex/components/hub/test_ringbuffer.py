@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from alex.components.hub.messages import Command, Frame, RawFrame
+from alex.components.hub.ringbuffer import AudioRingBuffer
+from alex.utils.mproc import wait_for_input
+
+
+class TestAudioRingBuffer(unittest.TestCase):
+    def setUp(self):
+        cfg = {'Audio': {'sample_rate': 8, 'samples_per_frame': 2}}
+        # 4 bytes per frame, 32 bytes in the buffer
+        self.rb = AudioRingBuffer(cfg, buffer_time=2.0)
+
+    def test_order_of_commands_and_frames(self):
+        self.rb.send(Frame(b'aaaa'))
+        self.rb.send(Command('speech_start()'))
+        self.rb.send(Frame(b'bbbb'))
+        self.rb.send(Frame(b'cccc'))
+        self.rb.send(Command('speech_end()'))
+
+        received = []
+        while self.rb.poll():
+            received.append(self.rb.recv())
+
+        self.assertTrue(isinstance(received[0], RawFrame))
+        self.assertEqual(received[0].payload, b'aaaa')
+        self.assertEqual(received[1].parsed['__name__'], 'speech_start')
+        self.assertEqual([f.payload for f in received[2:4]], [b'bbbb', b'cccc'])
+        self.assertEqual(received[4].parsed['__name__'], 'speech_end')
+        self.assertEqual(len(received), 5)
+
+    def test_wrap_around_and_overrun(self):
+        for i in range(20):
+            self.assertTrue(self.rb.write(b'%04d' % i))
+            self.assertTrue(self.rb.poll())
+            self.assertEqual(self.rb.recv().payload, b'%04d' % i)
+
+        for i in range(8):
+            self.assertTrue(self.rb.write(b'xxxx'))
+        # the buffer is full
+        self.assertFalse(self.rb.write(b'yyyy'))
+        self.assertEqual(self.rb.overruns.value, 1)
+        self.assertAlmostEqual(self.rb.get_buffered_time(), 2.0)
+
+    def test_wait_for_input(self):
+        self.assertEqual(wait_for_input([self.rb], 0.01), [])
+
+        self.rb.write(b'aaaa')
+        self.assertEqual(wait_for_input([self.rb], 0.01), [self.rb, ])
+
+        self.assertTrue(self.rb.poll())
+        self.rb.recv()
+        self.assertFalse(self.rb.poll())
+        self.assertEqual(wait_for_input([self.rb], 0.01), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
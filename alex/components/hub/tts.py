@@ -17,6 +17,7 @@ from alex.components.hub.messages import Command, Frame, TTSText
 from alex.components.tts.common import get_tts_type, tts_factory
 
 from alex.utils.procname import set_proc_name
+from alex.utils.mproc import wait_for_input, LatencyStats
 from alex.utils.audio import save_wav
 import alex.utils.various as various
 
@@ -40,6 +41,8 @@ class TTS(multiprocessing.Process):
         tts_type = get_tts_type(cfg)
         self.tts = tts_factory(tts_type, cfg)
 
+        self.latency_stats = LatencyStats('TTS', self.cfg['Hub']['latency_report_interval'])
+
     def parse_into_segments(self, text):
         segments = []
         last_split = 0
@@ -166,6 +169,7 @@ class TTS(multiprocessing.Process):
 
         if self.text_in.poll():
             data_tts = self.text_in.recv()
+            self.latency_stats.add('NLG->TTS', data_tts.get_age())
             if isinstance(data_tts, TTSText):
                 self.synthesize(None, data_tts.text)
 
@@ -180,7 +184,8 @@ class TTS(multiprocessing.Process):
                     print 'Received close event in: %s' % multiprocessing.current_process().name
                     return
 
-                time.sleep(self.cfg['Hub']['main_loop_sleep_time'])
+                # Wait until a command or a text to be synthesized arrives.
+                wait_for_input([self.commands, self.text_in], self.cfg['Hub']['main_loop_max_wait_time'])
 
                 s = (time.time(), time.clock())
 
@@ -191,6 +196,10 @@ class TTS(multiprocessing.Process):
                 # process audio data
                 self.read_text_write_audio()
 
+                report = self.latency_stats.pop_report()
+                if report:
+                    self.cfg['Logging']['system_logger'].info(report)
+
                 d = (time.time() - s[0], time.clock() - s[1])
                 if d[0] > 0.200:
                     print "EXEC Time inner loop: TTS t = {t:0.4f} c = {c:0.4f}\n".format(t=d[0], c=d[1])
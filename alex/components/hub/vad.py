@@ -10,6 +10,7 @@ from datetime import datetime
 from alex.components.asr.exceptions import ASRException
 from alex.components.hub.messages import Command, Frame
 from alex.utils.procname import set_proc_name
+from alex.utils.mproc import wait_for_input, LatencyStats
 from alex.utils.exceptions import SessionClosedException
 
 import alex.components.vad.power as PVAD
@@ -69,6 +70,8 @@ class VAD(multiprocessing.Process):
         # keeps last decision about whether there is speech or non speech
         self.last_vad = False
 
+        self.latency_stats = LatencyStats('VAD', self.cfg['Hub']['latency_report_interval'])
+
     def recv_input_locally(self):
         """ Copy all input from input connections into local queue objects.
 
@@ -81,6 +84,7 @@ class VAD(multiprocessing.Process):
 
         while self.audio_in.poll():
             frame = self.audio_in.recv()
+            self.latency_stats.add('VoipIO->VAD', frame.get_age())
             self.local_audio_in.append(frame)
 
     def process_pending_commands(self):
@@ -224,7 +228,8 @@ class VAD(multiprocessing.Process):
                     return
 
                 if not self.local_audio_in:
-                    time.sleep(self.cfg['Hub']['main_loop_sleep_time'])
+                    # Wait until a command or audio arrives.
+                    wait_for_input([self.commands, self.audio_in], self.cfg['Hub']['main_loop_max_wait_time'])
 
                 s = (time.time(), time.clock())
 
@@ -245,6 +250,10 @@ class VAD(multiprocessing.Process):
                 except SessionClosedException as e:
                     self.system_logger.exception('VAD:read_write_audio: {ex!s}'.format(ex=e))
 
+                report = self.latency_stats.pop_report()
+                if report:
+                    self.system_logger.info(report)
+
                 d = (time.time() - s[0], time.clock() - s[1])
                 if d[0] > 0.100:
                     print "VAD t = {t:0.4f} c = {c:0.4f}\n".format(t=d[0], c=d[1])
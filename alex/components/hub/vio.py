@@ -16,8 +16,10 @@ from collections import deque, defaultdict
 from alex.components.hub.messages import Command, Frame
 from alex.utils.exceptions import SessionLoggerException
 from alex.components.hub.exceptions import VoipIOException
+from alex.components.hub.ringbuffer import AudioRingBuffer
 from alex.utils.exdec import catch_ioerror
 from alex.utils.procname import set_proc_name
+from alex.utils.mproc import wait_for_input, LatencyStats
 
 # Logging callback
 logger = None
@@ -335,6 +337,8 @@ class VoipIO(multiprocessing.Process):
 
         self.black_list = defaultdict(int)
 
+        self.latency_stats = LatencyStats('VoipIO', self.cfg['Hub']['latency_report_interval'])
+
     def recv_input_locally(self):
         """ Copy all input from input connections into local queue objects.
 
@@ -347,6 +351,7 @@ class VoipIO(multiprocessing.Process):
 
         while self.audio_play.poll():
             frame = self.audio_play.recv()
+            self.latency_stats.add('TTS->VoipIO', frame.get_age())
             self.local_audio_play.append(frame)
 
     def process_pending_commands(self):
@@ -512,7 +517,11 @@ class VoipIO(multiprocessing.Process):
             # send the audio only if the call is connected
             # ignore any audio signal left after the call was disconnected
             if self.audio_recording:
-                self.audio_record.send(Frame(data_rec))
+                if isinstance(self.audio_record, AudioRingBuffer):
+                    # do not create a Frame, only the samples are stored in the shared memory
+                    self.audio_record.write(data_rec)
+                else:
+                    self.audio_record.send(Frame(data_rec))
 
     def is_sip_uri(self, dst):
         """ Check whether it is a SIP URI.
@@ -816,7 +825,9 @@ class VoipIO(multiprocessing.Process):
                     print 'Received close event in: %s' % multiprocessing.current_process().name
                     return
 
-                time.sleep(self.cfg['Hub']['main_loop_sleep_time'])
+                # The recorded audio is not delivered through a connection; therefore, wait at most
+                # main_loop_sleep_time so that it is read in time. Commands and audio to be played wake us up at once.
+                wait_for_input([self.commands, self.audio_play], self.cfg['Hub']['main_loop_sleep_time'])
 
                 s = (time.time(), time.clock())
 
@@ -834,6 +845,10 @@ class VoipIO(multiprocessing.Process):
                     # process at least n_rwa frames
                     self.read_write_audio()
 
+                report = self.latency_stats.pop_report()
+                if report:
+                    self.cfg['Logging']['system_logger'].info(report)
+
                 d = (time.time() - s[0], time.clock() - s[1])
                 if d[0] > 0.200:
                     print "EXEC Time inner loop: VIO t = {t:0.4f} c = {c:0.4f}\n".format(t=d[0], c=d[1])
@@ -9,6 +9,7 @@ from alex.components.nlg.tectotpl.core.block import Block
 from alex.components.nlg.tectotpl.core.exception import LoadingException
 from alex.components.nlg.tectotpl.tool.ml.model import Model
 from alex.components.nlg.tectotpl.core.util import first
+from alex.utils.cache import LRUCache
 import re
 import os.path
 
@@ -24,10 +25,20 @@ class GenerateWordForms(Block):
     Arguments:
         language: the language of the target tree
         selector: the selector of the target tree
+        model: the inflection model file, relative to the data directory
+        cache_size: the number of the cached inflections (default 10000)
     """
 
     BACK_REGEX = re.compile(r'^>([0-9]+)(.*)$')
 
+    # the node attributes which determine the inflection
+    INFLECTION_ATTRIBS = ['lemma', 'morphcat_pos', 'morphcat_subpos',
+                          'morphcat_gender', 'morphcat_number',
+                          'morphcat_case', 'morphcat_possgender',
+                          'morphcat_possnumber', 'morphcat_person',
+                          'morphcat_tense', 'morphcat_grade',
+                          'morphcat_negation', 'morphcat_voice']
+
     def __init__(self, scenario, args):
         """\
         Constructor, just checking the argument values.
@@ -37,13 +48,16 @@ class GenerateWordForms(Block):
             raise LoadingException('Language must be defined!')
         self.model = None
         self.model_file = args['model']
+        self.inflection_cache = LRUCache(maxsize=args.get('cache_size', 10000))
 
     def load(self):
         """\
-        Load the model from a pickle.
+        Load the model from a pickle (only once for all scenarios
+        in the process).
         """
-        self.model = Model.load_from_file(os.path.join(self.scenario.data_dir,
-                                                       self.model_file))
+        self.model = Model.load_shared(os.path.join(self.scenario.data_dir,
+                                                    self.model_file))
+        self.inflection_cache.clear()
 
     def process_atree(self, aroot):
         """\
@@ -57,11 +71,37 @@ class GenerateWordForms(Block):
         # inflect the rest
         to_process = [anode for anode in anodes
                       if anode.morphcat_pos not in ['Z', 'J', 'R', '!']]
-        instances = [self.__get_features(anode) for anode in to_process]
-        inflections = self.model.classify(instances)
+        inflections = self.__get_inflections(to_process)
         for anode, inflection in zip(to_process, inflections):
             self.__inflect(anode, inflection)
 
+    def __get_inflections(self, anodes):
+        """\
+        Return the inflection patterns for the given a-nodes. The patterns
+        are looked up by the lemma and tags in the cache, the rest is
+        classified by the model at once.
+        """
+        keys = [tuple(getattr(anode, attr)
+                      for attr in self.INFLECTION_ATTRIBS)
+                for anode in anodes]
+        inflections = {}
+        to_classify = []
+        for anode, key in zip(anodes, keys):
+            if key in inflections:
+                continue
+            try:
+                inflections[key] = self.inflection_cache.get(key)
+            except KeyError:
+                inflections[key] = None
+                to_classify.append((anode, key))
+        if to_classify:
+            classified = self.model.classify([self.__get_features(anode)
+                                              for anode, _ in to_classify])
+            for (_, key), inflection in zip(to_classify, classified):
+                inflections[key] = inflection
+                self.inflection_cache.put(key, inflection)
+        return [inflections[key] for key in keys]
+
     def __get_features(self, anode):
         """\
         Retrieve all the features needed for morphological inflection
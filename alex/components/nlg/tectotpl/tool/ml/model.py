@@ -33,6 +33,9 @@ import sys
 __author__ = "Ondřej Dušek"
 __date__ = "2012"
 
+# the models loaded by load_shared(), indexed by the absolute file name
+_shared_models = {}
+
 
 class AbstractModel(object):
     """\
@@ -84,6 +87,20 @@ class AbstractModel(object):
         log_info('Model loaded successfully.')
         return model
 
+    @staticmethod
+    def load_shared(model_file):
+        """\
+        Load the model from a file only once per process; all subsequent
+        calls with the same file return the same (read-only) model object.
+
+        The models loaded before forking worker processes are shared
+        by the workers, so they are not loaded again in each of them.
+        """
+        key = os.path.abspath(model_file)
+        if key not in _shared_models:
+            _shared_models[key] = AbstractModel.load_from_file(model_file)
+        return _shared_models[key]
+
     def load_training_set(self, filename, encoding='UTF-8'):
         """\
         Load the given training data set into memory and strip it if
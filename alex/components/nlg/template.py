@@ -8,7 +8,10 @@ import itertools
 import copy
 import re
 
+from collections import defaultdict
+
 from alex.components.slu.da import DialogueAct
+from alex.utils.cache import LRUCache
 from alex.utils.config import load_as_module
 from alex.components.nlg.tectotpl.core.run import Scenario
 from alex.components.nlg.exceptions import TemplateNLGException
@@ -48,6 +51,12 @@ class AbstractTemplateNLG(object):
                         int(re.search(r'\d+', compose_setting).group(0))
             elif compose_setting == 'single':
                 self.compose_utterance = self.compose_utterance_single
+        # setup the caches of the generic template matches and of the filled in templates
+        cache_size = 1000
+        if 'NLG' in self.cfg and 'TemplateCacheSize' in self.cfg['NLG']:
+            cache_size = self.cfg['NLG']['TemplateCacheSize']
+        self.generic_match_cache = LRUCache(maxsize=cache_size)
+        self.fill_cache = LRUCache(maxsize=cache_size)
 
     def load_templates(self, file_name):
         """\
@@ -55,6 +64,9 @@ class AbstractTemplateNLG(object):
         Python source which defines the variable 'templates' as a dictionary
         containing stringified dialog acts as keys and (lists of) templates
         as values.
+
+        The generalised templates are also indexed by the skeletons of their
+        dialogue acts (see get_da_skeleton).
         """
         try:
             templates = load_as_module(file_name, force=True).templates
@@ -62,11 +74,22 @@ class AbstractTemplateNLG(object):
             self.templates = {}
             # generalised templates
             self.gtemplates = {}
+            gskeletons = {}
             for k, v in templates.iteritems():
                 da = DialogueAct(k)
                 # k.sort()
                 self.templates[unicode(da)] = v
-                self.gtemplates[unicode(self.get_generic_da(da))] = (da, v)
+                gda = self.get_generic_da(da)
+                self.gtemplates[unicode(gda)] = (da, v)
+                gskeletons[unicode(gda)] = (self.get_da_skeleton(gda), tuple(unicode(dai) for dai in gda))
+
+            # generalised templates indexed by their skeletons
+            self.gtemplates_index = defaultdict(list)
+            for gda_str, (skeleton, dai_strs) in gskeletons.iteritems():
+                self.gtemplates_index[skeleton].append((gda_str, dai_strs))
+
+            self.generic_match_cache.clear()
+            self.fill_cache.clear()
 
         except Exception as e:
             raise TemplateNLGException('No templates loaded from %s -- %s!' % (file_name, e))
@@ -85,6 +108,26 @@ class AbstractTemplateNLG(object):
                 dai.value = "{%s}" % dai.name
         return da
 
+    def get_generic_dai(self, dai):
+        """\
+        Given a dialogue act item with a value, substitute the value
+        with a generic value.
+        """
+        # a shallow copy is enough as only the value is replaced
+        dai = copy.copy(dai)
+        dai.value = "{%s}" % dai.name
+        return dai
+
+    def get_da_skeleton(self, da):
+        """\
+        Return the dialogue act with all values substituted with generic
+        values as a tuple of the strings of its items.
+
+        A dialogue act can match a generic template only if both have
+        the same skeleton.
+        """
+        return tuple(unicode(self.get_generic_dai(dai)) if dai.value else unicode(dai) for dai in da)
+
     def get_generic_da_given_svs(self, da, svs):
         """\
         Given a dialogue act and a list of slots and values, substitute
@@ -108,30 +151,101 @@ class AbstractTemplateNLG(object):
         Returns a matching template and a dialogue act where values of some
         of the slots are substituted with a generic value.
         """
-        tpl = None
+        key = (unicode(da), tuple(tuple(sv) for sv in svs))
+        try:
+            gda_str = self.generic_match_cache.get(key)
+        except KeyError:
+            gda_str = self.find_generic_template(da, svs)
+            self.generic_match_cache.put(key, gda_str)
+
+        if gda_str is None:
+            # I did not find anything
+            raise TemplateNLGException("No match with generic templates.")
+
+        gda, tpls = self.gtemplates[gda_str]
+        tpl = self.random_select(tpls)
+        return tpl, gda
+
+    def get_generic_search_range(self, svs):
+        """\
+        Return the numbers of the slot values which are tried to be
+        substituted with generic values, in the order they are tried.
+        """
         # try to find increasingly generic templates
         # limit the complexity of the search
         if len(svs) == 0:
-            rng = []
+            return []
         elif len(svs) == 1:
-            rng = [1]
+            return [1]
         elif len(svs) == 2:
-            rng = [1, 2]
+            return [1, 2]
         else:
-            rng = [1, len(svs) - 1, len(svs)]
+            return [1, len(svs) - 1, len(svs)]
 
-        for r in rng:
+    def find_generic_template(self, da, svs):
+        """\
+        Find the key of the generic template which matches the dialogue act
+        when values of some of the slots are substituted with a generic value.
+
+        The candidate templates are looked up in the index by the skeleton
+        of the dialogue act. Every candidate determines the set of items
+        which must be made generic (a bitmask over svs) and the first
+        candidate in the order of the exhaustive search is returned.
+
+        Returns None if there is no matching template.
+        """
+        if len(set(tuple(sv) for sv in svs)) != len(svs) or \
+                [[dai.name, dai.value] for dai in da if dai.value] != svs:
+            # the slot values do not map one to one to the items
+            return self.find_generic_template_exhaustive(da, svs)
+
+        rng = self.get_generic_search_range(svs)
+        dai_strs = [unicode(dai) for dai in da]
+        generic_dai_strs = [unicode(self.get_generic_dai(dai)) if dai.value else unicode(dai) for dai in da]
+        if any(dai.value and dai_str == generic_dai_str
+               for dai, dai_str, generic_dai_str in zip(da, dai_strs, generic_dai_strs)):
+            # a value is already generic, so the same generic DA can be made from different slot values
+            return self.find_generic_template_exhaustive(da, svs)
+
+        best = None
+        for gda_str, tpl_dai_strs in self.gtemplates_index.get(tuple(generic_dai_strs), []):
+            mask = 0
+            sv_idx = 0
+            for dai, dai_str, generic_dai_str, tpl_dai_str in zip(da, dai_strs, generic_dai_strs, tpl_dai_strs):
+                if tpl_dai_str == dai_str:
+                    pass
+                elif dai.value and tpl_dai_str == generic_dai_str:
+                    mask |= 1 << sv_idx
+                else:
+                    break
+                if dai.value:
+                    sv_idx += 1
+            else:
+                r = bin(mask).count('1')
+                if r not in rng:
+                    continue
+                # the position of the substituted slot values in the order of the exhaustive search
+                order = (rng.index(r), [i for i in range(len(svs)) if mask & (1 << i)])
+                if best is None or order < best[0]:
+                    best = order, gda_str
+
+        return best[1] if best else None
+
+    def find_generic_template_exhaustive(self, da, svs):
+        """\
+        Find the key of the generic template which matches the dialogue act
+        by trying the combinations of the slot values substituted with
+        a generic value.
+
+        Returns None if there is no matching template.
+        """
+        for r in self.get_generic_search_range(svs):
             for cmb in itertools.combinations(svs, r):
                 generic_da = self.get_generic_da_given_svs(da, cmb)
-                try:
-                    gda, tpls = self.gtemplates[unicode(generic_da)]
-                    tpl = self.random_select(tpls)
-                except KeyError:
-                    continue
-                return tpl, gda
+                if unicode(generic_da) in self.gtemplates:
+                    return unicode(generic_da)
 
-        # I did not find anything
-        raise TemplateNLGException("No match with generic templates.")
+        return None
 
     def random_select(self, tpl):
         """\
@@ -238,7 +352,21 @@ class AbstractTemplateNLG(object):
             else:
                 svsx.append([slot_orig, val_orig])
         # return with generic values filled in
-        return self.fill_in_template(tpl, svsx)
+        return self.fill_in_template_cached(tpl, svsx)
+
+    def fill_in_template_cached(self, tpl, svs):
+        """\
+        Fill in the given slot values into the given template, reusing
+        the output of the previous filling of the same template with
+        the same values.
+        """
+        key = (tpl, tuple(tuple(sv) for sv in svs))
+        try:
+            return self.fill_cache.get(key)
+        except KeyError:
+            out_text = self.fill_in_template(tpl, svs)
+            self.fill_cache.put(key, out_text)
+            return out_text
 
     def generate(self, da):
         """\
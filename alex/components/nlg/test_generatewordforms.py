@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+if __name__ == "__main__":
+    import autopath
+
+import cPickle as pickle
+import os
+import shutil
+import tempfile
+import unittest
+
+from alex.components.nlg.tectotpl.block.t2a.cs.generatewordforms import GenerateWordForms
+from alex.components.nlg.tectotpl.tool.ml.model import AbstractModel, Model
+
+
+class StubModel(object):
+    """An inflection model which appends the case and the number to the lemma and counts its calls."""
+
+    def __init__(self):
+        self.calls = []
+
+    def classify(self, instances):
+        self.calls.append(len(instances))
+        return ['>0_' + inst['Tag_Cas'] + inst['Tag_Num'] for inst in instances]
+
+
+class StubANode(object):
+    def __init__(self, lemma, case, number='S', pos='N'):
+        self.lemma = lemma
+        self.form = None
+        self.morphcat_pos = pos
+        self.morphcat_case = case
+        self.morphcat_number = number
+        for attr in ['subpos', 'gender', 'possgender', 'possnumber', 'person', 'tense', 'grade', 'negation',
+                     'voice']:
+            setattr(self, 'morphcat_' + attr, '.')
+
+
+class StubARoot(object):
+    def __init__(self, anodes):
+        self.anodes = anodes
+
+    def get_descendants(self, ordered=False):
+        return self.anodes
+
+
+class StubScenario(object):
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+
+
+class TestGenerateWordForms(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def create_block(self, args=None):
+        block_args = {'language': 'cs', 'model': 'model.pickle'}
+        block_args.update(args or {})
+        return GenerateWordForms(StubScenario(self.directory), block_args)
+
+    def inflect(self, block, sentence):
+        anodes = [StubANode(*node) for node in sentence]
+        block.process_atree(StubARoot(anodes))
+        return [anode.form for anode in anodes]
+
+    def inflect_uncached(self, sentence):
+        """Inflects every node by a new block with a new model, so no inflection comes from the cache."""
+        forms = []
+        for node in sentence:
+            block = self.create_block()
+            block.model = StubModel()
+            forms.extend(self.inflect(block, [node]))
+        return forms
+
+    def test_inflections(self):
+        block = self.create_block()
+        block.model = StubModel()
+
+        sentences = [[('pes', '1'), ('pes', '1'), ('.', '.', '.', 'Z'), ('kočka', '4')],
+                     [('kočka', '7', 'P'), ('pes', '1')],
+                     [('pes', '1'), ('kočka', '4'), ('kočka', '7', 'P')]]
+
+        for sentence in sentences:
+            self.assertEqual(self.inflect(block, sentence), self.inflect_uncached(sentence))
+
+        # only the nodes not seen before are classified, the repeated nodes of a sentence only once
+        self.assertEqual(block.model.calls, [2, 1])
+
+        # the cache is limited by its size, only the last classified inflection is kept
+        block = self.create_block({'cache_size': 1})
+        block.model = StubModel()
+        for sentence in sentences:
+            self.assertEqual(self.inflect(block, sentence), self.inflect_uncached(sentence))
+        self.assertEqual(block.model.calls, [2, 2, 2])
+
+    def test_load_shared(self):
+        model_file = os.path.join(self.directory, 'model.pickle')
+        with open(model_file, 'wb') as f:
+            pickle.dump(StubModel(), f, pickle.HIGHEST_PROTOCOL)
+
+        model = Model.load_shared(model_file)
+        self.assertIs(AbstractModel.load_shared(os.path.join(self.directory, '.', 'model.pickle')), model)
+        self.assertIsNot(Model.load_from_file(model_file), model)
+
+        # all blocks with the same model share it and the cached inflections are dropped when it is loaded
+        blocks = [self.create_block(), self.create_block()]
+        blocks[0].inflection_cache.put('key', 'inflection')
+        for block in blocks:
+            block.load()
+        self.assertIs(blocks[0].model, model)
+        self.assertIs(blocks[1].model, model)
+        self.assertEqual(len(blocks[0].inflection_cache), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
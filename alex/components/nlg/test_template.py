@@ -2,6 +2,8 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import copy
+import random
 import unittest
 
 if __name__ == "__main__":
@@ -73,5 +75,39 @@ class TestTemplateNLG(unittest.TestCase):
 
         self.assertEqual(unicode(correct_text), unicode(generated_text))
 
+    def test_generic_template_index(self):
+        nlg = TemplateNLG(self.cfg)
+
+        rnd = random.Random(0)
+        keys = sorted(nlg.templates)
+        values = ['Anděl', 'Florenc', '10:00', '2', 'bus']
+        for i in range(300):
+            da = DialogueAct()
+            for j in range(rnd.randint(1, 3)):
+                for dai in DialogueAct(rnd.choice(keys)):
+                    if dai.value and (dai.value.startswith('{') or rnd.random() < 0.3):
+                        dai.value = rnd.choice(values)
+                    da.append(dai)
+
+            svs = da.get_slots_and_values()
+            self.assertEqual(nlg.find_generic_template(da, svs), nlg.find_generic_template_exhaustive(da, svs))
+
+    def test_template_nlg_cache(self):
+        config = copy.deepcopy(CONFIG_DICT)
+        config['NLG']['TemplateCacheSize'] = 0
+        cfg = Config.load_configs(config=config, use_default=False, log=False)
+        nlg = TemplateNLG(cfg)
+
+        da = DialogueAct('inform(from_stop="Anděl")&inform(to_stop="Florenc")&inform(vehicle="bus")')
+        random.seed(0)
+        generated_texts = [nlg.generate(da) for i in range(5)]
+        self.assertEqual(nlg.generic_match_cache.hits, 0)
+
+        nlg = TemplateNLG(self.cfg)
+        random.seed(0)
+        # the cached matches and fillings do not change the random selection of the templates
+        self.assertEqual([nlg.generate(da) for i in range(5)], generated_texts)
+        self.assertGreater(nlg.generic_match_cache.hits, 0)
+
 if __name__ == '__main__':
     unittest.main()
@@ -41,6 +41,9 @@ class CategoryLabelDatabase(object):
        - instead of testing all surface forms from the CLDB from the longest to the shortest in the utterance, we test
          all the substrings in the utterance from the longest to the shortest
 
+    The surface forms are also stored in a word level trie (form_trie) so that find_forms() finds the longest surface
+    form starting at a given word by a single walk through the trie instead of looking up all the substrings. The trie
+    is built when the database is loaded.
 
     """
     def __init__(self, file_name=None):
@@ -49,6 +52,7 @@ class CategoryLabelDatabase(object):
         self.forms = []
         self.form_value_cl = []
         self.form2value2cl = nesteddict()
+        self.form_trie = {}
 
         if file_name:
             self.load(file_name)
@@ -100,6 +104,7 @@ class CategoryLabelDatabase(object):
         self.gen_synonym_value_category()
         self.gen_form_value_cl_list()
         self.gen_mapping_form2value2cl()
+        self.gen_form_trie()
 
         self._form_val_upname = None
         self._form_upnames_vals = None
@@ -154,6 +159,81 @@ class CategoryLabelDatabase(object):
 
         self.forms.sort(key=lambda f: len(f), reverse=True)
 
+    def gen_form_trie(self):
+        """
+        Generates a word level trie of all surface forms. Every node is a dictionary mapping the next words
+        to the child nodes. The key None of a node maps to the surface form ending in the node.
+
+        :return: none
+        """
+        self.form_trie = {}
+
+        for form in self.form2value2cl:
+            if not form:
+                continue
+
+            node = self.form_trie
+            for word in form:
+                node = node.setdefault(word, {})
+            node[None] = form
+
+    def find_forms(self, words):
+        """
+        Finds the surface forms in the sequence of words.
+
+        It scans the words from the left and at every position it finds the longest surface form starting there.
+        The scan continues after the end of the found surface form. The result is the same as when all substrings
+        starting at the position are tested from the longest to the shortest.
+
+        :param words: a sequence of words, e.g. an Utterance instance
+        :return: an iterator over (start, end, form) tuples where form is the found surface form words[start:end]
+        """
+        n_words = len(words)
+
+        start = 0
+        while start < n_words:
+            node = self.form_trie
+            end = None
+            form = None
+            for i in xrange(start, n_words):
+                node = node.get(words[i])
+                if node is None:
+                    break
+                if None in node:
+                    end = i + 1
+                    form = node[None]
+
+            if end is None:
+                start += 1
+            else:
+                yield start, end, form
+                # skip all substrings of this form
+                start = end
+
+    def find_form(self, words, form):
+        """
+        Finds the occurrences of the given surface form in the sequence of words.
+
+        The words are scanned from the left and the scan continues after the end of every found occurrence, so the
+        occurrences do not overlap. Unlike find_forms(), the form is found also inside a longer surface form.
+
+        :param words: a sequence of words, e.g. an Utterance instance
+        :param form: a tuple of words
+        :return: an iterator over (start, end) tuples where words[start:end] is the form
+        """
+        n_words = len(words)
+        n_form = len(form)
+        if not n_form:
+            return
+
+        start = 0
+        while start + n_form <= n_words:
+            if tuple(words[start:start + n_form]) == form:
+                yield start, start + n_form
+                start += n_form
+            else:
+                start += 1
+
 
 class SLUPreprocessing(object):
     """Implements preprocessing of utterances or utterances and dialogue acts.
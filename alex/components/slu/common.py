@@ -34,7 +34,7 @@ def slu_factory(cfg, slu_type=None):
     if inspect.isclass(slu_type) and issubclass(slu_type, DAILogRegClassifier):
         cldb = CategoryLabelDatabase(cfg['SLU'][slu_type]['cldb_fname'])
         preprocessing = cfg['SLU'][slu_type]['preprocessing_cls'](cldb)
-        slu = slu_type(cldb, preprocessing)
+        slu = slu_type(cldb, preprocessing, vectorized=cfg['SLU'][slu_type].get('vectorized', True))
         slu.load_model(cfg['SLU'][slu_type]['model_fname'])
         return slu
     elif inspect.isclass(slu_type) and issubclass(slu_type, SLUInterface):
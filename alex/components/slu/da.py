@@ -9,13 +9,15 @@ import codecs
 
 from operator import xor
 from collections import defaultdict
+from itertools import islice
+from math import exp
 
 from alex.corpustools.wavaskey import load_wavaskey, save_wavaskey
 from alex.components.slu.exceptions import SLUException, DialogueActException, DialogueActItemException, \
     DialogueActConfusionNetworkException
 from alex.ml.exceptions import NBListException
 from alex.ml.features import Abstracted
-from alex.ml.hypothesis import Hypothesis, NBList, ConfusionNetwork
+from alex.ml.hypothesis import Hypothesis, NBList, ConfusionNetwork, gen_nbest_indices
 from alex.utils.text import split_by
 
 
@@ -659,33 +661,25 @@ class DialogueActNBList(SLUHypothesis, NBList):
         except NBListException as e:
             raise DialogueActNBListException(e)
 
-    def merge(self):
-        """Adds up probabilities for the same hypotheses.  Takes care to keep
-        track of original, unnormalised DAI values.  Returns self."""
-        if len(self.n_best) <= 1:
-            return
-        else:
-            new_n_best = self.n_best[:1]
-
-            for cur_idx in xrange(1, len(self.n_best)):
-                cur_hyp = self.n_best[cur_idx]
-                for new_idx, new_hyp in enumerate(new_n_best):
-                    if new_hyp[1] == cur_hyp[1]:
-                        # Merge, add the probabilities.
-                        new_da = new_hyp[1]
-                        for dai in cur_hyp[1]:
-                            new_dais = (new_dai for new_dai in new_da if
-                                        new_dai == dai)
-                            for new_dai in new_dais:
-                                new_dai._unnorm_values.update(
-                                    dai._unnorm_values)
-                        new_hyp[0] += cur_hyp[0]
-                        break
-                else:
-                    new_n_best.append(cur_hyp)
-
-        self.n_best = sorted(new_n_best, reverse=True)
-        return self
+    def _fact_key(self, fact):
+        # The dialogue acts are equal iff they have the same DAIs in any order. DialogueAct.__hash__ depends on the
+        # order of the DAIs, so the key is the textual representation of the sorted DAIs. A dialogue act equals
+        # a string with the same representation.
+        if isinstance(fact, basestring):
+            return fact
+        return '&'.join(sorted(unicode(dai) for dai in fact))
+
+    def _merge_hyp(self, hyp, other_hyp):
+        """Adds up probabilities of the same hypotheses.  Takes care to keep
+        track of original, unnormalised DAI values."""
+        new_da = hyp[1]
+        for dai in other_hyp[1]:
+            new_dais = (new_dai for new_dai in new_da if
+                        new_dai == dai)
+            for new_dai in new_dais:
+                new_dai._unnorm_values.update(
+                    dai._unnorm_values)
+        hyp[0] += other_hyp[0]
 
     def get_confnet(self):
         confnet = DialogueActConfusionNetwork()
@@ -881,63 +875,41 @@ class DialogueActConfusionNetwork(SLUHypothesis, ConfusionNetwork):
 
         return da
 
-    def get_da_nblist(self, n=10, prune_prob=0.005):
-        """Parses the input dialogue act item confusion network and generates N-best hypotheses.
-
-        The result is a list of dialogue act hypotheses each with a with
-        assigned probability.  The list also include a dialogue act for not
-        having the correct dialogue act in the list - other().
+    def gen_da_nbest(self):
+        """Generates the dialogue act hypotheses from the most probable to the least probable one.
 
-        Generation of hypotheses will stop when the probability of the hypotheses is smaller then the ``prune_prob``.
+        The hypotheses are expanded lazily, so the caller can stop when it has got enough of them.
 
+        :return: an iterator over (probability, dialogue act) tuples
         """
-
-        #print "cn", [(p, unicode(dai)) for p, dai in self.cn]
-
-        open_hyp = []
-        closed_hyp = {}
-
         cn = sorted(self, reverse=True)
 
-        for j, (p, dai) in enumerate(cn):
-            if p < 0.5:
-                i = j
-                break
-        else:
-            i = len(cn)
-
-        # create index for the best hypothesis
-        best_hyp = tuple([0,] * i + [1,] * (len(cn) - i))
-        best_prob = self._get_prob(best_hyp, cn=cn)
-        open_hyp.append((best_prob, best_hyp))
-        #print "i, bp, bh", i, best_prob, best_hyp
+        # In the hypothesis index, 0 stands for the DAI and 1 for the null() dialogue act. The alternatives passed to
+        # gen_nbest_indices() must be sorted, so they are swapped for the DAIs with the probability lower than 0.5.
+        alternatives_probs = [[p, 1.0 - p] if p >= 0.5 else [1.0 - p, p] for p, dai in cn]
 
-        i = 0
-        while open_hyp and i < n*100:
-            i += 1
+        for log_prob, alt_index in gen_nbest_indices(alternatives_probs):
+            hyp_index = tuple(alt if p >= 0.5 else 1 - alt for alt, (p, dai) in zip(alt_index, cn))
 
-            current_prob, current_hyp_index = open_hyp.pop(0)
+            yield exp(log_prob), self._get_hyp_index_dialogue_act(hyp_index, cn=cn)
 
-            if current_hyp_index not in closed_hyp:
-                # process only those hypotheses which were not processed so far
-
-                closed_hyp[current_hyp_index] = current_prob
-                # print "current_prob, current_hyp_index:", current_prob, current_hyp_index
+    def get_da_nblist(self, n=10, prune_prob=0.005):
+        """Parses the input dialogue act item confusion network and generates N-best hypotheses.
 
-                for hyp_index in self._get_next_worse_candidates(current_hyp_index, cn=cn):
-                    # print hyp_index
-                    prob = self._get_prob(hyp_index, cn=cn)
-                    open_hyp.append((prob, hyp_index))
+        The result is a list of dialogue act hypotheses each with a with
+        assigned probability.  The list also include a dialogue act for not
+        having the correct dialogue act in the list - other().
 
-                open_hyp.sort(reverse=True)
+        Generation of hypotheses will stop when the probability of the hypotheses is smaller then the ``prune_prob``.
 
-            if len(closed_hyp) >= n:
-                break
+        """
 
         nblist = DialogueActNBList()
-        for idx in closed_hyp:
-            # print "p = ",closed_hyp[idx], "hyp = ", self._get_hyp_index_dialogue_act(idx)
-            nblist.add(closed_hyp[idx], self._get_hyp_index_dialogue_act(idx, cn=cn))
+        for prob, da in islice(self.gen_da_nbest(), n):
+            if prob < prune_prob:
+                # the following hypotheses are even less probable
+                break
+            nblist.add(prob, da)
 
         #print nblist
         #print
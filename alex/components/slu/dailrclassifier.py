@@ -8,21 +8,68 @@ the way how the features are computed is changed significantly.
 from __future__ import unicode_literals
 
 import copy
+import os
+import os.path
 import numpy as np
 import cPickle as pickle
 
 from collections import defaultdict
+from itertools import islice
 from sklearn.linear_model import LogisticRegression
-from scipy.sparse import lil_matrix
+from scipy.sparse import lil_matrix, csr_matrix
+from scipy.special import expit
 
 from alex.components.asr.utterance import Utterance, UtteranceHyp, UtteranceNBList, UtteranceConfusionNetwork
 from alex.components.slu.exceptions import DAILRException
 from alex.components.slu.base import SLUInterface
 from alex.components.slu.da import DialogueActItem, DialogueActConfusionNetwork
+from alex.components.slu.training import train_classifiers
 from alex.utils.cache import lru_cache
 
 CONFNET2NBLIST_EXPANSION_APPROX = 40
 
+# the version of the format of the compiled models
+COMPILED_MODEL_VERSION = 1
+
+
+def _encode_word(w):
+    return w.encode('utf-8') if isinstance(w, unicode) else w
+
+
+def encode_feature(f):
+    """
+    Encodes the feature as a byte string used in the feature vocabulary of the compiled models.
+
+    The features are either tuples of words (the n-gram features) or strings (the n-best list features).
+    """
+    if isinstance(f, tuple):
+        return b't' + b'\x1f'.join(_encode_word(w) for w in f)
+
+    return b's' + _encode_word(f)
+
+
+def train_logistic_regression(n, clser, classifier_input, classifier_output, inverse_regularisation=1.0,
+                              verbose=True):
+    """
+    Trains the logistic regression classifier of the dialogue act item.
+
+    :return: the trained LogisticRegression instance
+    """
+    if verbose:
+        print '-' * 120
+        print "Training classifier: ", clser, ' #', n+1
+        print "  Matrix:            ", classifier_input.shape
+
+    lr = LogisticRegression('l2', C=inverse_regularisation, tol=1e-6)
+    lr.fit(classifier_input, classifier_output)
+
+    if verbose:
+        mean_accuracy = lr.score(classifier_input, classifier_output)
+        print "  Prediction mean accuracy on the training data: %6.2f" % (100.0 * mean_accuracy, )
+        print "  Size of the params:", lr.coef_.shape
+
+    return lr
+
 
 class Features(object):
     """
@@ -178,12 +225,20 @@ class DAILogRegClassifier(SLUInterface):
     This parser uses logistic regression as the classifier of the dialogue
     act items.
 
+    By default, all classifiers are evaluated at once by ``parse_X_vectorized``, which multiplies a sparse matrix of
+    the features of the utterance by a stacked weight matrix of all classifiers. The original per-classifier loop is
+    still available as ``parse_X_loop`` and it is used when ``vectorized`` is False.
+
     """
 
-    def __init__(self, cldb, preprocessing, features_size=4, *args, **kwargs):
+    def __init__(self, cldb, preprocessing, features_size=4, vectorized=True, *args, **kwargs):
         self.features_size = features_size
         self.cldb = cldb
         self.preprocessing = preprocessing
+        self.vectorized = vectorized
+
+        self.inference_classifiers = None
+        self.inference_vocabulary = None
 
     def __repr__(self):
         r = "DAILogRegClassifier({cldb},{preprocessing},{features_size})"\
@@ -200,31 +255,13 @@ class DAILogRegClassifier(SLUInterface):
 
         abs_utts = []
 
-        start = 0
-        while start < len(utterance):
-            end = len(utterance)
-            while end > start:
-                f = tuple(utterance[start:end])
-                #print start, end
-                #print f
-
-                if f in self.cldb.form2value2cl:
-                    for v in self.cldb.form2value2cl[f]:
-                        for c in self.cldb.form2value2cl[f][v]:
-                            u = copy.deepcopy(utterance)
-                            u = u.replace2(start, end, 'CL_' + c.upper())
-
-                            abs_utts.append((u, f, v, c))
-
-                    #print f
-
-                    # skip all substring for this form
-                    start = end
-                    break
-                end -= 1
-            else:
-                start += 1
+        for start, end, f in self.cldb.find_forms(utterance):
+            for v in self.cldb.form2value2cl[f]:
+                for c in self.cldb.form2value2cl[f][v]:
+                    u = copy.deepcopy(utterance)
+                    u = u.replace2(start, end, 'CL_' + c.upper())
 
+                    abs_utts.append((u, f, v, c))
 
         return abs_utts
 
@@ -243,23 +280,8 @@ class DAILogRegClassifier(SLUInterface):
         if not form:
             return abs_utt
 
-        start = 0
-        while start < len(utterance):
-            end = len(utterance)
-            while end > start:
-                f = tuple(utterance[start:end])
-                #print start, end
-                #print f, form
-
-                if f == form:
-                    abs_utt = abs_utt.replace2(start, end, c)
-
-                    # skip all substring for this form
-                    start = end
-                    break
-                end -= 1
-            else:
-                start += 1
+        for start, end in self.cldb.find_form(utterance, form):
+            abs_utt = abs_utt.replace2(start, end, c)
 
         return abs_utt
 
@@ -273,25 +295,10 @@ class DAILogRegClassifier(SLUInterface):
 
         abs_utt = copy.deepcopy(utterance)
 
-        start = 0
-        while start < len(utterance):
-            end = len(utterance)
-            while end > start:
-                f = tuple(utterance[start:end])
-                #print start, end
-                #print f
-
-                if f in self.cldb.form2value2cl:
-                    for v in self.cldb.form2value2cl[f]:
-                        for c in self.cldb.form2value2cl[f][v]:
-                            abs_utt = abs_utt.replace2(start, end, 'CL_OTHER_' + c.upper())
-
-                    # skip all substring for this form
-                    start = end
-                    break
-                end -= 1
-            else:
-                start += 1
+        for start, end, f in self.cldb.find_forms(utterance):
+            for v in self.cldb.form2value2cl[f]:
+                for c in self.cldb.form2value2cl[f][v]:
+                    abs_utt = abs_utt.replace2(start, end, 'CL_OTHER_' + c.upper())
 
         return abs_utt
 
@@ -325,26 +332,13 @@ class DAILogRegClassifier(SLUInterface):
 
         fvcs = set()
 
-        start = 0
-        while start < len(utterance):
-            end = len(utterance)
-            while end > start:
-                f = tuple(utterance[start:end])
-
-                # this looks for an exact surface form in the CLDB
-                # however, we could also search for those withing a some distance from the exact surface form,
-                # for example using a string edit distance
-                if f in self.cldb.form2value2cl:
-                    for v in self.cldb.form2value2cl[f]:
-                        for c in self.cldb.form2value2cl[f][v]:
-                            fvcs.add((f, v, c))
-
-                    # skip all substring for this form
-                    start = end
-                    break
-                end -= 1
-            else:
-                start += 1
+        # this looks for an exact surface form in the CLDB
+        # however, we could also search for those withing a some distance from the exact surface form,
+        # for example using a string edit distance
+        for start, end, f in self.cldb.find_forms(utterance):
+            for v in self.cldb.form2value2cl[f]:
+                for c in self.cldb.form2value2cl[f][v]:
+                    fvcs.add((f, v, c))
 
         return fvcs
 
@@ -371,9 +365,11 @@ class DAILogRegClassifier(SLUInterface):
         :param nblist: an UtteranceConfusionNetwork instance
         :return: a list of form, value, and category label tuples found in the input sentence
         """
-        nblist = confnet.get_utterance_nblist(n=CONFNET2NBLIST_EXPANSION_APPROX)
+        fvcs = set()
+        for p, u in islice(confnet.gen_utterance_nbest(), CONFNET2NBLIST_EXPANSION_APPROX):
+            fvcs.update(self.get_fvc_in_utterance(u))
 
-        return self.get_fvc_in_confnet(nblist)
+        return fvcs
 
     @lru_cache(maxsize=1000)
     def get_fvc(self, obs):
@@ -427,7 +423,7 @@ class DAILogRegClassifier(SLUInterface):
 
         feat = UtteranceFeatures(size=self.features_size)
 
-        scale_p = [p for p, u in nblist]
+        scale_p = nblist.get_probs()
         #scale_p[0] = 1.0
 
         for i, (p, u) in enumerate(nblist):
@@ -525,7 +521,31 @@ class DAILogRegClassifier(SLUInterface):
         for k in sorted(self.classifiers):
             print('%40s = %d' % (k, self.classifiers[k]))
 
+    def get_training_features(self, utt_idx, fvc):
+        """
+        Returns the features of the training utterance abstracted for the given form, value, category label tuple.
+
+        The features are extracted only once and then they are shared by all classifiers, therefore they must not
+        be modified.
+
+        :param utt_idx: the index of the training utterance
+        :param fvc: a form, value category tuple describing how the utterance should be abstracted
+        :return: a set of features from the utterance
+        """
+        key = (utt_idx, fvc)
+        try:
+            return self.features_cache[key]
+        except KeyError:
+            feat = self.get_features(self.utterances[utt_idx], fvc, self.das_category_labels[utt_idx])
+            self.features_cache[key] = feat
+            return feat
+
     def prune_features(self, clser, min_pos_feature_count, min_neg_feature_count, verbose=False):
+        """
+        Selects the features used by the classifier. The features of the training utterances are shared by all
+        classifiers, therefore the rare features are not removed from them; they are only left out from the feature
+        mapping of the classifier.
+        """
         if verbose:
             print 'Pruning the features'
             print
@@ -567,24 +587,14 @@ class DAILogRegClassifier(SLUInterface):
                   (min_pos_feature_count, min_neg_feature_count, len(remove_features))
 
         remove_features = set(remove_features)
-        for feat in self.classifiers_features[clser]:
-            feat.prune(remove_features)
-
-
-        # count the features again and report the result
-        features_counts = defaultdict(int)
-        for feat in self.classifiers_features[clser]:
-            for f in feat:
-                features_counts[f] += 1
-
-        self.classifiers_features_list[clser] = features_counts.keys()
+        self.classifiers_features_list[clser] = [f for f in features_counts if f not in remove_features]
 
         self.classifiers_features_mapping[clser] = {}
         for i, f in enumerate(self.classifiers_features_list[clser]):
             self.classifiers_features_mapping[clser][f] = i
 
         if verbose:
-            print "  Number of features after pruning: ", len(features_counts)
+            print "  Number of features after pruning: ", len(self.classifiers_features_list[clser])
 
 
 
@@ -595,7 +605,8 @@ class DAILogRegClassifier(SLUInterface):
         self.classifiers_features = defaultdict(list)
         self.classifiers_features_list = {}
         self.classifiers_features_mapping = {}
-
+        # the features of the training utterances indexed by (utt_idx, fvc), shared by all classifiers
+        self.features_cache = {}
 
         self.parsed_classifiers = {}
         for clser in self.classifiers:
@@ -635,7 +646,7 @@ class DAILogRegClassifier(SLUInterface):
                             self.classifiers_cls[clser].append((None, None, None))
 
                         self.classifiers_features[clser].append(
-                            self.get_features(self.utterances[utt_idx], self.das_category_labels[utt_idx][i], self.das_category_labels[utt_idx]))
+                            self.get_training_features(utt_idx, self.das_category_labels[utt_idx][i]))
 
                         if verbose:
                             print "  @", clser, i, dai, f, v, c
@@ -652,7 +663,7 @@ class DAILogRegClassifier(SLUInterface):
                         self.classifiers_outputs[clser].append(0.0)
                         self.classifiers_cls[clser].append((None, None, None))
 
-                    self.classifiers_features[clser].append(self.get_features(self.utterances[utt_idx], (None, None, None), self.das_category_labels[utt_idx]))
+                    self.classifiers_features[clser].append(self.get_training_features(utt_idx, (None, None, None)))
 
                     if verbose:
                         print "  @", clser
@@ -665,33 +676,52 @@ class DAILogRegClassifier(SLUInterface):
 
             self.prune_features(clser, min_pos_feature_count, min_neg_feature_count, verbose = (verbose or verbose2))
 
-    def train(self, inverse_regularisation=1.0, verbose=True):
-        self.trained_classifiers = {}
+    def get_classifier_input(self, clser):
+        """
+        Returns a sparse CSR matrix with the feature vectors of the training utterances of the classifier in rows.
+        """
+        features_mapping = self.classifiers_features_mapping[clser]
 
-        if verbose:
-            print '=' * 120
-            print 'Training'
+        data, rows, cols = [], [], []
+        for i, feat in enumerate(self.classifiers_features[clser]):
+            feat_data, feat_cols = feat.get_feature_vector_lil(features_mapping)
+            data.extend(feat_data)
+            rows.extend([i] * len(feat_cols))
+            cols.extend(feat_cols)
 
-        for n, clser in enumerate(sorted(self.classifiers)):
-            if verbose:
-                print '-' * 120
-                print "Training classifier: ", clser, ' #', n+1 , '/', len(self.classifiers)
-                print "  Matrix:            ", (len(self.classifiers_outputs[clser]), len(self.classifiers_features_list[clser]))
+        classifier_input = csr_matrix((data, (rows, cols)),
+                                      shape=(len(self.classifiers_outputs[clser]), len(features_mapping)))
+        classifier_input.eliminate_zeros()
+
+        return classifier_input
 
-            classifier_input = np.zeros((len(self.classifiers_outputs[clser]), len(self.classifiers_features_list[clser])))
-            for i, feat in enumerate(self.classifiers_features[clser]):
-                classifier_input[i] = feat.get_feature_vector(self.classifiers_features_mapping[clser])
+    def get_classifier_data(self, clser):
+        return self.get_classifier_input(clser), self.classifiers_outputs[clser]
 
-            lr = LogisticRegression('l2', C=inverse_regularisation, tol=1e-6)
+    def train(self, inverse_regularisation=1.0, verbose=True, n_jobs=1, work_dir=None):
+        """
+        Trains the classifiers.
 
-            lr.fit(classifier_input, self.classifiers_outputs[clser])
-            self.trained_classifiers[clser] = lr
+        The classifiers are independent and they can be trained by a pool of n_jobs processes. If a working directory
+        is given, the trained classifiers are checkpointed in it and the training can be resumed
+        (see alex.components.slu.training.train_classifiers).
 
-            if verbose:
-                mean_accuracy = lr.score(classifier_input, self.classifiers_outputs[clser])
-                print "  Prediction mean accuracy on the training data: %6.2f" % (100.0 * mean_accuracy, )
-                print "  Size of the params:", lr.coef_.shape
+        :param inverse_regularisation: the inverse of the regularisation strength of the logistic regression
+        :param verbose: whether to report the progress of the training
+        :param n_jobs: the number of the training processes
+        :param work_dir: the directory for the training data and the checkpoints of the classifiers
+        """
+        if verbose:
+            print '=' * 120
+            print 'Training'
+
+        classifiers = sorted(self.classifiers)
+        trained_classifiers = train_classifiers(classifiers, self.get_classifier_data, train_logistic_regression,
+                                                {'inverse_regularisation': inverse_regularisation, 'verbose': verbose},
+                                                n_jobs=n_jobs, work_dir=work_dir, verbose=verbose)
+        self.trained_classifiers = dict(zip(classifiers, trained_classifiers))
 
+        self.compile_inference()
 
     def save_model(self, file_name, gzip=None):
         data = [self.classifiers_features_list, self.classifiers_features_mapping, self.trained_classifiers,
@@ -709,6 +739,14 @@ class DAILogRegClassifier(SLUInterface):
             pickle.dump(data, outfile)
 
     def load_model(self, file_name):
+        """
+        Loads the model pickled by ``save_model`` or the compiled model stored by ``save_compiled_model`` if the file
+        name is a directory.
+        """
+        if os.path.isdir(file_name):
+            self.load_compiled_model(file_name)
+            return
+
         # Handle gzipped files.
         if file_name.endswith('gz'):
             import gzip
@@ -721,7 +759,243 @@ class DAILogRegClassifier(SLUInterface):
             (self.classifiers_features_list, self.classifiers_features_mapping, self.trained_classifiers,
              self.parsed_classifiers, self.features_size) = pickle.load(model_file)
 
+        self.compile_inference()
+
+    def compile_inference(self):
+        """
+        Precomputes the data structures used by ``parse_X_vectorized``:
+
+        - one feature index shared by all trained classifiers,
+        - a sparse matrix with the weights of all classifiers stacked in columns and a vector of their intercepts,
+        - the category label of each abstracted classifier (``None`` for the concrete classifiers).
+        """
+        self.inference_classifiers = list(self.trained_classifiers)
+
+        self.inference_features_mapping = {}
+        for clser in self.inference_classifiers:
+            for f in self.classifiers_features_list[clser]:
+                if f not in self.inference_features_mapping:
+                    self.inference_features_mapping[f] = len(self.inference_features_mapping)
+
+        data, rows, cols = [], [], []
+        self.inference_intercepts = np.zeros(len(self.inference_classifiers))
+        self.inference_cl_values = []
+        for j, clser in enumerate(self.inference_classifiers):
+            lr = self.trained_classifiers[clser]
+            coef = lr.coef_[0]
+            for i, f in enumerate(self.classifiers_features_list[clser]):
+                if coef[i] != 0.0:
+                    data.append(coef[i])
+                    rows.append(self.inference_features_mapping[f])
+                    cols.append(j)
+            self.inference_intercepts[j] = lr.intercept_[0]
+
+            value = self.parsed_classifiers[clser].value
+            self.inference_cl_values.append(value if value and value.startswith('CL_') else None)
+
+        self.inference_weights = csr_matrix((data, (rows, cols)),
+                                            shape=(len(self.inference_features_mapping),
+                                                   len(self.inference_classifiers)))
+        self.inference_vocabulary = None
+
+    def save_compiled_model(self, directory):
+        """
+        Stores the data structures used by ``parse_X_vectorized`` in the directory as .npy files which are
+        memory-mapped by ``load_compiled_model``:
+
+        - ``vocabulary.npy``: the sorted encoded features of all classifiers (see ``encode_feature``),
+        - ``weights.data.npy``, ``weights.indices.npy``, ``weights.indptr.npy``: the CSR matrix of the weights of
+          the classifiers stacked in columns, its rows correspond to the features in the vocabulary,
+        - ``intercepts.npy``: the intercepts of the classifiers,
+        - ``index.pickle``: the names of the classifiers, the size of the features and the version of the format.
+
+        The compiled model can be only used for the vectorized parsing.
+        """
+        if self.inference_classifiers is None:
+            self.compile_inference()
+
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+        if self.inference_vocabulary is not None:
+            vocabulary = np.asarray(self.inference_vocabulary)
+            weights = self.inference_weights
+        else:
+            features = [None] * len(self.inference_features_mapping)
+            for f, i in self.inference_features_mapping.iteritems():
+                features[i] = encode_feature(f)
+            features = np.array(features, dtype=bytes)
+
+            order = np.argsort(features, kind='mergesort')
+            vocabulary = features[order]
+            weights = self.inference_weights[order]
+
+            if len(vocabulary) > 1 and (vocabulary[1:] == vocabulary[:-1]).any():
+                raise DAILRException("The encoding of the features is ambiguous.")
+
+        weights = weights.tocsr()
+        weights.sort_indices()
+        np.save(os.path.join(directory, 'vocabulary.npy'), vocabulary)
+        np.save(os.path.join(directory, 'weights.data.npy'), weights.data)
+        np.save(os.path.join(directory, 'weights.indices.npy'), weights.indices)
+        np.save(os.path.join(directory, 'weights.indptr.npy'), weights.indptr)
+        np.save(os.path.join(directory, 'intercepts.npy'), self.inference_intercepts)
+
+        with open(os.path.join(directory, 'index.pickle'), 'wb') as f:
+            pickle.dump({'version': COMPILED_MODEL_VERSION,
+                         'classifiers': self.inference_classifiers,
+                         'features_size': self.features_size}, f, pickle.HIGHEST_PROTOCOL)
+
+    def load_compiled_model(self, directory):
+        """
+        Loads the model stored by ``save_compiled_model``. The arrays are memory-mapped, therefore they are loaded
+        lazily and shared by all processes using the same model.
+
+        The compiled model can be loaded only by a vectorized classifier.
+        """
+        if not self.vectorized:
+            raise DAILRException("The compiled model can be used only by the vectorized parser.")
+
+        with open(os.path.join(directory, 'index.pickle'), 'rb') as f:
+            index = pickle.load(f)
+
+        if index['version'] != COMPILED_MODEL_VERSION:
+            raise DAILRException("Unsupported version of the compiled model: {v}".format(v=index['version']))
+
+        def load(name):
+            return np.load(os.path.join(directory, name + '.npy'), mmap_mode='r')
+
+        self.features_size = index['features_size']
+        self.inference_classifiers = index['classifiers']
+        self.inference_vocabulary = load('vocabulary')
+        self.inference_weights = csr_matrix((load('weights.data'), load('weights.indices'), load('weights.indptr')),
+                                            shape=(len(self.inference_vocabulary), len(self.inference_classifiers)),
+                                            copy=False)
+        self.inference_intercepts = load('intercepts')
+
+        self.parsed_classifiers = {}
+        self.inference_cl_values = []
+        for clser in self.inference_classifiers:
+            self.parsed_classifiers[clser] = DialogueActItem()
+            self.parsed_classifiers[clser].parse(clser)
+
+            value = self.parsed_classifiers[clser].value
+            self.inference_cl_values.append(value if value and value.startswith('CL_') else None)
+
+        # only the vectorized parser can use the compiled model
+        self.inference_features_mapping = None
+        self.classifiers_features_list = None
+        self.classifiers_features_mapping = None
+        self.trained_classifiers = None
+
+    def get_inference_feature_vector(self, features):
+        """
+        Returns the values and the indexes of the features in the feature index of ``parse_X_vectorized``.
+
+        :param features: the Features instance
+        """
+        if self.inference_vocabulary is None:
+            return features.get_feature_vector_lil(self.inference_features_mapping)
+
+        if not len(features) or not len(self.inference_vocabulary):
+            return [], []
+
+        keys = list(features)
+        encoded = np.array([encode_feature(f) for f in keys], dtype=bytes)
+        indexes = np.searchsorted(self.inference_vocabulary, encoded)
+        indexes[indexes == len(self.inference_vocabulary)] = 0
+        found = np.flatnonzero(self.inference_vocabulary[indexes] == encoded)
+
+        return [features[keys[i]] for i in found], indexes[found]
+
     def parse_X(self, utterance, verbose=False):
+        if self.vectorized:
+            return self.parse_X_vectorized(utterance, verbose)
+
+        return self.parse_X_loop(utterance, verbose)
+
+    def parse_X_vectorized(self, utterance, verbose=False):
+        """
+        Parses the observation by evaluating all classifiers with one matrix multiplication.
+
+        The features are extracted once for the concrete classifiers and once for each form, value, category label
+        tuple found in the observation. The feature vectors are stacked in rows of a sparse matrix which is multiplied
+        by the stacked weights of all classifiers. The result is the same as the one of ``parse_X_loop``.
+
+        :param utterance: the utterance being processed in multiple formats
+        :return: the DialogueActConfusionNetwork instance
+        """
+        if self.inference_classifiers is None:
+            self.compile_inference()
+
+        if verbose:
+            print '='*120
+            print 'Parsing X (vectorized)'
+            print '-'*120
+            print unicode(utterance)
+
+        if self.preprocessing:
+            utterance = self.preprocessing.normalise(utterance)
+            utterance_fvcs = self.get_fvc(utterance)
+
+        if verbose:
+            print unicode(utterance)
+            print unicode(utterance_fvcs)
+
+        # the first row is used by the concrete classifiers, the other rows by the abstracted ones
+        fvcs = [(None, None, None), ] + [(f, v, "CL_" + c.upper()) for f, v, c in utterance_fvcs]
+
+        data, rows, cols = [], [], []
+        for i, fvc in enumerate(fvcs):
+            if i > 0 and fvc[2] not in self.inference_cl_values:
+                # no classifier will use these features
+                continue
+
+            classifiers_features = self.get_features(utterance, fvc, utterance_fvcs)
+            d, c = self.get_inference_feature_vector(classifiers_features)
+            data.extend(d)
+            cols.extend(c)
+            rows.extend([i, ] * len(c))
+
+        classifiers_inputs = csr_matrix((data, (rows, cols)), shape=(len(fvcs), self.inference_weights.shape[0]))
+        p = expit(classifiers_inputs.dot(self.inference_weights).toarray() + self.inference_intercepts)
+
+        da_confnet = DialogueActConfusionNetwork()
+        for j, clser in enumerate(self.inference_classifiers):
+            cl_value = self.inference_cl_values[j]
+
+            if cl_value:
+                # process abstracted classifiers
+                for i, (f, v, cc) in enumerate(fvcs):
+                    if i > 0 and cc == cl_value:
+                        if verbose:
+                            print "Using classifier: ", unicode(clser), v
+                            print '  Probability:', p[i, j]
+
+                        dai = DialogueActItem(self.parsed_classifiers[clser].dat, self.parsed_classifiers[clser].name, v)
+                        da_confnet.add_merge(p[i, j], dai, combine='max')
+            else:
+                # process concrete classifiers
+                if verbose:
+                    print "Using classifier: ", unicode(clser)
+                    print '  Probability:', p[0, j]
+
+                da_confnet.add_merge(p[0, j], self.parsed_classifiers[clser], combine='max')
+
+        da_confnet.sort().prune()
+
+        return da_confnet
+
+    def parse_X_loop(self, utterance, verbose=False):
+        """
+        Parses the observation by evaluating the classifiers one by one.
+
+        :param utterance: the utterance being processed in multiple formats
+        :return: the DialogueActConfusionNetwork instance
+        """
+        if self.trained_classifiers is None:
+            raise DAILRException("The compiled model can be used only by the vectorized parser.")
+
         if verbose:
             print '='*120
             print 'Parsing X'
@@ -7,22 +7,138 @@ This is a rewrite of the DAILogRegClassifier. This code uses Theano FFNN.
 from __future__ import unicode_literals
 
 import copy
+import random
 import numpy as np
 import cPickle as pickle
 
 from collections import defaultdict
+from itertools import islice
 from scipy.sparse import lil_matrix
 
 from alex.components.asr.utterance import Utterance, UtteranceHyp, UtteranceNBList, UtteranceConfusionNetwork
 from alex.components.slu.exceptions import DAILRException
 from alex.components.slu.base import SLUInterface
 from alex.components.slu.da import DialogueActItem, DialogueActConfusionNetwork
+from alex.components.slu.training import train_classifiers
 from alex.ml import tffnn
 from alex.utils.cache import lru_cache
 
 CONFNET2NBLIST_EXPANSION_APPROX = 40
 
 
+def train_nn(n, clser, classifier_input, classifier_output, verbose=True):
+    """
+    Trains the neural network classifier of the dialogue act item.
+
+    The random generators are seeded by the index of the classifier, so that the result does not depend on
+    the order in which the classifiers are trained.
+
+    :return: the parameters of the trained network or None if no network was trained
+    """
+    np.random.seed(n)
+    random.seed(n)
+
+    if verbose:
+        print '-' * 120
+        print "Training classifier: ", clser, ' #', n+1
+        print "  Matrix:            ", classifier_input.shape
+
+    # the data can be read-only memory-mapped arrays
+    classifier_input = np.array(classifier_input, dtype=np.float32)
+
+    # standardise the data
+    m = np.mean(classifier_input, axis=0)
+    std = np.std(classifier_input, axis=0)
+    # replace 0.0 std by 1.0
+    inds = np.where(np.isclose(std, 0.0))
+    std[inds] = 1.0
+
+    m = np.zeros_like(m)
+    std = np.ones_like(std)
+
+    classifier_input -= m
+    classifier_input /= std
+
+    indices = np.random.permutation(classifier_input.shape[0])
+    training_data_size = int(0.9*len(indices))
+    training_idx, test_idx = indices[:training_data_size], indices[training_data_size:]
+    training_input, crossvalid_input = classifier_input[training_idx,:], classifier_input[test_idx,:]
+    training_output, crossvalid_output = classifier_output[training_idx,], classifier_output[test_idx,]
+
+    if not np.isclose(training_output, 1.0).any():
+        print "Warning! At least one example should be positive"
+        training_output[0] = 1
+
+    # lr = LogisticRegression('l2', C=inverse_regularisation, tol=1e-3)
+    #
+    # lr.fit(training_input, training_output)
+
+
+    method = 'sg-fixedlr'
+    hact = 'tanh'
+    learning_rate = 20e-3 # 5e-2
+    learning_rate_decay = 1000.0
+    batch_size = 10
+
+    nn = tffnn.TheanoFFNN(training_input.shape[1], 16, 0, 2, hidden_activation = hact, weight_l2 = 1e-16,
+                 training_set_x = training_input, training_set_y = training_output,
+                 batch_size = batch_size)
+    nn.set_input_norm(m, std)
+
+    trained_nn = None
+    max_crossvalid_mean_accuracy = 0.0
+    for epoch in range(200):
+        if verbose:
+            print "Epoch", epoch
+
+        predictions_y = nn.predict(training_input, batch_size = batch_size)
+        training_mean_accuracy = np.mean(np.equal(np.argmax(predictions_y, axis=1), training_output))*100.0
+
+        if verbose:
+            print "  Prediction accuracy on the training data: %6.2f" % (training_mean_accuracy, )
+            print "                    the training data size: ",  training_input.shape
+
+        predictions_y = nn.predict(crossvalid_input, batch_size = batch_size)
+
+        crossvalid_mean_accuracy = np.mean(np.equal(np.argmax(predictions_y, axis=1), crossvalid_output))*100.0
+
+        if verbose:
+            print "  Prediction accuracy on the crossvalid data: %6.2f" % (crossvalid_mean_accuracy, )
+            print "                    the crossvalid data size: ",  crossvalid_input.shape
+
+
+        if max_crossvalid_mean_accuracy < crossvalid_mean_accuracy:
+            if verbose:
+                print "  Storing the best classifiers so far"
+            trained_nn = nn
+            max_crossvalid_mean_accuracy = crossvalid_mean_accuracy
+
+
+        if training_mean_accuracy >= 99.99 or max_crossvalid_mean_accuracy >= 99.99:
+            if verbose:
+                print "  Stop: It does not have to be better"
+            break
+
+        if verbose:
+            print "  Training "
+        nn.train(method = method, learning_rate=learning_rate*learning_rate_decay/(learning_rate_decay+epoch))
+
+
+    # if verbose:
+    #     training_mean_accuracy = lr.score(training_input, training_output)
+    #     print "  Prediction mean accuracy on the training data: %6.2f" % (100.0 * training_mean_accuracy, )
+    #     print "                         the training data size: ",  training_input.shape
+    #     crossvalid_mean_accuracy = lr.score(crossvalid_input, crossvalid_output)
+    #     print "  Prediction mean accuracy on the crossvalid data: %6.2f" % (100.0 * crossvalid_mean_accuracy, )
+    #     print "                         the crossvalid data size: ",  crossvalid_input.shape
+    #     print "  Size of the classifier's params:", lr.coef_.shape
+
+    if trained_nn is None:
+        return None
+
+    return trained_nn.get_params()
+
+
 class Features(object):
     """
     This is a simple feature object. It is a light version of an unnecessary complicated alex.ml.features.Features class.
@@ -198,31 +314,13 @@ class DAINNClassifier(SLUInterface):
 
         abs_utts = []
 
-        start = 0
-        while start < len(utterance):
-            end = len(utterance)
-            while end > start:
-                f = tuple(utterance[start:end])
-                #print start, end
-                #print f
-
-                if f in self.cldb.form2value2cl:
-                    for v in self.cldb.form2value2cl[f]:
-                        for c in self.cldb.form2value2cl[f][v]:
-                            u = copy.deepcopy(utterance)
-                            u = u.replace2(start, end, 'CL_' + c.upper())
-
-                            abs_utts.append((u, f, v, c))
-
-                    #print f
-
-                    # skip all substring for this form
-                    start = end
-                    break
-                end -= 1
-            else:
-                start += 1
+        for start, end, f in self.cldb.find_forms(utterance):
+            for v in self.cldb.form2value2cl[f]:
+                for c in self.cldb.form2value2cl[f][v]:
+                    u = copy.deepcopy(utterance)
+                    u = u.replace2(start, end, 'CL_' + c.upper())
 
+                    abs_utts.append((u, f, v, c))
 
         return abs_utts
 
@@ -241,23 +339,8 @@ class DAINNClassifier(SLUInterface):
         if not form:
             return abs_utt
 
-        start = 0
-        while start < len(utterance):
-            end = len(utterance)
-            while end > start:
-                f = tuple(utterance[start:end])
-                #print start, end
-                #print f, form
-
-                if f == form:
-                    abs_utt = abs_utt.replace2(start, end, c)
-
-                    # skip all substring for this form
-                    start = end
-                    break
-                end -= 1
-            else:
-                start += 1
+        for start, end in self.cldb.find_form(utterance, form):
+            abs_utt = abs_utt.replace2(start, end, c)
 
         return abs_utt
 
@@ -271,25 +354,10 @@ class DAINNClassifier(SLUInterface):
 
         abs_utt = copy.deepcopy(utterance)
 
-        start = 0
-        while start < len(utterance):
-            end = len(utterance)
-            while end > start:
-                f = tuple(utterance[start:end])
-                #print start, end
-                #print f
-
-                if f in self.cldb.form2value2cl:
-                    for v in self.cldb.form2value2cl[f]:
-                        for c in self.cldb.form2value2cl[f][v]:
-                            abs_utt = abs_utt.replace2(start, end, 'CL_OTHER_' + c.upper())
-
-                    # skip all substring for this form
-                    start = end
-                    break
-                end -= 1
-            else:
-                start += 1
+        for start, end, f in self.cldb.find_forms(utterance):
+            for v in self.cldb.form2value2cl[f]:
+                for c in self.cldb.form2value2cl[f][v]:
+                    abs_utt = abs_utt.replace2(start, end, 'CL_OTHER_' + c.upper())
 
         return abs_utt
 
@@ -323,26 +391,13 @@ class DAINNClassifier(SLUInterface):
 
         fvcs = set()
 
-        start = 0
-        while start < len(utterance):
-            end = len(utterance)
-            while end > start:
-                f = tuple(utterance[start:end])
-
-                # this looks for an exact surface form in the CLDB
-                # however, we could also search for those withing a some distance from the exact surface form,
-                # for example using a string edit distance
-                if f in self.cldb.form2value2cl:
-                    for v in self.cldb.form2value2cl[f]:
-                        for c in self.cldb.form2value2cl[f][v]:
-                            fvcs.add((f, v, c))
-
-                    # skip all substring for this form
-                    start = end
-                    break
-                end -= 1
-            else:
-                start += 1
+        # this looks for an exact surface form in the CLDB
+        # however, we could also search for those withing a some distance from the exact surface form,
+        # for example using a string edit distance
+        for start, end, f in self.cldb.find_forms(utterance):
+            for v in self.cldb.form2value2cl[f]:
+                for c in self.cldb.form2value2cl[f][v]:
+                    fvcs.add((f, v, c))
 
         return fvcs
 
@@ -369,9 +424,11 @@ class DAINNClassifier(SLUInterface):
         :param nblist: an UtteranceConfusionNetwork instance
         :return: a list of form, value, and category label tuples found in the input sentence
         """
-        nblist = confnet.get_utterance_nblist(n=CONFNET2NBLIST_EXPANSION_APPROX)
+        fvcs = set()
+        for p, u in islice(confnet.gen_utterance_nbest(), CONFNET2NBLIST_EXPANSION_APPROX):
+            fvcs.update(self.get_fvc_in_utterance(u))
 
-        return self.get_fvc_in_confnet(nblist)
+        return fvcs
 
     @lru_cache(maxsize=1000)
     def get_fvc(self, obs):
@@ -425,7 +482,7 @@ class DAINNClassifier(SLUInterface):
 
         feat = UtteranceFeatures(size=self.features_size)
 
-        scale_p = [p for p, u in nblist]
+        scale_p = nblist.get_probs()
         #scale_p[0] = 1.0
 
         for i, (p, u) in enumerate(nblist):
@@ -663,109 +720,34 @@ class DAINNClassifier(SLUInterface):
 
             self.prune_features(clser, min_pos_feature_count, min_neg_feature_count, verbose = (verbose or verbose2))
 
-    def train(self, inverse_regularisation=1.0, verbose=True):
-        self.trained_classifiers = {}
+    def get_classifier_data(self, clser):
+        classifier_input = np.zeros((len(self.classifiers_outputs[clser]), len(self.classifiers_features_list[clser])), dtype=np.float32)
+        for i, feat in enumerate(self.classifiers_features[clser]):
+            classifier_input[i] = feat.get_feature_vector(self.classifiers_features_mapping[clser])
+
+        return classifier_input, self.classifiers_outputs[clser]
 
+    def train(self, inverse_regularisation=1.0, verbose=True, n_jobs=1, work_dir=None):
+        """
+        Trains the classifiers.
+
+        The classifiers are independent and they can be trained by a pool of n_jobs processes. If a working directory
+        is given, the trained classifiers are checkpointed in it and the training can be resumed
+        (see alex.components.slu.training.train_classifiers).
+        """
         if verbose:
             print '=' * 120
             print 'Training'
 
-        for n, clser in enumerate(sorted(self.classifiers)):
-            if verbose:
-                print '-' * 120
-                print "Training classifier: ", clser, ' #', n+1 , '/', len(self.classifiers)
-                print "  Matrix:            ", (len(self.classifiers_outputs[clser]), len(self.classifiers_features_list[clser]))
-
-            classifier_input = np.zeros((len(self.classifiers_outputs[clser]), len(self.classifiers_features_list[clser])), dtype=np.float32)
-            for i, feat in enumerate(self.classifiers_features[clser]):
-                classifier_input[i] = feat.get_feature_vector(self.classifiers_features_mapping[clser])
-
-
-            # standardise the data
-            m = np.mean(classifier_input, axis=0)
-            std = np.std(classifier_input, axis=0)
-            # replace 0.0 std by 1.0
-            inds = np.where(np.isclose(std, 0.0))
-            std[inds] = 1.0
-
-            m = np.zeros_like(m)
-            std = np.ones_like(std)
-            
-            classifier_input -= m
-            classifier_input /= std
-
-            indices = np.random.permutation(classifier_input.shape[0])
-            training_data_size = int(0.9*len(indices))
-            training_idx, test_idx = indices[:training_data_size], indices[training_data_size:]
-            training_input, crossvalid_input = classifier_input[training_idx,:], classifier_input[test_idx,:]
-            training_output, crossvalid_output = self.classifiers_outputs[clser][training_idx,], self.classifiers_outputs[clser][test_idx,]
-
-            if not np.isclose(training_output, 1.0).any():
-                print "Warning! At least one example should be positive"
-                training_output[0] = 1
-
-            # lr = LogisticRegression('l2', C=inverse_regularisation, tol=1e-3)
-            #
-            # lr.fit(training_input, training_output)
-
+        classifiers = sorted(self.classifiers)
+        trained_params = train_classifiers(classifiers, self.get_classifier_data, train_nn, {'verbose': verbose},
+                                           n_jobs=n_jobs, work_dir=work_dir, verbose=verbose)
 
-            method = 'sg-fixedlr'
-            hact = 'tanh'
-            learning_rate = 20e-3 # 5e-2
-            learning_rate_decay = 1000.0
-            batch_size = 10
-
-            nn = tffnn.TheanoFFNN(training_input.shape[1], 16, 0, 2, hidden_activation = hact, weight_l2 = 1e-16,
-                         training_set_x = training_input, training_set_y = training_output,
-                         batch_size = batch_size)
-            nn.set_input_norm(m, std)
-
-            max_crossvalid_mean_accuracy = 0.0
-            for epoch in range(200):
-                if verbose:
-                    print "Epoch", epoch
-
-                predictions_y = nn.predict(training_input, batch_size = batch_size)
-                training_mean_accuracy = np.mean(np.equal(np.argmax(predictions_y, axis=1), training_output))*100.0
-
-                if verbose:
-                    print "  Prediction accuracy on the training data: %6.2f" % (training_mean_accuracy, )
-                    print "                    the training data size: ",  training_input.shape
-
-                predictions_y = nn.predict(crossvalid_input, batch_size = batch_size)
-
-                crossvalid_mean_accuracy = np.mean(np.equal(np.argmax(predictions_y, axis=1), crossvalid_output))*100.0
-
-                if verbose:
-                    print "  Prediction accuracy on the crossvalid data: %6.2f" % (crossvalid_mean_accuracy, )
-                    print "                    the crossvalid data size: ",  crossvalid_input.shape
-
-
-                if max_crossvalid_mean_accuracy < crossvalid_mean_accuracy:
-                    if verbose:
-                        print "  Storing the best classifiers so far"
-                    self.trained_classifiers[clser] = nn
-                    max_crossvalid_mean_accuracy = crossvalid_mean_accuracy
-
-
-                if training_mean_accuracy >= 99.99 or max_crossvalid_mean_accuracy >= 99.99:
-                    if verbose:
-                        print "  Stop: It does not have to be better"
-                    break
-
-                if verbose:
-                    print "  Training "
-                nn.train(method = method, learning_rate=learning_rate*learning_rate_decay/(learning_rate_decay+epoch))
-
-
-            # if verbose:
-            #     training_mean_accuracy = lr.score(training_input, training_output)
-            #     print "  Prediction mean accuracy on the training data: %6.2f" % (100.0 * training_mean_accuracy, )
-            #     print "                         the training data size: ",  training_input.shape
-            #     crossvalid_mean_accuracy = lr.score(crossvalid_input, crossvalid_output)
-            #     print "  Prediction mean accuracy on the crossvalid data: %6.2f" % (100.0 * crossvalid_mean_accuracy, )
-            #     print "                         the crossvalid data size: ",  crossvalid_input.shape
-            #     print "  Size of the classifier's params:", lr.coef_.shape
+        self.trained_classifiers = {}
+        for clser, params in zip(classifiers, trained_params):
+            if params is not None:
+                self.trained_classifiers[clser] = tffnn.TheanoFFNN()
+                self.trained_classifiers[clser].set_params(params)
 
     def save_model(self, file_name, gzip=None):
         self.trained_classifiers_params = {}
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+if __name__ == "__main__":
+    import autopath
+
+import unittest
+
+from alex.components.asr.utterance import Utterance
+from alex.components.slu.base import CategoryLabelDatabase
+
+
+class db:
+    database = {
+        "task": {
+            "find_connection": ["find connection", "find a connection", "connection"],
+            "find_platform": ["find platform", "find a platform from"],
+        },
+        "stop": {
+            "Central Station": ["central station", "central", "station"],
+            "Central Park": ["central park"],
+        },
+        "time": {
+            "now": ["now", "right now", "as soon as possible"],
+        },
+    }
+
+
+class TestCategoryLabelDatabase(unittest.TestCase):
+    def setUp(self):
+        self.cldb = CategoryLabelDatabase()
+        self.cldb.load(db_mod=db)
+
+    def find_forms_substrings(self, utterance):
+        """Finds the surface forms by testing all substrings from the longest to the shortest."""
+        forms = []
+
+        start = 0
+        while start < len(utterance):
+            end = len(utterance)
+            while end > start:
+                f = tuple(utterance[start:end])
+
+                if f in self.cldb.form2value2cl:
+                    forms.append((start, end, f))
+                    start = end
+                    break
+                end -= 1
+            else:
+                start += 1
+
+        return forms
+
+    def test_find_forms(self):
+        for text in ['find a connection from central park right now',
+                     'find a platform from central station',
+                     'find a platform central as soon as now',
+                     'as soon as possible',
+                     'right right now station',
+                     'central central park park',
+                     'hello world',
+                     '']:
+            utterance = Utterance(text)
+            self.assertEqual(list(self.cldb.find_forms(utterance)), self.find_forms_substrings(utterance))
+
+    def find_form_substrings(self, utterance, form):
+        """Finds the form by testing all substrings from the longest to the shortest."""
+        spans = []
+
+        start = 0
+        while start < len(utterance):
+            end = len(utterance)
+            while end > start:
+                if tuple(utterance[start:end]) == form:
+                    spans.append((start, end))
+                    start = end
+                    break
+                end -= 1
+            else:
+                start += 1
+
+        return spans
+
+    def test_find_form(self):
+        for text in ['find a connection from central park right now',
+                     'central central park park central',
+                     'right right now now',
+                     '']:
+            utterance = Utterance(text)
+            for form in [('central', ), ('central', 'park'), ('right', 'now'), ('now', ), ('hello', 'world')]:
+                self.assertEqual(list(self.cldb.find_form(utterance, form)),
+                                 self.find_form_substrings(utterance, form))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -36,6 +36,19 @@ class TestDA(unittest.TestCase):
 
         self.assertEqual(nblist1, nblist2)
 
+    def test_nblist_merge(self):
+        nblist = DialogueActNBList()
+        nblist.add(0.4, DialogueAct("inform(food=czech)&inform(area=north)"))
+        nblist.add(0.3, DialogueAct("hello()"))
+        nblist.add(0.2, DialogueAct("inform(area=north)&inform(food=czech)"))
+        nblist.add(0.1, DialogueAct("other()"))
+        nblist.merge().add_other()
+
+        self.assertEqual(len(nblist), 3)
+        self.assertAlmostEqual(nblist[0][0], 0.6)
+        self.assertEqual(nblist[0][1], DialogueAct("inform(food=czech)&inform(area=north)"))
+        self.assertEqual(nblist[2][1], DialogueAct("other()"))
+
     def test_merge_slu_nblists_full_nbest_lists(self):
         # make sure the alex.components.slu.da.merge_slu_nblists merges nblists correctly
 
@@ -258,6 +271,14 @@ class TestDialogueActConfusionNetwork(TestCase):
         expected_da = DialogueAct(da_str='inform(food=czech)&inform(food=russian)')
         self.assertEqual(best_da, expected_da)
 
+        # the hypotheses less probable than prune_prob are not generated
+        probs = [p for p, da in dacn.gen_da_nbest()]
+        self.assertAlmostEqual(probs[0], 0.95 * 0.9 * 0.9)
+        self.assertAlmostEqual(sum(probs), 1.0)
+
+        nblist = dacn.get_da_nblist(prune_prob=0.05)
+        self.assertEqual(len(nblist.n_best), len([p for p in probs if p >= 0.05]) + 1)
+
     def test_prune(self):
         dacn = DialogueActConfusionNetwork()
         dacn.add(0.05, DialogueActItem(dai='inform(food=chinese)'))
@@ -1,5 +1,8 @@
 # encoding: utf8
+import glob
 import os
+import shutil
+import tempfile
 
 from unittest import TestCase
 from alex.components.slu.dailrclassifier import DAILogRegClassifier
@@ -7,9 +10,10 @@ from alex.components.slu.dailrclassifier import DAILogRegClassifier
 from alex.components.slu.base import CategoryLabelDatabase, SLUPreprocessing
 from alex.components.asr.utterance import Utterance, UtteranceNBList
 from alex.components.slu.da import DialogueAct, DialogueActItem
+from alex.components.slu.exceptions import DAILRException
 
 class TestDAILogRegClassifier(TestCase):
-    def test_parse_X(self):
+    def _train_classifier(self, n_jobs=1, work_dir=None):
         cldb = CategoryLabelDatabase()
         class db:
             database = {
@@ -50,7 +54,12 @@ class TestDAILogRegClassifier(TestCase):
                                  min_neg_feature_count=0,
                                  verbose2=False)
 
-        clf.train(inverse_regularisation=1e1, verbose=False)
+        clf.train(inverse_regularisation=1e1, verbose=False, n_jobs=n_jobs, work_dir=work_dir)
+
+        return clf
+
+    def test_parse_X(self):
+        clf = self._train_classifier()
 
         # Parse some sentences.
         utterance_list = UtteranceNBList()
@@ -62,4 +71,84 @@ class TestDAILogRegClassifier(TestCase):
 
 
         self.assertTrue(da_confnet.get_prob(DialogueActItem(dai='inform(task=weather)')) > 0.5)
-        self.assertTrue(da_confnet.get_prob(DialogueActItem(dai='inform(time=now)')) < 0.5)
\ No newline at end of file
+        self.assertTrue(da_confnet.get_prob(DialogueActItem(dai='inform(time=now)')) < 0.5)
+
+    def test_parse_X_vectorized(self):
+        clf = self._train_classifier()
+
+        for utterance in [Utterance('pocasi'), Utterance('hned jak bude pocasi'), Utterance('najít spojení teď')]:
+            da_confnet_loop = clf.parse_X_loop(utterance)
+            da_confnet_vectorized = clf.parse_X_vectorized(utterance)
+
+            self.assertEqual(len(da_confnet_loop), len(da_confnet_vectorized))
+            for p, dai in da_confnet_loop:
+                self.assertAlmostEqual(p, da_confnet_vectorized.get_prob(dai))
+
+    def test_classifier_input(self):
+        clf = self._train_classifier()
+
+        for clser in clf.classifiers:
+            # the features of the concrete classifiers are shared, not extracted again
+            if not clf.parsed_classifiers[clser].value:
+                for utt_idx, feat in zip(clf.utterances_list, clf.classifiers_features[clser]):
+                    self.assertIs(feat, clf.features_cache[(utt_idx, (None, None, None))])
+
+            classifier_input = clf.get_classifier_input(clser).toarray()
+            for row, feat in zip(classifier_input, clf.classifiers_features[clser]):
+                self.assertEqual(list(row), list(feat.get_feature_vector(clf.classifiers_features_mapping[clser])))
+
+    def test_parallel_training(self):
+        clf = self._train_classifier()
+
+        work_dir = tempfile.mkdtemp()
+        try:
+            for n_jobs in [2, 1]:
+                # the second training is resumed from the checkpoints of the first one
+                clf_parallel = self._train_classifier(n_jobs=n_jobs, work_dir=work_dir)
+                checkpoints = glob.glob(os.path.join(work_dir, '*.checkpoint.pickle'))
+                self.assertEqual(len(checkpoints), len(clf.classifiers))
+                if n_jobs == 2:
+                    for checkpoint in checkpoints:
+                        os.utime(checkpoint, (0, 0))
+                else:
+                    self.assertTrue(all(os.path.getmtime(checkpoint) == 0 for checkpoint in checkpoints))
+
+                self.assertEqual(sorted(clf_parallel.trained_classifiers), sorted(clf.trained_classifiers))
+                for clser, lr in clf.trained_classifiers.items():
+                    self.assertEqual(list(lr.coef_[0]), list(clf_parallel.trained_classifiers[clser].coef_[0]))
+                    self.assertEqual(list(lr.intercept_), list(clf_parallel.trained_classifiers[clser].intercept_))
+        finally:
+            shutil.rmtree(work_dir)
+
+    def test_compiled_model(self):
+        clf = self._train_classifier()
+
+        directory = tempfile.mkdtemp()
+        try:
+            clf.save_compiled_model(directory)
+
+            clf_compiled = DAILogRegClassifier(clf.cldb, clf.preprocessing)
+            clf_compiled.load_model(directory)
+            self.assertEqual(clf_compiled.features_size, clf.features_size)
+
+            for utterance in [Utterance('pocasi'), Utterance('hned jak bude pocasi'), Utterance('najít spojení teď'),
+                              Utterance('')]:
+                da_confnet = clf.parse_X(utterance)
+                da_confnet_compiled = clf_compiled.parse_X(utterance)
+
+                self.assertEqual(len(da_confnet), len(da_confnet_compiled))
+                for p, dai in da_confnet:
+                    self.assertAlmostEqual(p, da_confnet_compiled.get_prob(dai))
+
+            # a compiled model can be stored again
+            directory2 = os.path.join(directory, 'copy')
+            clf_compiled.save_compiled_model(directory2)
+            for name in ['vocabulary.npy', 'weights.data.npy', 'intercepts.npy']:
+                with open(os.path.join(directory, name), 'rb') as f1, open(os.path.join(directory2, name), 'rb') as f2:
+                    self.assertEqual(f1.read(), f2.read())
+
+            # the loop parser cannot use the compiled model, so it is refused when it is loaded
+            clf_loop = DAILogRegClassifier(clf.cldb, clf.preprocessing, vectorized=False)
+            self.assertRaises(DAILRException, clf_loop.load_model, directory)
+        finally:
+            shutil.rmtree(directory)
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+if __name__ == "__main__":
+    import autopath
+
+import glob
+import multiprocessing
+import os
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+from alex.components.slu.training import train_classifiers
+
+
+def get_classifier_data(clser):
+    return (np.arange(10, dtype=np.float64).reshape((5, 2)), np.arange(5))
+
+
+def train_failing(n, clser, X, y):
+    if clser == 'fails':
+        raise ValueError(clser)
+
+    # the other workers are still training when the failure is reported
+    time.sleep(0.2)
+    return float(X.sum())
+
+
+class TestTrainClassifiers(unittest.TestCase):
+    def test_failed_worker(self):
+        work_dirs = set(glob.glob(os.path.join(tempfile.gettempdir(), 'slu_training_*')))
+
+        self.assertRaises(ValueError, train_classifiers, ['fails', 'a', 'b', 'c'], get_classifier_data,
+                          train_failing, n_jobs=2, verbose=False)
+
+        # the pool is stopped before its working directory is removed
+        self.assertEqual(multiprocessing.active_children(), [])
+        self.assertEqual(set(glob.glob(os.path.join(tempfile.gettempdir(), 'slu_training_*'))), work_dirs)
+
+        self.assertEqual(train_classifiers(['a', 'b'], get_classifier_data, train_failing, n_jobs=2, verbose=False),
+                         [45.0, 45.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Training of the independent dialogue act item classifiers of the DAI SLU parsers in a pool of processes.
+
+The training data of every classifier are stored as .npy files in a working directory and the worker processes
+memory-map them, so the data are not sent to the workers through pipes and they are shared by them in the page cache.
+The trained classifier is stored in a checkpoint next to its data. When the training is run again with the same
+working directory, the classifiers whose data and training parameters did not change are loaded from the checkpoints
+instead of being trained again.
+"""
+
+import cPickle as pickle
+import hashlib
+import os
+import os.path
+import shutil
+import tempfile
+import time
+
+from itertools import imap, izip
+from multiprocessing import Pool
+
+import numpy as np
+import scipy.sparse
+
+
+def get_classifier_file_prefix(work_dir, clser):
+    """Returns the prefix of the names of the files with the data and the checkpoint of the classifier."""
+    return os.path.join(work_dir, hashlib.md5(clser.encode('utf-8')).hexdigest())
+
+
+def save_arrays(prefix, arrays):
+    """
+    Saves the arrays as .npy files starting with the prefix. A scipy.sparse matrix is stored in the CSR format as its
+    data, indices and indptr arrays.
+
+    :return: the md5 signature of the stored arrays
+    """
+    signature = hashlib.md5()
+    layout = []
+    for i, a in enumerate(arrays):
+        if scipy.sparse.issparse(a):
+            a = a.tocsr()
+            parts = [a.data, a.indices, a.indptr]
+            layout.append(a.shape)
+        else:
+            parts = [a]
+            layout.append(None)
+
+        for j, part in enumerate(parts):
+            part = np.ascontiguousarray(part)
+            np.save('%s.%d.%d.npy' % (prefix, i, j), part)
+            signature.update(str(part.dtype) + str(part.shape))
+            signature.update(part.data)
+
+    with open(prefix + '.layout.pickle', 'wb') as f:
+        pickle.dump(layout, f, pickle.HIGHEST_PROTOCOL)
+    signature.update(repr(layout))
+
+    return signature.hexdigest()
+
+
+def load_arrays(prefix):
+    """Memory-maps the arrays saved by save_arrays()."""
+    with open(prefix + '.layout.pickle', 'rb') as f:
+        layout = pickle.load(f)
+
+    arrays = []
+    for i, shape in enumerate(layout):
+        if shape is None:
+            arrays.append(np.load('%s.%d.0.npy' % (prefix, i), mmap_mode='r'))
+        else:
+            data, indices, indptr = [np.load('%s.%d.%d.npy' % (prefix, i, j), mmap_mode='r') for j in range(3)]
+            arrays.append(scipy.sparse.csr_matrix((data, indices, indptr), shape=shape, copy=False))
+
+    return arrays
+
+
+def load_checkpoint(prefix, signature):
+    """
+    Returns a one-tuple with the classifier stored in the checkpoint if it was trained from the data with
+    the signature, otherwise None.
+    """
+    try:
+        with open(prefix + '.checkpoint.pickle', 'rb') as f:
+            checkpoint_signature, result = pickle.load(f)
+    except (IOError, EOFError, pickle.UnpicklingError):
+        return None
+
+    if checkpoint_signature != signature:
+        return None
+
+    return (result, )
+
+
+def save_checkpoint(prefix, signature, result):
+    # the checkpoint is written to a temporary file first so that an interrupted training never leaves a partial one
+    with open(prefix + '.checkpoint.pickle.tmp', 'wb') as f:
+        pickle.dump((signature, result), f, pickle.HIGHEST_PROTOCOL)
+    os.rename(prefix + '.checkpoint.pickle.tmp', prefix + '.checkpoint.pickle')
+
+
+def _train_classifier(args):
+    train_classifier, n, clser, prefix, signature, train_args = args
+
+    result = train_classifier(n, clser, *load_arrays(prefix), **train_args)
+    save_checkpoint(prefix, signature, result)
+
+    return result
+
+
+def train_classifiers(classifiers, get_classifier_data, train_classifier, train_args=None,
+                      n_jobs=1, work_dir=None, verbose=True):
+    """
+    Trains the classifiers and returns a list of the results in the order of the classifiers.
+
+    The training data of a classifier are returned by ``get_classifier_data(clser)`` as a tuple of numpy arrays and
+    scipy.sparse matrices. The classifier is trained by ``train_classifier(n, clser, *data, **train_args)``, where n is
+    the index of the classifier, and the returned result must be picklable. In the parallel training, the function
+    must be defined at the module level and it gets the data as read-only memory-mapped arrays.
+
+    If n_jobs is 1 and no working directory is given, the classifiers are trained one by one in this process without
+    storing their data. Otherwise, the data are stored in the working directory, or in a temporary directory, and the
+    classifiers are trained by a pool of n_jobs processes. The checkpoints in the working directory are reused
+    when the training is run again.
+
+    :param classifiers: a list of the names of the classifiers
+    :param get_classifier_data: a function returning the training data of a classifier
+    :param train_classifier: a function training a classifier from its data
+    :param train_args: a dictionary of additional keyword arguments of train_classifier
+    :param n_jobs: the number of the training processes
+    :param work_dir: the directory for the training data and the checkpoints
+    :param verbose: whether to report the progress
+    """
+    train_args = train_args or {}
+    start_time = time.time()
+
+    def report_progress(n, clser, n_trained, n_to_train):
+        if verbose:
+            elapsed = time.time() - start_time
+            print "Trained classifier #%d/%d %s (%d/%d trained, elapsed: %.0f s, ETA: %.0f s)" % \
+                  (n + 1, len(classifiers), clser, n_trained, n_to_train, elapsed,
+                   elapsed / n_trained * (n_to_train - n_trained))
+
+    if n_jobs == 1 and work_dir is None:
+        results = []
+        for n, clser in enumerate(classifiers):
+            results.append(train_classifier(n, clser, *get_classifier_data(clser), **train_args))
+            report_progress(n, clser, n + 1, len(classifiers))
+
+        return results
+
+    remove_work_dir = work_dir is None
+    if work_dir is None:
+        work_dir = tempfile.mkdtemp(prefix='slu_training_')
+    elif not os.path.exists(work_dir):
+        os.makedirs(work_dir)
+
+    try:
+        # the training function and its parameters are a part of the signature of the checkpoint
+        train_signature = '%s.%s%r' % (train_classifier.__module__, train_classifier.__name__,
+                                       sorted(train_args.items()))
+
+        results = [None] * len(classifiers)
+        tasks = []
+        for n, clser in enumerate(classifiers):
+            prefix = get_classifier_file_prefix(work_dir, clser)
+            signature = save_arrays(prefix, get_classifier_data(clser))
+            signature = hashlib.md5(signature + train_signature).hexdigest()
+
+            checkpoint = load_checkpoint(prefix, signature)
+            if checkpoint is None:
+                tasks.append((train_classifier, n, clser, prefix, signature, train_args))
+            else:
+                results[n] = checkpoint[0]
+
+        if verbose:
+            print "Classifiers loaded from the checkpoints: %d, classifiers to train: %d" % \
+                  (len(classifiers) - len(tasks), len(tasks))
+
+        pool = None
+        try:
+            if n_jobs == 1:
+                trained = imap(_train_classifier, tasks)
+            else:
+                pool = Pool(n_jobs)
+                trained = pool.imap(_train_classifier, tasks)
+
+            # the results arrive in the order of the tasks, therefore the result does not depend on the scheduling
+            for n_trained, ((_, n, clser, _, _, _), result) in enumerate(izip(tasks, trained), start=1):
+                results[n] = result
+                report_progress(n, clser, n_trained, len(tasks))
+        finally:
+            # the workers must be stopped before the working directory is removed, also when one of them failed
+            if pool is not None:
+                pool.terminate()
+
+        return results
+    finally:
+        if remove_work_dir:
+            shutil.rmtree(work_dir)
@@ -1,9 +1,13 @@
 #!/usr/bin/env python
 # coding: utf-8
 
+import alex.utils.cache as cache
+
+
 class TTSInterface(object):
     def __init__(self, cfg):
         self.cfg = cfg
+        cache.configure_persistent_cache(cfg)
 
     def synthesize(self, text):
         raise NotImplementedError("TTS")
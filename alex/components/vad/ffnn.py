@@ -3,14 +3,12 @@
 
 from collections import deque
 import numpy as np
-from scipy.misc import logsumexp
-import struct
 
-from math import log
+from math import fsum
 
 from alex.components.asr.exceptions import ASRException
 from alex.ml.tffnn import TheanoFFNN
-from alex.utils.mfcc import MFCCFrontEnd
+from alex.utils.mfcc import MFCCFrontEnd, frame_signal
 
 
 class FFNNVADGeneral(object):
@@ -18,19 +16,23 @@ class FFNNVADGeneral(object):
 
     It only implements decisions whether input frame is speech of non speech.
     It returns the posterior probability of speech for N last input frames.
+
+    All complete frames of the input data are scored by one pass of the neural network and the posterior
+    probability of speech is smoothed by a running average updated in constant time per frame.
     """
     def __init__(self, model, filter_length, sample_rate, framesize, frameshift,
                  usehamming, preemcoef, numchans,  ceplifter, numceps,
                  enormalise, zmeansource, usepower, usec0, usecmn, usedelta,
                  useacc, n_last_frames, n_prev_frames, lofreq, hifreq,
                  mel_banks_only):
-        self.audio_recorded_in = []
+        self.audio_recorded_in = np.zeros(0, dtype=np.int16)
 
         self.ffnn = TheanoFFNN()
         self.ffnn.load(model)
 
-        self.log_probs_speech = deque(maxlen=filter_length)
-        self.log_probs_sil = deque(maxlen=filter_length)
+        self.log_posteriors_speech = deque(maxlen=filter_length)
+        self.log_posteriors_speech_sum = 0.0
+        self.n_smoothed_frames = 0
 
         self.last_decision = 0.0
 
@@ -57,36 +59,58 @@ class FFNNVADGeneral(object):
         It returns 1.0 for 100% speech segment and 0.0 for 100% non speech segment.
         """
 
-        data = struct.unpack('%dh' % (len(data) / 2, ), data)
-        self.audio_recorded_in.extend(data)
+        self.decide_frames(data)
 
-        while len(self.audio_recorded_in) > self.framesize:
-            frame = self.audio_recorded_in[:self.framesize]
-            self.audio_recorded_in = self.audio_recorded_in[self.frameshift:]
+        # returns a speech / non-speech decisions
+        return self.last_decision
 
-            mfcc = self.front_end.param(frame)
+    def decide_frames(self, data):
+        """Processes all complete frames of the input data at once.
 
-            prob_sil, prob_speech = self.ffnn.predict_normalise(mfcc.reshape(1,len(mfcc)))[0]
+        It returns an array with the smoothed posterior probability of speech after each processed frame.
+        """
 
-            # print prob_sil, prob_speech
+        data = np.frombuffer(data, dtype=np.int16)
+        self.audio_recorded_in = np.append(self.audio_recorded_in, data)
 
-            self.log_probs_speech.append(log(prob_speech))
-            self.log_probs_sil.append(log(prob_sil))
+        # a frame is processed only when there are more than framesize samples in the buffer
+        frames = frame_signal(self.audio_recorded_in[:-1], self.framesize, self.frameshift)
+        self.audio_recorded_in = self.audio_recorded_in[len(frames) * self.frameshift:]
 
-            log_prob_speech_avg = 0.0
-            for log_prob_speech, log_prob_sil in zip(self.log_probs_speech, self.log_probs_sil):
-                log_prob_speech_avg += log_prob_speech - logsumexp([log_prob_speech, log_prob_sil])
-            log_prob_speech_avg /= len(self.log_probs_speech)
+        if not len(frames):
+            return np.zeros(0)
 
-            prob_speech_avg = np.exp(log_prob_speech_avg)
+        mfcc = self.front_end.param_block(frames)
+        probs = np.asarray(self.ffnn.predict_normalise(mfcc), dtype=np.float64)
 
-            # print 'prob_speech_avg: %5.3f' % prob_speech_avg
+        log_probs_sil = np.log(probs[:, 0])
+        log_probs_speech = np.log(probs[:, 1])
+        log_posteriors_speech = log_probs_speech - np.logaddexp(log_probs_speech, log_probs_sil)
 
-            self.last_decision = prob_speech_avg
+        decisions = np.array([self.smooth(log_posterior_speech) for log_posterior_speech in log_posteriors_speech])
 
-        # returns a speech / non-speech decisions
-        return self.last_decision
+        # print 'prob_speech_avg: %5.3f' % decisions[-1]
+
+        self.last_decision = decisions[-1]
 
+        return decisions
+
+    def smooth(self, log_posterior_speech):
+        """Adds the log posterior probability of speech of a new frame and returns the posterior probability
+        of speech averaged in the log domain over the last filter_length frames.
+        """
+        if len(self.log_posteriors_speech) == self.log_posteriors_speech.maxlen:
+            self.log_posteriors_speech_sum -= self.log_posteriors_speech[0]
+        self.log_posteriors_speech.append(log_posterior_speech)
+
+        self.n_smoothed_frames += 1
+        if self.n_smoothed_frames % self.log_posteriors_speech.maxlen == 0:
+            # recompute the sum once per filter length so that the rounding errors do not accumulate
+            self.log_posteriors_speech_sum = fsum(self.log_posteriors_speech)
+        else:
+            self.log_posteriors_speech_sum += log_posterior_speech
+
+        return np.exp(self.log_posteriors_speech_sum / len(self.log_posteriors_speech))
 
 
 class FFNNVAD(FFNNVADGeneral):
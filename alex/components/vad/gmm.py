@@ -4,11 +4,10 @@
 from collections import deque
 import numpy as np
 from scipy.misc import logsumexp
-import struct
 
 from alex.components.asr.exceptions import ASRException
 from alex.ml.gmm import GMM
-from alex.utils.mfcc import MFCCFrontEnd
+from alex.utils.mfcc import MFCCFrontEnd, frame_signal
 
 
 class GMMVAD():
@@ -20,7 +19,7 @@ class GMMVAD():
     def __init__(self, cfg):
         self.cfg = cfg
 
-        self.audio_recorded_in = []
+        self.audio_recorded_in = np.zeros(0, dtype=np.int16)
 
         self.gmm_speech = GMM()
         self.gmm_speech.load_model(self.cfg['VAD']['gmm']['speech_model'])
@@ -53,18 +52,23 @@ class GMMVAD():
         It returns 1.0 for 100% speech segment and 0.0 for 100% non speech segment.
         """
 
-        data = struct.unpack('%dh' % (len(data) / 2, ), data)
-        self.audio_recorded_in.extend(data)
+        data = np.frombuffer(data, dtype=np.int16)
+        self.audio_recorded_in = np.append(self.audio_recorded_in, data)
 
-        while len(self.audio_recorded_in) > self.cfg['VAD']['gmm']['framesize']:
-            frame = self.audio_recorded_in[:self.cfg['VAD']['gmm']['framesize']]
-            self.audio_recorded_in = self.audio_recorded_in[self.cfg['VAD']['gmm']['frameshift']:]
+        # a frame is processed only when there are more than framesize samples in the buffer
+        frames = frame_signal(self.audio_recorded_in[:-1], self.cfg['VAD']['gmm']['framesize'],
+                              self.cfg['VAD']['gmm']['frameshift'])
+        self.audio_recorded_in = self.audio_recorded_in[len(frames) * self.cfg['VAD']['gmm']['frameshift']:]
 
-            mfcc = self.front_end.param(frame)
+        mfccs = self.front_end.param_block(frames)
+        if not len(mfccs):
+            return self.last_decision
 
-            log_prob_speech = self.gmm_speech.score(mfcc)
-            log_prob_sil = self.gmm_sil.score(mfcc)
+        # all new frames are scored at once
+        log_probs_speech = self.gmm_speech.score_block(mfccs)
+        log_probs_sil = self.gmm_sil.score_block(mfccs)
 
+        for log_prob_speech, log_prob_sil in zip(log_probs_speech, log_probs_sil):
             self.log_probs_speech.append(log_prob_speech)
             self.log_probs_sil.append(log_prob_sil)
 
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+if __name__ == "__main__":
+    import autopath
+
+import unittest
+
+from collections import deque
+from math import log
+
+import numpy as np
+from scipy.misc import logsumexp
+
+import alex.components.vad.ffnn
+from alex.components.vad.ffnn import FFNNVADGeneral
+
+
+class StubFFNN(object):
+    """A deterministic replacement of the neural network which scores every frame independently."""
+
+    def load(self, model):
+        pass
+
+    def predict_normalise(self, mfcc):
+        probs_speech = 0.05 + 0.9 * (0.5 + 0.5 * np.sin(np.asarray(mfcc).sum(axis=1)))
+        return np.column_stack([1.0 - probs_speech, probs_speech])
+
+
+class PerFrameVAD(object):
+    """The frame by frame processing of the FFNN VAD before the decisions were batched."""
+
+    def __init__(self, vad):
+        self.vad = vad
+        self.audio_recorded_in = []
+        self.log_probs_speech = deque(maxlen=vad.log_posteriors_speech.maxlen)
+        self.log_probs_sil = deque(maxlen=vad.log_posteriors_speech.maxlen)
+        self.last_decision = 0.0
+        self.decisions = []
+
+    def decide(self, data):
+        self.audio_recorded_in.extend(np.frombuffer(data, dtype=np.int16).tolist())
+
+        while len(self.audio_recorded_in) > self.vad.framesize:
+            frame = self.audio_recorded_in[:self.vad.framesize]
+            self.audio_recorded_in = self.audio_recorded_in[self.vad.frameshift:]
+
+            mfcc = self.vad.front_end.param(frame)
+
+            prob_sil, prob_speech = self.vad.ffnn.predict_normalise(mfcc.reshape(1, len(mfcc)))[0]
+
+            self.log_probs_speech.append(log(prob_speech))
+            self.log_probs_sil.append(log(prob_sil))
+
+            log_prob_speech_avg = 0.0
+            for log_prob_speech, log_prob_sil in zip(self.log_probs_speech, self.log_probs_sil):
+                log_prob_speech_avg += log_prob_speech - logsumexp([log_prob_speech, log_prob_sil])
+            log_prob_speech_avg /= len(self.log_probs_speech)
+
+            self.last_decision = np.exp(log_prob_speech_avg)
+            self.decisions.append(self.last_decision)
+
+        return self.last_decision
+
+
+class TestFFNNVADGeneral(unittest.TestCase):
+    def setUp(self):
+        self.theano_ffnn = alex.components.vad.ffnn.TheanoFFNN
+        alex.components.vad.ffnn.TheanoFFNN = StubFFNN
+
+        # one second of white noise with bursts of louder noise, it has about ten filter lengths of frames
+        random = np.random.RandomState(0)
+        audio = random.randn(8000) * 300
+        audio[2000:4000] *= 10
+        audio[6000:6500] *= 10
+        self.audio = np.clip(audio, -32768, 32767).astype(np.int16).tostring()
+
+    def tearDown(self):
+        alex.components.vad.ffnn.TheanoFFNN = self.theano_ffnn
+
+    def create_vad(self):
+        return FFNNVADGeneral(model=None, filter_length=5, sample_rate=8000, framesize=512, frameshift=160,
+                              usehamming=True, preemcoef=0.97, numchans=26, ceplifter=22, numceps=12,
+                              enormalise=True, zmeansource=True, usepower=True, usec0=False, usecmn=False,
+                              usedelta=False, useacc=False, n_last_frames=3, n_prev_frames=2,
+                              lofreq=125, hifreq=3800, mel_banks_only=True)
+
+    def test_decide(self):
+        # the chunks smaller than the frame shift often have no complete frame
+        for chunk_samples in [77, 160, 1000, 8000]:
+            reference = PerFrameVAD(self.create_vad())
+            vad = self.create_vad()
+            frames_vad = self.create_vad()
+
+            frames_decisions = []
+            for i in range(0, len(self.audio), 2 * chunk_samples):
+                chunk = self.audio[i:i + 2 * chunk_samples]
+
+                self.assertAlmostEqual(vad.decide(chunk), reference.decide(chunk))
+                frames_decisions.extend(frames_vad.decide_frames(chunk))
+
+            # the running sum was recomputed several times
+            self.assertGreater(len(reference.decisions), 8 * vad.log_posteriors_speech.maxlen)
+            self.assertEqual(vad.n_smoothed_frames, len(reference.decisions))
+            self.assertTrue(np.allclose(frames_decisions, reference.decisions))
+            self.assertEqual(len(vad.audio_recorded_in), len(reference.audio_recorded_in))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,21 +10,21 @@ if __name__ == '__main__':
     import autopath
 
 import os
+import codecs
 import errno
-import xml.dom.minidom
+import xml.etree.cElementTree as ElementTree
 import fnmatch
 import argparse
 import time
 import multiprocessing
-import random
 
-import alex.utils.various as various
+from itertools import imap
 
 from alex.components.asr.common import asr_factory
 from alex.components.asr.utterance import Utterance
 from alex.components.hub.messages import Frame
 from alex.corpustools.text_norm_cs import normalise_text, exclude_lm
-from alex.corpustools.wavaskey import save_wavaskey, load_wavaskey
+from alex.corpustools.wavaskey import save_wavaskey, iter_wavaskey
 from alex.corpustools.asrscore import score
 from alex.utils.config import Config
 from alex.utils.audio import load_wav, wav_duration
@@ -32,6 +32,16 @@ from alex.utils.audio import load_wav, wav_duration
 asr = None
 cfg = None
 
+# the file to which the results are appended as soon as the wavs are decoded
+DECODED_FILE_NAME = 'decoded.txt'
+
+def init_worker(config):
+    """Creates the ASR of a decoding process."""
+    global asr, cfg
+
+    cfg = config
+    asr = asr_factory(cfg)
+
 def save_lattice(lat, output_dir, wav_path):
     lat.write(os.path.join(output_dir, os.path.basename(wav_path).replace('wav','fst')))
 
@@ -77,16 +87,17 @@ def decode_info(p):
     """
     output_dir, wav_path, reference = p
 
-
-    print "-"*120
-    print
-    print '    Wav file:  %s' % str(wav_path)
-    print
-    print '    Reference: %s' % reference
-
+    # the report is printed at once, so that the reports of the parallel workers are not interleaved
+    info = []
+    info.append("-"*120)
+    info.append('')
+    info.append('    Wav file:  %s' % unicode(wav_path))
+    info.append('')
+    info.append('    Reference: %s' % reference)
 
     if not os.path.exists(wav_path):
-        print "Does not exists!"
+        info.append("Does not exists!")
+        print '\n'.join(info)
         return '', 0.11, 0.1, 0.1, wav_path
 
     wav_dur = wav_duration(wav_path)
@@ -96,14 +107,15 @@ def decode_info(p):
     dec_dur = max(rec_in_dur, wav_dur) + hyp_out_dur
     best = unicode(dec_trans.get_best())
 
-    print '    Decoded:   %s' % best
-    print '    Wav dur:   %.2f' % wav_dur
-    print '    Dec dur:   %.2f' % dec_dur
-    print '    FW dur:    %.2f' % fw_dur
+    info.append('    Decoded:   %s' % best)
+    info.append('    Wav dur:   %.2f' % wav_dur)
+    info.append('    Dec dur:   %.2f' % dec_dur)
+    info.append('    FW dur:    %.2f' % fw_dur)
 
-    print
-    print '    NBest list:'
-    print '    ' + u'\n    '.join(['%.5f %s' % (p, t) for p, t in dec_trans.n_best if p > 0.0001])
+    info.append('')
+    info.append('    NBest list:')
+    info.append('    ' + u'\n    '.join(['%.5f %s' % (p, t) for p, t in dec_trans.n_best if p > 0.0001]))
+    print '\n'.join(info)
 
     return best, dec_dur, fw_dur, wav_dur, wav_path
 
@@ -208,123 +220,158 @@ def compute_save_stat(outdir, trn_dict, dec_dict, wavlen_dict, declen_dict, fwle
     score(reference, hypothesis)
 
 
-def decode_with_reference(reference, outdir, num_workers):
+def parse_decoded(line):
+    """Parses the value of a line of the file with the decoded wavs."""
+    dec_dur, fw_dur, wav_dur, best = (line.split(' ', 3) + [''])[:4]
+    return best, float(dec_dur), float(fw_dur), float(wav_dur)
+
+
+def format_decoded(best, dec_dur, fw_dur, wav_dur, wav_path):
+    """Formats a result of decode_info() as a line of the file with the decoded wavs."""
+    return '{key} => {dec_dur!r} {fw_dur!r} {wav_dur!r} {best}\n'.format(
+        key=wav_path, dec_dur=dec_dur, fw_dur=fw_dur, wav_dur=wav_dur, best=best)
+
+
+def decode(references, outdir, cfg, num_workers=1, resume=False):
     """
-    Launch the decoding
+    Decodes the wavs and computes the statistics.
+
+    The references are consumed lazily, so the wavs are decoded while the references are still being read.
+    Every decoded wav is immediately appended to the file DECODED_FILE_NAME in outdir. With resume,
+    the wavs already recorded in this file are not decoded again.
 
     Args:
-        reference(str): Path to file with references in Alex reference format.
+        references(iterable): (Wave path, reference transcription) pairs
         outdir(str): Path to directory where to save log files.
         cfg(dict): Alex configuration file
+        num_workers(int): number of decoding processes, each of them with its own ASR
+        resume(bool): whether to skip the wavs decoded by a previous run
     """
-    trn_dict = load_wavaskey(reference, Utterance)
-    declen_dict, fwlen_dict, wavlen_dict, dec_dict = {}, {}, {}, {}
+    decoded_file_name = os.path.join(outdir, DECODED_FILE_NAME)
+
+    decoded = {}
+    if resume and os.path.exists(decoded_file_name):
+        decoded = dict(iter_wavaskey(decoded_file_name, parse_decoded))
+        print 'Resuming: %d wavs were already decoded' % len(decoded)
+
+    trn_dict = {}
 
-    params = [ (outdir, wav_path, reference) for wav_path, reference in trn_dict.items()]
-    random.shuffle(params)
+    def gen_params():
+        for wav_path, reference in references:
+            trn_dict[wav_path] = reference
 
+            if wav_path not in decoded:
+                yield outdir, wav_path, reference
+
+    pool = None
     if num_workers > 1:
-        p_decode_wavs = multiprocessing.Pool(num_workers)
-        decoded_wavs = p_decode_wavs.map(decode_info, params, 100)
+        pool = multiprocessing.Pool(num_workers, init_worker, (cfg, ))
+        decoded_wavs = pool.imap_unordered(decode_info, gen_params(), 4)
     else:
-        decoded_wavs = []
+        if asr is None:
+            init_worker(cfg)
+        decoded_wavs = imap(decode_info, gen_params())
 
-        for p in params:
-            decoded_wavs.append(decode_info(p))
+    start = time.time()
+    n_decoded, decoded_wav_dur = 0, 0.0
+    decoded_file = codecs.open(decoded_file_name, 'a' if resume else 'w', encoding='UTF-8')
+    try:
+        for best, dec_dur, fw_dur, wav_dur, wav_path in decoded_wavs:
+            decoded[wav_path] = best, dec_dur, fw_dur, wav_dur
+            n_decoded += 1
+            decoded_wav_dur += wav_dur
 
-    for best, dec_dur, fw_dur, wav_dur, wav_path in decoded_wavs:
+            decoded_file.write(format_decoded(best, dec_dur, fw_dur, wav_dur, wav_path))
+            decoded_file.flush()
+    except:
+        print 'PARTIAL RESULTS were saved to %s' % decoded_file_name
+        raise
+    finally:
+        decoded_file.close()
+        if pool is not None:
+            pool.terminate()
+    elapsed = time.time() - start
+
+    dec_dict, declen_dict, fwlen_dict, wavlen_dict = {}, {}, {}, {}
+    for wav_path in trn_dict:
+        best, dec_dur, fw_dur, wav_dur = decoded[wav_path]
         dec_dict[wav_path] = best
         wavlen_dict[wav_path] = wav_dur
         declen_dict[wav_path] = dec_dur
         fwlen_dict[wav_path] = fw_dur
 
-    # compute_rt_factor(outdir, trn_dict, dec_dict, wavlen_dict, declen_dict, fwlen_dict)
-
-    # for wav_path, reference in sorted(trn_dict.items()):
-    #     best, dec_dur, fw_dur, wav_dur, wav_path = decode_info(asr, cfg, outdir, wav_path, reference)
-    #     dec_dict[wav_path] = best
-    #     wavlen_dict[wav_path] = wav_dur
-    #     declen_dict[wav_path] = dec_dur
-    #     fwlen_dict[wav_path] = fw_dur
-    #
-    #     compute_rt_factor(outdir, trn_dict, dec_dict, wavlen_dict, declen_dict, fwlen_dict)
+    print
+    print """    # decoded wavs:          %d""" % n_decoded
+    print """    # workers:               %d""" % num_workers
+    print """    Wall clock time:         %f""" % elapsed
+    if decoded_wav_dur:
+        # the RTF of the whole run, it decreases with the number of workers
+        print """    Wall clock RTF:          %f""" % (elapsed / decoded_wav_dur)
 
     compute_save_stat(outdir, trn_dict, dec_dict, wavlen_dict, declen_dict, fwlen_dict)
 
 
-def extract_from_xml(indomain_data_dir, outdir, cfg):
-    """Extract transcription and Waves from xml
+def gen_references(reference):
+    """
+    Reads the wavs and their references from a file in the wavaskey format.
+
+    Args:
+        reference(str): Path to file with references in Alex reference format.
+    """
+    for wav_path, utterance in iter_wavaskey(reference, Utterance):
+        yield wav_path, utterance
+
+
+def get_xml_text(el):
+    """Returns the text of the element without the text of its children."""
+    return ''.join([el.text or ''] + [child.tail or '' for child in el]).strip()
+
+
+def gen_xml_references(indomain_data_dir):
+    """
+    Walks the call logs and extracts the wavs and their transcriptions from the asr_transcribed.xml files.
+
+    The files are parsed incrementally and the turns are released as soon as they are processed.
 
     Args:
         indomain_data_dir(path): path where the xml logs are stored
-        outdir: directory to save the references and wave, Wav file names pairs
-        cfg: Alex configuration
     """
 
     glob = 'asr_transcribed.xml'
-    asr = asr_factory(cfg)
 
     print 'Collecting files under %s with glob %s' % (indomain_data_dir, glob)
-    files = []
     for root, dirnames, filenames in os.walk(indomain_data_dir, followlinks=True):
         for filename in fnmatch.filter(filenames, glob):
-            files.append(os.path.join(root, filename))
+            fn = os.path.join(root, filename)
 
-    # DEBUG example
-    # files = [
-    #     '/ha/projects/vystadial/data/call-logs/2013-05-30-alex-aotb-prototype/part1/2013-06-27-09-33-25.116055-CEST-00420221914256/asr_transcribed.xml']
+            for event, turn in ElementTree.iterparse(fn):
+                if turn.tag != 'turn':
+                    continue
 
-    try:
-        trn, dec, dec_len, wav_len = [], [], [], []
-        for fn in files:
-            doc = xml.dom.minidom.parse(fn)
-            turns = doc.getElementsByTagName("turn")
-            f_dir = os.path.dirname(fn)
-
-            for turn in turns:
-                if turn.getAttribute('speaker') != 'user':
+                if turn.get('speaker') != 'user':
+                    turn.clear()
                     continue
 
-                recs = turn.getElementsByTagName("rec")
-                trans = turn.getElementsByTagName("asr_transcription")
+                recs = turn.findall(".//rec")
+                trans = turn.findall(".//asr_transcription")
 
                 if len(recs) != 1:
-                    print "Skipping a turn {turn} in file: {fn} - recs: {recs}".format(turn=turn.getAttribute('turn_number'), fn=fn, recs=len(recs))
-                    continue
-
-                if len(trans) == 0:
+                    print "Skipping a turn {turn} in file: {fn} - recs: {recs}".format(turn=turn.get('turn_number'), fn=fn, recs=len(recs))
+                elif len(trans) == 0:
                     print "Skipping a turn in {fn} - trans: {trans}".format(fn=fn, trans=len(trans))
-                    continue
+                else:
+                    wav_file = recs[0].get('fname')
+                    # FIXME: Check whether the last transcription is really the best! FJ
+                    t = normalise_text(get_xml_text(trans[-1]))
 
-                wav_file = recs[0].getAttribute('fname')
-                # FIXME: Check whether the last transcription is really the best! FJ
-                t = various.get_text_from_xml_node(trans[-1])
-                t = normalise_text(t)
+                    if not exclude_lm(t):
+                        # TODO is it still valid? OP
+                        # The silence does not have a label in the language model.
+                        t = t.replace('_SIL_', '')
 
-                if exclude_lm(t):
-                    continue
+                        yield os.path.join(root, wav_file), t
 
-                # TODO is it still valid? OP
-                # The silence does not have a label in the language model.
-                t = t.replace('_SIL_', '')
-                trn.append((wav_file, t))
-
-                wav_path = os.path.join(f_dir, wav_file)
-                best, dec_dur, fw_dur, wav_dur = decode_info(asr, cfg, outdir, wav_path, t)
-                dec.append((wav_file, best))
-                wav_len.append((wav_file, wav_dur))
-                dec_len.append((wav_file, dec_dur))
-
-    except Exception as e:
-        print 'PARTIAL RESULTS were saved to %s' % outdir
-        print e
-        raise e
-    finally:
-        trn_dict = dict(trn)
-        dec_dict = dict(dec)
-        wavlen_dict = dict(wav_len)
-        declen_dict = dict(dec_len)
-        compute_save_stat(outdir, trn_dict, dec_dict, wavlen_dict, declen_dict)
+                turn.clear()
 
 
 if __name__ == '__main__':
@@ -340,6 +387,8 @@ if __name__ == '__main__':
                         help='If out-dir exists write the results there anyway')
     parser.add_argument('-n', '--num-workers', action="store", default=1, type=int,
                         help='number of workers used for ASR: default %d' % 1)
+    parser.add_argument('-r', '--resume', default=False, action='store_true',
+                        help='Do not decode again the wavs already decoded in the out-dir directory')
 
     subparsers = parser.add_subparsers(dest='command',
                                        help='Either extract wav list from xml or expect reference and wavs')
@@ -356,7 +405,7 @@ if __name__ == '__main__':
     args = parser.parse_args()
 
     if os.path.exists(args.out_dir):
-        if not args.f:
+        if not args.f and not args.resume:
             print "\nThe directory '%s' already exists!\n" % args.out_dir
             parser.print_usage()
             parser.exit()
@@ -369,11 +418,10 @@ if __name__ == '__main__':
                 raise exc
 
     cfg = Config.load_configs(args.configs, use_default=True)
-    asr = asr_factory(cfg)
 
     if args.command == 'extract':
-        extract_from_xml(args.indomain_data_dir, args.out_dir, cfg)
+        decode(gen_xml_references(args.indomain_data_dir), args.out_dir, cfg, args.num_workers, args.resume)
     elif args.command == 'load':
-        decode_with_reference(args.reference, args.out_dir, args.num_workers)
+        decode(gen_references(args.reference), args.out_dir, cfg, args.num_workers, args.resume)
     else:
         raise Exception('Argparse mechanism failed: Should never happen')
@@ -7,11 +7,82 @@ if __name__ == '__main__':
 
 import re
 import argparse
+import codecs
 import sys
 
-from alex.corpustools.wavaskey import load_wavaskey
+from itertools import imap
+from multiprocessing import Pool
+
+from alex.corpustools.wavaskey import load_wavaskey, iter_wavaskey
 from alex.components.asr.utterance import Utterance
-from alex.utils.text import min_edit_dist, min_edit_ops
+from alex.utils.text import min_edit_alignment
+from alex.utils.various import gen_bins, gen_last_items
+
+non_speech_event_re = re.compile(ur"\b_\w+_\b", flags=re.UNICODE)
+
+def get_words(utterance):
+    """Returns the lowercased words of the utterance without the non-speech events."""
+    return non_speech_event_re.sub(r"",unicode(utterance).lower()).split()
+
+def score_utterance(ref, test):
+    """
+    Aligns the words of a test utterance to the words of a reference utterance.
+
+    :return: a tuple with numbers of insertions, deletions, substitutions, and reference words, and the alignment
+        as a list of pairs of test and reference words
+    """
+    r = get_words(ref)
+    t = get_words(test)
+    i, d, s, alignment = min_edit_alignment(t, r)
+
+    return i, d, s, len(r), alignment
+
+def _score_utterances(items):
+    return [(utt_idx, ) + score_utterance(ref, test) for utt_idx, ref, test in items]
+
+def gen_utterance_scores(items, n_jobs=1, chunk_size=1000):
+    """
+    Scores the utterances, with n_jobs > 1 in a pool of processes which get chunks of the utterances.
+
+    :param items: an iterable of (utterance id, reference utterance, test utterance)
+    :return: a generator of the results of score_utterance() prefixed with the utterance id in the order of items
+    """
+    chunks = gen_bins(items, chunk_size)
+
+    if n_jobs > 1:
+        pool = Pool(n_jobs)
+        try:
+            for results in pool.imap(_score_utterances, chunks):
+                for result in results:
+                    yield result
+        finally:
+            pool.terminate()
+    else:
+        for results in imap(_score_utterances, chunks):
+            for result in results:
+                yield result
+
+def summarise(ii, dd, ss, nn):
+    """
+    :return: a tuple with percentages of correct, substitutions, deletions, insertions, error rate, and a number of reference words.
+    """
+    ii, dd, ss, nn = float(ii), float(dd), float(ss), float(nn)
+
+    return (nn-ss-dd)/nn*100, ss/nn*100, dd/nn*100, ii/nn*100, (ss+dd+ii)/nn*100, nn
+
+def format_alignment(utt_idx, alignment):
+    """Formats the alignment as the reference and the test words below each other, errors are uppercased."""
+    ref_words, test_words = [], []
+    for t, r in alignment:
+        t = '*' * len(r) if t is None else t
+        r = '*' * len(t) if r is None else r
+        if t != r:
+            t, r = t.upper(), r.upper()
+        width = max(len(t), len(r))
+        ref_words.append(r.ljust(width))
+        test_words.append(t.ljust(width))
+
+    return "{key}\n  Ref: {r}\n  Tst: {t}\n".format(key=utt_idx, r=' '.join(ref_words), t=' '.join(test_words))
 
 def score_file(reftext, testtext):
     """
@@ -21,34 +92,51 @@ def score_file(reftext, testtext):
     :param testtext:
     :return: a tuple with percentages of correct, substitutions, deletions, insertions, error rate, and a number of reference words.
     """
-    ii, dd, ss, nn = 0.0, 0.0, 0.0, 0.0
+    ii, dd, ss, nn = 0, 0, 0, 0
 
     for utt_idx in sorted(reftext):
-        r = re.sub(ur"\b_\w+_\b",r"",unicode(reftext[utt_idx]).lower(),flags=re.UNICODE).split()
-        t = re.sub(ur"\b_\w+_\b",r"",unicode(testtext[utt_idx]).lower(),flags=re.UNICODE).split()
-#        r = unicode(reftext[utt_idx]).lower().split()
-#        t = unicode(testtext[utt_idx]).lower().split()
-        i, d, s = min_edit_ops(t, r)
+        i, d, s, n, alignment = score_utterance(reftext[utt_idx], testtext[utt_idx])
 
         ii += i
         dd += d
         ss += s
+        nn += n
 
-        nn += len(r)
+    return summarise(ii, dd, ss, nn)
 
-#        print "Ref:", unicode(r)
-#        print "Tst:", unicode(t)
-#        print i, d, s, len(r)
-#        print ii, dd, ss, nn
-#        print
+def score(fn_reftext, fn_testtext, outfile = sys.stdout, n_jobs = 1, alignment_file = None):
+    """
+    Scores the test file against the reference file and writes the summary table.
 
-    return (nn-ss-dd)/nn*100, ss/nn*100, dd/nn*100, ii/nn*100, (ss+dd+ii)/nn*100, nn
+    The reference file is streamed, only the test utterances are loaded into the memory. As in load_wavaskey(), only
+    the last utterance of a repeated utterance id is scored.
 
-def score(fn_reftext, fn_testtext, outfile = sys.stdout):
-    reftext  = load_wavaskey(fn_reftext, Utterance)
+    :param n_jobs: a number of processes scoring the utterances
+    :param alignment_file: a name of a file to which the alignments of the utterances are written in the order of
+        the reference file
+    """
     testtext = load_wavaskey(fn_testtext, Utterance)
+    items = ((utt_idx, ref, testtext[utt_idx])
+             for utt_idx, ref in gen_last_items(lambda: iter_wavaskey(fn_reftext, Utterance)))
+
+    alignment_outfile = codecs.open(alignment_file, 'w', encoding='UTF-8') if alignment_file else None
+
+    ii, dd, ss, nn, num_sents = 0, 0, 0, 0, 0
+    try:
+        for utt_idx, i, d, s, n, alignment in gen_utterance_scores(items, n_jobs):
+            ii += i
+            dd += d
+            ss += s
+            nn += n
+            num_sents += 1
+
+            if alignment_outfile:
+                alignment_outfile.write(format_alignment(utt_idx, alignment))
+    finally:
+        if alignment_outfile:
+            alignment_outfile.close()
 
-    corr, sub, dels, ins, wer, nwords = score_file(reftext, testtext)
+    corr, sub, dels, ins, wer, nwords = summarise(ii, dd, ss, nn)
 
     m ="""
     Please note that the scoring is implicitly ignoring all non-speech events.
@@ -60,7 +148,7 @@ def score(fn_reftext, fn_testtext, outfile = sys.stdout):
     |----------------------------------------------------------------------------------------------|
     | Sum/Avg    |{num_sents:^14}|{num_words:^11.0f}|{corr:^10.2f}|{sub:^10.2f}|{dels:^10.2f}|{ins:^10.2f}|{wer:^10.2f}|
     |==============================================================================================|
-    """.format(r=fn_reftext, t=fn_testtext, num_sents = len(reftext), num_words = nwords, corr=corr, sub = sub, dels = dels, ins = ins, wer = wer)
+    """.format(r=fn_reftext, t=fn_testtext, num_sents = num_sents, num_words = nwords, corr=corr, sub = sub, dels = dels, ins = ins, wer = wer)
 
     outfile.write(m)
     outfile.write("\n")
@@ -83,8 +171,12 @@ if __name__ == '__main__':
 
     parser.add_argument('refsem', action="store", help='a file with reference semantics')
     parser.add_argument('testsem', action="store", help='a file with tested semantics')
+    parser.add_argument('-j', action="store", default=1, type=int, dest="n_jobs",
+                        help='a number of processes scoring the utterances')
+    parser.add_argument('-a', action="store", default=None, dest="alignment_file",
+                        help='a file to which the alignments of the utterances are written')
 
     args = parser.parse_args()
 
-    score(args.refsem, args.testsem)
+    score(args.refsem, args.testsem, n_jobs=args.n_jobs, alignment_file=args.alignment_file)
                                         
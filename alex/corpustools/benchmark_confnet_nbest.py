@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Measures the time needed to expand the confusion networks logged in the call logs into n-best lists.
+
+It reads the ASR and SLU confusion networks from the session.xml files found in the given call log directories
+and compares the lazy expansion by get_utterance_nblist() and get_da_nblist() with the original expansion which
+kept the open hypotheses in a list sorted after every expansion.
+"""
+
+if __name__ == "__main__":
+    import autopath
+
+import argparse
+import os
+import time
+import xml.dom.minidom
+
+from alex.components.asr.utterance import UtteranceConfusionNetwork, UtteranceNBList
+from alex.components.slu.da import DialogueActItem, DialogueActConfusionNetwork, DialogueActNBList
+
+
+def get_text(el):
+    return ''.join(node.data for node in el.childNodes if node.nodeType == node.TEXT_NODE).strip()
+
+
+def load_confnets(call_log_dirs):
+    """Returns the lists of the ASR and SLU confusion networks logged in the session.xml files."""
+    asr_confnets = []
+    slu_confnets = []
+
+    for call_log_dir in call_log_dirs:
+        for root, dirs, files in os.walk(call_log_dir):
+            if 'session.xml' not in files:
+                continue
+
+            doc = xml.dom.minidom.parse(os.path.join(root, 'session.xml'))
+
+            for asr in doc.getElementsByTagName('asr'):
+                for cn_el in asr.getElementsByTagName('confnet'):
+                    cn = UtteranceConfusionNetwork()
+                    for was in cn_el.getElementsByTagName('word_alternatives'):
+                        cn.add([[float(w.getAttribute('p')), get_text(w)] for w in was.getElementsByTagName('word')])
+                    asr_confnets.append(cn.sort())
+
+            for slu in doc.getElementsByTagName('slu'):
+                for cn_el in slu.getElementsByTagName('confnet'):
+                    cn = DialogueActConfusionNetwork()
+                    for sas in cn_el.getElementsByTagName('dai_alternatives'):
+                        dai = sas.getElementsByTagName('dai')[0]
+                        cn.add(float(dai.getAttribute('p')), DialogueActItem(dai=get_text(dai)))
+                    slu_confnets.append(cn)
+
+    return asr_confnets, slu_confnets
+
+
+def get_utterance_nblist_sorted_list(confnet, n):
+    """Reproduces UtteranceConfusionNetwork.get_utterance_nblist() before the lazy expansion."""
+    open_hyp = []
+    closed_hyp = {}
+
+    best_hyp = tuple([0] * len(confnet._cn))
+    open_hyp.append((confnet.get_prob(best_hyp), best_hyp))
+
+    i = 0
+    while open_hyp and i < n:
+        i += 1
+
+        current_prob, current_hyp_index = open_hyp.pop(0)
+
+        if current_hyp_index not in closed_hyp:
+            closed_hyp[current_hyp_index] = current_prob
+
+            for hyp_index in confnet.get_next_worse_candidates(current_hyp_index):
+                open_hyp.append((confnet.get_prob(hyp_index), hyp_index))
+
+            open_hyp.sort(reverse=True)
+
+    nblist = UtteranceNBList()
+    for idx in closed_hyp:
+        nblist.add(closed_hyp[idx], confnet.get_hyp_index_utterance(idx))
+
+    nblist.merge()
+    nblist.add_other()
+
+    return nblist
+
+
+def get_da_nblist_sorted_list(confnet, n):
+    """Reproduces DialogueActConfusionNetwork.get_da_nblist() before the lazy expansion."""
+    open_hyp = []
+    closed_hyp = {}
+
+    cn = sorted(confnet, reverse=True)
+
+    for j, (p, dai) in enumerate(cn):
+        if p < 0.5:
+            i = j
+            break
+    else:
+        i = len(cn)
+
+    best_hyp = tuple([0, ] * i + [1, ] * (len(cn) - i))
+    open_hyp.append((confnet._get_prob(best_hyp, cn=cn), best_hyp))
+
+    i = 0
+    while open_hyp and i < n * 100:
+        i += 1
+
+        current_prob, current_hyp_index = open_hyp.pop(0)
+
+        if current_hyp_index not in closed_hyp:
+            closed_hyp[current_hyp_index] = current_prob
+
+            for hyp_index in confnet._get_next_worse_candidates(current_hyp_index, cn=cn):
+                open_hyp.append((confnet._get_prob(hyp_index, cn=cn), hyp_index))
+
+            open_hyp.sort(reverse=True)
+
+        if len(closed_hyp) >= n:
+            break
+
+    nblist = DialogueActNBList()
+    for idx in closed_hyp:
+        nblist.add(closed_hyp[idx], confnet._get_hyp_index_dialogue_act(idx, cn=cn))
+
+    nblist.merge()
+    nblist.add_other()
+
+    return nblist
+
+
+def benchmark(name, get_nblist, confnets, n):
+    start = time.clock()
+    for confnet in confnets:
+        get_nblist(confnet, n)
+    cpu_time = time.clock() - start
+
+    print "  %-40s %8.3f s CPU  %8.3f ms per confnet" % (name, cpu_time, 1000.0 * cpu_time / max(len(confnets), 1))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description="Measures the time of expanding the logged confusion networks into n-best lists.")
+
+    parser.add_argument('call_log_dirs', nargs='+',
+                        help='the directories with the call logs, they are searched recursively')
+    parser.add_argument('-n', action="store", default=[10, 40], type=int, nargs='+',
+                        help='the lengths of the n-best lists')
+
+    args = parser.parse_args()
+
+    asr_confnets, slu_confnets = load_confnets(args.call_log_dirs)
+
+    print "ASR confnets: %d" % len(asr_confnets)
+    print "SLU confnets: %d" % len(slu_confnets)
+
+    for n in args.n:
+        print "n = %d" % n
+        benchmark('sorted list get_utterance_nblist()', get_utterance_nblist_sorted_list, asr_confnets, n)
+        benchmark('lazy get_utterance_nblist()',
+                  lambda confnet, n: confnet.get_utterance_nblist(n=n), asr_confnets, n)
+        benchmark('sorted list get_da_nblist()', get_da_nblist_sorted_list, slu_confnets, n)
+        benchmark('lazy get_da_nblist()', lambda confnet, n: confnet.get_da_nblist(n=n), slu_confnets, n)
+
+
+if __name__ == "__main__":
+    main()
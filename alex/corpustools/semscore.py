@@ -11,27 +11,37 @@ import sys
 import codecs
 
 from collections import defaultdict
+from itertools import imap
+from multiprocessing import Pool
 
 from alex.utils.text import split_by
+from alex.utils.various import gen_bins, gen_last_items
 
-def load_semantics(file_name):
+def iter_semantics(file_name):
+    """Iterates over the keys and the dialogue act items of the semantics in the file without loading the file."""
     f = codecs.open(file_name,encoding = 'UTF-8')
 
-    semantics = defaultdict(list)
-    for l in f:
-        l = l.strip()
-        if not l:
-            continue
+    try:
+        for l in f:
+            l = l.strip()
+            if not l:
+                continue
 
-        l = l.split("=>")
+            l = l.split("=>")
 
-        key = l[0].strip()
-        sem = l[1].strip()
+            key = l[0].strip()
+            sem = l[1].strip()
 
-        sem = split_by(sem, '&', '(', ')', '"')
+            sem = split_by(sem, '&', '(', ')', '"')
 
+            yield key, sem
+    finally:
+        f.close()
+
+def load_semantics(file_name):
+    semantics = defaultdict(list)
+    for key, sem in iter_semantics(file_name):
         semantics[key] = sem
-    f.close()
 
     return semantics
 
@@ -71,21 +81,52 @@ def score_da(ref_da, test_da, daid):
 
     return tp, fp, fn, statsp, epp
 
-def score_file(refsem, testsem):
+def _score_das(items):
+    results = []
+    for k, ref_da, test_da in items:
+        tpp, fpp, fnp, statsp, epp = score_da(ref_da, test_da, k)
+        # the nested defaultdicts with lambdas cannot be passed between processes
+        results.append((k, tpp, fpp, fnp, dict((kk, dict(v)) for kk, v in statsp.iteritems()), epp))
+
+    return results
+
+def gen_da_scores(items, n_jobs=1, chunk_size=1000):
+    """
+    Scores the dialogue acts, with n_jobs > 1 in a pool of processes which get chunks of the dialogue acts.
+
+    :param items: an iterable of (DA id, reference DA items, test DA items)
+    :return: a generator of the results of score_da() prefixed with the DA id in the order of items
+    """
+    chunks = gen_bins(items, chunk_size)
+
+    if n_jobs > 1:
+        pool = Pool(n_jobs)
+        try:
+            for results in pool.imap(_score_das, chunks):
+                for result in results:
+                    yield result
+        finally:
+            pool.terminate()
+    else:
+        for results in imap(_score_das, chunks):
+            for result in results:
+                yield result
+
+def summarise(da_scores):
+    """Sums the results of gen_da_scores() and computes the precision and recall, the errors are sorted by the DA ids."""
     tp = 0.0
     fp = 0.0
     fn = 0.0
 
     stats = defaultdict(lambda : defaultdict(float))
-    error_output = []
+    error_output = {}
 
-    for k in sorted(refsem):
-        tpp, fpp, fnp, statsp, epp  = score_da(refsem[k], testsem[k], k)
+    for k, tpp, fpp, fnp, statsp, epp in da_scores:
         tp += tpp
         fp += fpp
         fn += fnp
         if epp:
-            error_output += [''.join(epp),]
+            error_output[k] = ''.join(epp)
 
         for kk in statsp:
             for kkk in statsp[kk]:
@@ -108,18 +149,34 @@ def score_file(refsem, testsem):
         stats[k]['precision'] += 0.000001
         stats[k]['recall']    += 0.000001
 
-    return precision, recall, stats, '\n'.join(error_output)
+    return precision, recall, stats, '\n'.join(error_output[k] for k in sorted(error_output))
+
+def score_file(refsem, testsem):
+    return summarise(gen_da_scores((k, refsem[k], testsem[k]) for k in sorted(refsem)))
+
+def score(fn_refsem, fn_testsem, item_level = False, detailed_error_output = False, outfile = sys.stdout, n_jobs = 1):
+    """
+    Scores the test semantics against the reference semantics and writes the results.
 
-def score(fn_refsem, fn_testsem, item_level = False, detailed_error_output = False, outfile = sys.stdout):
-    refsem  = load_semantics(fn_refsem)
+    The reference file is streamed, only the test semantics are loaded into the memory. As in load_semantics(), only
+    the last DA of a repeated DA id is scored.
+
+    :param n_jobs: a number of processes scoring the dialogue acts
+    """
     testsem = load_semantics(fn_testsem)
 
-    precision, recall, stats, error_output = score_file(refsem, testsem)
+    num_das = [0]
+    def gen_items():
+        for k, ref_da in gen_last_items(lambda: iter_semantics(fn_refsem)):
+            num_das[0] += 1
+            yield k, ref_da, testsem[k]
+
+    precision, recall, stats, error_output = summarise(gen_da_scores(gen_items(), n_jobs))
 
     outfile.write("Ref: {r}\n".format(r=fn_refsem))
     outfile.write("Tst: {t}\n".format(t=fn_testsem))
 
-    outfile.write("The results are based on {num_das} DAs\n".format(num_das=len(refsem)))
+    outfile.write("The results are based on {num_das} DAs\n".format(num_das=num_das[0]))
 
     outfile.write("-"*80)
     outfile.write("\n")
@@ -176,7 +233,9 @@ if __name__ == '__main__':
     parser.add_argument('-i', action="store_true", default=False, dest="item_level", help='print item level precision and recall')
     parser.add_argument('-d', action="store_true", default=False, dest="detailed_error_output",
                         help='print missing and extra hypothesis dialogue act items')
+    parser.add_argument('-j', action="store", default=1, type=int, dest="n_jobs",
+                        help='a number of processes scoring the dialogue acts')
 
     args = parser.parse_args()
 
-    score(args.refsem, args.testsem, args.item_level, args.detailed_error_output)
+    score(args.refsem, args.testsem, args.item_level, args.detailed_error_output, n_jobs=args.n_jobs)
@@ -8,6 +8,40 @@ import codecs
 from itertools import islice
 
 
+def iter_wavaskey(fname, constructor, limit=None, encoding='UTF-8'):
+    """
+    Iterates over the objects stored in the "wav as key" format without
+    loading the whole file.
+
+    The arguments are the same as for `load_wavaskey'.
+
+    Yields (key, object) pairs in the order of the file.
+
+    """
+    with codecs.open(fname, encoding=encoding) as infile:
+        for line_idx, line in enumerate(islice(infile, 0, limit)):
+            line = line.strip()
+            if not line:
+                continue
+
+            parts = map(unicode.strip, line.split("=>", 1))
+
+            # Distinguish the case with a key and without a key.
+            if len(parts) == 2:
+                key, utt_str = parts
+            else:
+                key = unicode(line_idx)
+                utt_str = parts[0]
+
+            try:
+                obj = constructor(utt_str)
+            except Exception as ex:
+                # TODO Probably should be logged.
+                continue
+
+            yield key, obj
+
+
 def load_wavaskey(fname, constructor, limit=None, encoding='UTF-8'):
     """
     Loads a dictionary of objects stored in the "wav as key" format.
@@ -34,28 +68,7 @@ def load_wavaskey(fname, constructor, limit=None, encoding='UTF-8'):
     Returns a dictionary with objects constructed by `constructor' as values.
 
     """
-    with codecs.open(fname, encoding=encoding) as infile:
-        ret_dict = {}
-        for line_idx, line in enumerate(islice(infile, 0, limit)):
-            line = line.strip()
-            if not line:
-                continue
-
-            parts = map(unicode.strip, line.split("=>", 1))
-
-            # Distinguish the case with a key and without a key.
-            if len(parts) == 2:
-                key, utt_str = parts
-            else:
-                key = unicode(line_idx)
-                utt_str = parts[0]
-
-            try:
-                ret_dict[key] = constructor(utt_str)
-            except Exception as ex:
-                # TODO Probably should be logged.
-                pass
-    return ret_dict
+    return dict(iter_wavaskey(fname, constructor, limit, encoding))
 
 def save_wavaskey(fname, in_dict, encoding='UTF-8', trans = lambda x: x):
     """
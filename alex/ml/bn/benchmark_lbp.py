@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Measures the time of the LBP inference over a factor graph of the size of a dialogue state.
+
+Every slot of the dialogue state is tracked by a chain of hidden variables, one per turn. The hidden variable of
+a turn is connected to the hidden variable of the previous turn by a transition factor and to the observation of the
+turn by an observation factor. After every turn, the messages are propagated through the new layer of the graph
+as a belief tracker would do during a call.
+
+With --reference, the same inference is run with the cell by cell implementation of the factor product and
+marginalization which was used before they were vectorized.
+
+The compiled LBP is measured on a static graph with a single turn per slot: the belief of the previous turn is
+the evidence of a prior variable connected to the hidden variable by the transition factor. In every turn, only
+the evidence is updated and the compiled schedule is run again.
+"""
+
+if __name__ == '__main__':
+    import autopath
+
+import argparse
+import time
+
+from collections import defaultdict
+
+import numpy as np
+
+from alex.ml.bn.factor import Factor
+from alex.ml.bn.lbp import LBP, CompiledLBP
+from alex.ml.bn.node import DiscreteVariableNode, DiscreteFactorNode
+
+
+def apply_op_different_loop(self, other, op):
+    """The cell by cell implementation of Factor._apply_op_different()."""
+    new_variables = sorted(set(self.variables).union(other.variables))
+
+    new_variable_values = dict(self.variable_values)
+    new_variable_values.update(other.variable_values)
+
+    new_cardinalities = dict(self.cardinalities)
+    new_cardinalities.update(other.cardinalities)
+
+    new_factor_length = self._factor_table_length(new_cardinalities)
+    new_factor_table = np.empty(new_factor_length, np.float32)
+
+    assignment = defaultdict(int)
+    index_self = 0
+    index_other = 0
+    reversed_variables = new_variables[::-1]
+
+    for i in range(new_factor_length):
+        new_factor_table[i] = op(self.factor_table[index_self], other.factor_table[index_other])
+
+        for var in reversed_variables:
+            assignment[var] += 1
+            if assignment[var] == new_cardinalities[var]:
+                assignment[var] = 0
+                index_self -= (new_cardinalities[var] - 1) * self.strides.get(var, 0)
+                index_other -= (new_cardinalities[var] - 1) * other.strides.get(var, 0)
+            else:
+                index_self += self.strides.get(var, 0)
+                index_other += other.strides.get(var, 0)
+                break
+
+    return Factor(new_variables, new_variable_values, new_factor_table, self.logarithmetic)
+
+
+def marginalize_loop(self, keep):
+    """The cell by cell implementation of Factor.marginalize()."""
+    assignment = defaultdict(int)
+    new_cardinalities = {x: self.cardinalities[x] for x in keep}
+    new_factor_length = self._factor_table_length(new_cardinalities)
+    new_factor_table = np.empty(new_factor_length, np.float32)
+    new_factor_table[:] = self._zero
+    new_strides = self._compute_strides(keep, self.cardinalities, new_factor_length)
+    index = 0
+
+    for i in range(self.factor_length):
+        new_factor_table[index] = self._add(new_factor_table[index], self.factor_table[i])
+
+        for var in keep:
+            if (i + 1) % self.strides[var] == 0:
+                assignment[var] += 1
+                index += new_strides[var]
+            if assignment[var] == self.cardinalities[var]:
+                assignment[var] = 0
+                index -= self.cardinalities[var] * new_strides[var]
+
+    new_variable_values = {v: self.variable_values[v] for v in keep}
+    return Factor(keep, new_variable_values, new_factor_table, self.logarithmetic)
+
+
+def create_factor(variables, values, table):
+    return Factor(variables, dict((var, values) for var in variables), np.log(table).astype(np.float32).ravel())
+
+
+def create_turn(slot, turn, values, last_hidden, random):
+    """Creates the nodes of one turn of one slot and returns the layer and the new hidden node."""
+    n_values = len(values)
+
+    hidden = DiscreteVariableNode('%s_hid%d' % (slot, turn), values)
+    observation = DiscreteVariableNode('%s_obs%d' % (slot, turn), values)
+
+    # the observation is mostly correct
+    obs_table = np.eye(n_values) * 0.8 + 0.2 / n_values
+    obs_factor = DiscreteFactorNode('%s_fact_obs%d' % (slot, turn),
+                                    create_factor(sorted([hidden.name, observation.name]), values, obs_table))
+    hidden.connect(obs_factor)
+    observation.connect(obs_factor)
+
+    # a random observation with the most probability mass on a single value
+    obs_probs = random.dirichlet(np.ones(n_values) * 0.1)
+    observation.observed(dict(((value,), p) for value, p in zip(values, obs_probs)))
+
+    layer = [observation, obs_factor, hidden]
+
+    if last_hidden is not None:
+        # the value of the slot mostly stays the same
+        trans_table = np.eye(n_values) * 0.9 + 0.1 / n_values
+        trans_factor = DiscreteFactorNode('%s_fact_trans%d' % (slot, turn),
+                                          create_factor(sorted([last_hidden.name, hidden.name]), values, trans_table))
+        last_hidden.connect(trans_factor)
+        hidden.connect(trans_factor)
+        layer.append(trans_factor)
+
+    return layer, hidden
+
+
+def benchmark(name, n_slots, n_values, n_turns):
+    random = np.random.RandomState(0)
+    values = ['v%d' % i for i in range(n_values)]
+
+    lbp = LBP(strategy='layers')
+    last_hidden = dict((slot, None) for slot in range(n_slots))
+
+    turn_times = []
+    for turn in range(n_turns):
+        layer = []
+        for slot in range(n_slots):
+            slot_layer, last_hidden[slot] = create_turn('slot%d' % slot, turn, values, last_hidden[slot], random)
+            layer.extend(slot_layer)
+
+        for node in layer:
+            node.init_messages()
+
+        start = time.time()
+        lbp.add_layer(layer)
+        lbp.run(from_layer='last')
+        turn_times.append(time.time() - start)
+
+    print "  %-12s mean turn: %10.2f ms  max turn: %10.2f ms" % \
+          (name, 1000.0 * np.mean(turn_times), 1000.0 * np.max(turn_times))
+
+
+def benchmark_compiled(name, n_slots, n_values, n_turns, compiled):
+    random = np.random.RandomState(0)
+    values = ['v%d' % i for i in range(n_values)]
+
+    nodes = []
+    slots = []
+    for slot in range(n_slots):
+        prior = DiscreteVariableNode('slot%d_prior' % slot, values)
+        layer, hidden = create_turn('slot%d' % slot, 0, values, prior, random)
+        nodes.append(prior)
+        nodes.extend(layer)
+        slots.append((prior, layer[0], hidden))
+
+    if compiled:
+        lbp = CompiledLBP(nodes)
+        lbp.compile()
+    else:
+        lbp = LBP()
+        lbp.add_nodes(nodes)
+
+    turn_times = []
+    for turn in range(n_turns):
+        start = time.time()
+
+        for prior, observation, hidden in slots:
+            # the belief of the last turn is the prior of this turn
+            prior.observed(dict(((value,), p) for value, p in zip(values, np.exp(hidden.belief.factor_table))))
+            obs_probs = random.dirichlet(np.ones(n_values) * 0.1)
+            observation.observed(dict(((value,), p) for value, p in zip(values, obs_probs)))
+
+        lbp.run()
+        turn_times.append(time.time() - start)
+
+    print "  %-12s mean turn: %10.2f ms  max turn: %10.2f ms" % \
+          (name, 1000.0 * np.mean(turn_times), 1000.0 * np.max(turn_times))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures the time of the LBP inference per dialogue turn.")
+    parser.add_argument('--slots', action="store", default=5, type=int,
+                        help='the number of tracked slots')
+    parser.add_argument('--values', action="store", default=100, type=int,
+                        help='the number of values of every slot')
+    parser.add_argument('--turns', action="store", default=5, type=int,
+                        help='the number of dialogue turns')
+    parser.add_argument('--reference', action="store_true", default=False,
+                        help='also measure the cell by cell implementation of the factor operations')
+    args = parser.parse_args()
+
+    print "Slots: %d, values: %d, turns: %d" % (args.slots, args.values, args.turns)
+    print "Growing graph:"
+    benchmark('vectorized', args.slots, args.values, args.turns)
+
+    if args.reference:
+        apply_op_different, marginalize = Factor._apply_op_different, Factor.marginalize
+        Factor._apply_op_different, Factor.marginalize = apply_op_different_loop, marginalize_loop
+        try:
+            benchmark('cell by cell', args.slots, args.values, args.turns)
+        finally:
+            Factor._apply_op_different, Factor.marginalize = apply_op_different, marginalize
+
+    print "Static graph:"
+    benchmark_compiled('sequential', args.slots, args.values, args.turns, compiled=False)
+    benchmark_compiled('compiled', args.slots, args.values, args.turns, compiled=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -9,7 +9,6 @@ with probability distributions.
 import numpy as np
 import operator
 
-from collections import defaultdict
 from scipy.misc import logsumexp
 
 ZERO = 1e-20
@@ -251,45 +250,12 @@ class Factor(object):
         new_variable_values = dict(self.variable_values)
         new_variable_values.update(other.variable_values)
 
-        # The cardinalities will stay the same, we just have to add
-        # cardinalities for variables from both factors.
-        new_cardinalities = dict(self.cardinalities)
-        new_cardinalities.update(other.cardinalities)
-
-        # Compute the length of new factor table.
-        new_factor_length = self._factor_table_length(new_cardinalities)
-
-        # Create a new factor table.
-        new_factor_table = np.empty(new_factor_length, np.float32)
-
-        assignment = defaultdict(int)
-        index_self = 0
-        index_other = 0
-        reversed_variables = new_variables[::-1]
-
-        for i in range(new_factor_length):
-            # Apply the operator.
-            new_factor_table[i] = op(self.factor_table[index_self],
-                                     other.factor_table[index_other])
-
-            # Update indexes, start with variable with smallest stride.
-            for var in reversed_variables:
-                # Move to next value of a variable.
-                assignment[var] += 1
-                # If we go past the last value of one variable, we need to
-                # move onto next variable.
-                if assignment[var] == new_cardinalities[var]:
-                    assignment[var] = 0
-                    index_self -= ((new_cardinalities[var] - 1) *
-                                   self.strides.get(var, 0))
-                    index_other -= ((new_cardinalities[var] - 1) *
-                                    other.strides.get(var, 0))
-                # Otherwise we just update this variable and don't have to do
-                # anything with other variables.
-                else:
-                    index_self += self.strides.get(var, 0)
-                    index_other += other.strides.get(var, 0)
-                    break
+        # Both factor tables get an axis for every new variable, the missing
+        # variables have axes of length one, so the operator is broadcast
+        # over them.
+        new_factor_table = op(self._get_broadcast_table(new_variables),
+                              other._get_broadcast_table(new_variables))
+        new_factor_table = np.ravel(new_factor_table).astype(np.float32)
 
         return Factor(new_variables,
                       new_variable_values,
@@ -330,6 +296,39 @@ class Factor(object):
                       op(self.factor_table, other),
                       self.logarithmetic)
 
+    def _get_table(self):
+        """Return the factor table as an array with an axis for every
+        variable in the order of self.variables."""
+        return self.factor_table.reshape(
+            [self.cardinalities[var] for var in self.variables])
+
+    def _get_broadcast_table(self, variables):
+        """Return the factor table as an array with an axis for every variable
+        from `variables` in the given order.
+
+        The variables of this factor must be a subset of `variables`. The axes
+        of the other variables have length one.
+        """
+        own_variables = [var for var in variables if var in self.cardinalities]
+        table = self._get_table().transpose(
+            [self.variables.index(var) for var in own_variables])
+        return table.reshape([self.cardinalities.get(var, 1)
+                              for var in variables])
+
+    def _sum_out(self, table, axes):
+        """Sum the table over the given axes, keeping them with length one.
+
+        The zero is added to every sum, as if the sums were accumulated from
+        zero.
+        """
+        if not axes:
+            return self._add(self._zero, table)
+        if self.logarithmetic:
+            sums = logsumexp(table.astype(np.float64), axis=axes, keepdims=True)
+        else:
+            sums = np.sum(table, axis=axes, keepdims=True)
+        return self._add(self._zero, sums)
+
     def _compute_strides(self, variables, cardinalities, factor_length):
         """Strides for variables of given factor table.
 
@@ -417,39 +416,17 @@ class Factor(object):
         :rtype: :class:`Factor`
 
         """
-        # Assignment counter
-        assignment = defaultdict(int)
-        # New cardinalities and new factor table.
-        new_cardinalities = {x: self.cardinalities[x] for x in keep}
-        new_factor_length = self._factor_table_length(new_cardinalities)
-        new_factor_table = np.empty(new_factor_length, np.float32)
-        new_factor_table[:] = self._zero
-        # Strides for resulting variables in the new factor table.
-        new_strides = self._compute_strides(keep,
-                                            self.cardinalities,
-                                            new_factor_length)
-        # Index into the new factor table.
-        index = 0
-
-        # Iterate over every element in the old factor table and add them to
-        # the correct element in the new factor table.
-        for i in range(self.factor_length):
-            new_factor_table[index] = self._add(new_factor_table[index],
-                                                self.factor_table[i])
-
-            # Update the assignment and indexes.
-            for var in keep:
-                # The assignment of variable var changed, so we must add its
-                # stride to the index.
-                if (i + 1) % self.strides[var] == 0:
-                    assignment[var] += 1
-                    index += new_strides[var]
-                # The assignment of variable var overflowed to 0, we must
-                # subtract the cardinality from index.
-                if assignment[var] == self.cardinalities[var]:
-                    assignment[var] = 0
-                    index -= (self.cardinalities[var] *
-                              new_strides[var])
+        # Sum over the axes of the variables which are not kept.
+        axes = tuple(i for i, var in enumerate(self.variables)
+                     if var not in keep)
+        table = self._sum_out(self._get_table(), axes)
+
+        # Order the remaining axes as the variables in keep.
+        kept_variables = [var for var in self.variables if var in keep]
+        table = table.reshape([self.cardinalities[var]
+                               for var in kept_variables])
+        table = table.transpose([kept_variables.index(var) for var in keep])
+        new_factor_table = np.ravel(table).astype(np.float32)
 
         # Return new factor with marginalized variables.
         new_variable_values = {v: self.variable_values[v] for v in keep}
@@ -504,16 +481,14 @@ class Factor(object):
         :type parents: list
         """
         if parents is not None:
-            sums = defaultdict(lambda: self._zero)
-            assignments = {}
-
-            for i in range(self.factor_length):
-                value = self.factor_table[i]
-                assignments[i] = self._get_assignment_from_index(i, parents)
-                sums[assignments[i]] = self._add(sums[assignments[i]], value)
-
-            for i in range(self.factor_length):
-                self.factor_table[i] = self._div(self.factor_table[i], sums[assignments[i]])
+            # Sum over the axes of the variables which are not parents and
+            # divide every row by the sum of its parents' assignment.
+            table = self._get_table()
+            axes = tuple(i for i, var in enumerate(self.variables)
+                         if var not in parents)
+            sums = self._sum_out(table, axes)
+
+            self.factor_table[:] = np.ravel(self._div(table, sums))
         else:
             self.factor_table = self._div(self.factor_table, self._sum(self.factor_table))
 
@@ -5,6 +5,10 @@
 
 import abc
 import itertools
+import numpy as np
+
+from alex.ml.bn.factor import Factor
+from alex.ml.bn.node import DiscreteVariableNode, DiscreteFactorNode
 
 
 class BPError(Exception):
@@ -173,8 +177,250 @@ class LBP(BP):
             last_layer = layer
 
     def _send_messages_to_layer(self, from_layer, to_layer):
+        to_layer = set(to_layer)
         for node in from_layer:
             node.update()
             for name, neighbor in node.neighbors.iteritems():
                 if neighbor in to_layer:
                     node.message_to(neighbor)
+
+
+def _log_normalize(a):
+    """Normalize an array of log probabilities in place."""
+    a_max = a.max()
+    a -= a_max + np.log(np.sum(np.exp(a - a_max)))
+
+
+class CompiledLBP(BP):
+    """Loopy Belief Propagation with a precompiled message schedule.
+
+    The factor graph is compiled once into a static schedule of message
+    updates and the messages are kept in preallocated arrays. The schedule is
+    the same as the one of the sequential strategy of LBP: the nodes send
+    messages in the order in which they were added and then in the reversed
+    order. The messages are normalised and the iterations stop early when the
+    largest change of a message is smaller than the tolerance.
+
+    The messages are kept in log arithmetic, but the factor tables are
+    converted to (scaled) probabilities, so that a message from a factor is
+    computed by contracting its table with the messages from the other
+    variables, e.g. by a matrix-vector product for a factor of two variables.
+
+    Repeated runs only read the evidence from the observed variable nodes,
+    so the graph can be reused in every turn of a dialogue. If nodes are
+    added, the graph is compiled again before the next run.
+
+    Only DiscreteVariableNode and DiscreteFactorNode nodes with log
+    arithmetic are supported. After a run, the normalised beliefs of the
+    variable nodes are set; the beliefs and the incoming messages of the
+    factor nodes are not updated.
+    """
+
+    def __init__(self, nodes=None, tolerance=1e-4):
+        """Initialize the compiled LBP algorithm.
+
+        :param nodes: Nodes of the factor graph.
+        :type nodes: list
+        :param tolerance: The largest change of a message in log arithmetic, which is considered as a convergence.
+        :type tolerance: float
+        """
+        self.nodes = []
+        self.tolerance = tolerance
+        self.compiled = False
+
+        if nodes:
+            self.add_nodes(nodes)
+
+    def add_nodes(self, nodes):
+        """Add nodes to graph."""
+        self.nodes.extend(nodes)
+        self.compiled = False
+
+    def clear_nodes(self):
+        self.nodes = []
+        self.compiled = False
+
+    def compile(self):
+        """Compile the factor graph into the message schedule."""
+        variables = []
+        factors = []
+        for node in self.nodes:
+            if isinstance(node, DiscreteVariableNode):
+                if not node.logarithmetic:
+                    raise LBPError('Only log arithmetic is supported: %s' % node.name)
+                variables.append(node)
+            elif isinstance(node, DiscreteFactorNode):
+                if not node.factor.logarithmetic:
+                    raise LBPError('Only log arithmetic is supported: %s' % node.name)
+                factors.append(node)
+            else:
+                raise LBPError('Unsupported node: %s' % node.name)
+
+        var_index = dict((node.name, i) for i, node in enumerate(variables))
+        if len(var_index) != len(variables):
+            raise LBPError('Variable names must be unique.')
+
+        # Edges between factors and variables, each edge has a message in both
+        # directions. The messages are views into two flat buffers.
+        edge_vars = []
+        edge_sizes = []
+        self._factor_probs = []
+        self._factor_edges = []
+        for node in factors:
+            factor = node.factor
+            if set(factor.variables) != set(node.neighbors):
+                raise LBPError('Variables of a factor must be its neighbors: %s' % node.name)
+
+            edges = []
+            for var in factor.variables:
+                if var not in var_index:
+                    raise LBPError('Neighbor %s of %s is not in the graph.' % (var, node.name))
+                edges.append(len(edge_vars))
+                edge_vars.append(var_index[var])
+                edge_sizes.append(factor.cardinalities[var])
+
+            table = np.array(factor._get_table(), dtype=np.float64)
+            self._factor_probs.append(np.exp(table - table.max()))
+            self._factor_edges.append(edges)
+
+        offsets = np.cumsum([0] + edge_sizes)
+        self._v2f_buffer = np.empty(offsets[-1])
+        self._f2v_buffer = np.empty(offsets[-1])
+        self._last_buffer = np.empty(2 * offsets[-1])
+        self._v2f = [self._v2f_buffer[offsets[e]:offsets[e + 1]] for e in range(len(edge_vars))]
+        self._f2v = [self._f2v_buffer[offsets[e]:offsets[e + 1]] for e in range(len(edge_vars))]
+
+        self._variables = variables
+        self._edge_vars = edge_vars
+        self._var_edges = [[] for node in variables]
+        for e, v in enumerate(edge_vars):
+            self._var_edges[v].append(e)
+        self._var_beliefs = [np.empty(len(node.values)) for node in variables]
+        self._evidence = [None] * len(variables)
+
+        factor_index = dict((node, i) for i, node in enumerate(factors))
+        self._schedule = []
+        for node in self.nodes + self.nodes[::-1]:
+            if node in factor_index:
+                self._schedule.append((False, factor_index[node]))
+            else:
+                self._schedule.append((True, var_index[node.name]))
+
+        self.compiled = True
+        self.init_messages()
+
+    def init_messages(self):
+        """Set all messages to uniform distributions."""
+        for message in self._v2f + self._f2v:
+            message[:] = -np.log(len(message))
+
+    def run(self, n_iterations=10):
+        """Run the lbp algorithm.
+
+        :param n_iterations: The maximal number of iterations.
+        :type n_iterations: int
+        :returns: The number of iterations done.
+        :rtype: int
+        """
+        if not self.compiled:
+            self.compile()
+
+        self._read_evidence()
+
+        n_done = 0
+        n_messages = len(self._v2f_buffer)
+        for i in range(n_iterations):
+            self._last_buffer[:n_messages] = self._v2f_buffer
+            self._last_buffer[n_messages:] = self._f2v_buffer
+
+            for is_variable, index in self._schedule:
+                if is_variable:
+                    self._send_from_variable(index)
+                else:
+                    self._send_from_factor(index)
+
+            n_done += 1
+            if n_messages == 0:
+                break
+
+            # The largest change of a message in this iteration.
+            self._last_buffer[:n_messages] -= self._v2f_buffer
+            self._last_buffer[n_messages:] -= self._f2v_buffer
+            np.abs(self._last_buffer, out=self._last_buffer)
+            if self._last_buffer.max() < self.tolerance:
+                break
+
+        self._write_beliefs()
+
+        return n_done
+
+    def _read_evidence(self):
+        for v, node in enumerate(self._variables):
+            if node.is_observed:
+                evidence = np.array(node.belief.factor_table, dtype=np.float64)
+                _log_normalize(evidence)
+                self._evidence[v] = evidence
+            else:
+                self._evidence[v] = None
+
+    def _write_beliefs(self):
+        for v, node in enumerate(self._variables):
+            if self._evidence[v] is None:
+                belief = self._var_beliefs[v]
+                belief[:] = 0.0
+                for e in self._var_edges[v]:
+                    belief += self._f2v[e]
+                _log_normalize(belief)
+
+                node.belief = Factor([node.name],
+                                     {node.name: node.values},
+                                     belief.astype(np.float32),
+                                     node.logarithmetic)
+            else:
+                node.normalize()
+
+    def _send_from_variable(self, v):
+        edges = self._var_edges[v]
+        evidence = self._evidence[v]
+
+        if evidence is not None:
+            for e in edges:
+                self._v2f[e][:] = evidence
+        else:
+            belief = self._var_beliefs[v]
+            belief[:] = 0.0
+            for e in edges:
+                belief += self._f2v[e]
+
+            for e in edges:
+                message = self._v2f[e]
+                np.subtract(belief, self._f2v[e], out=message)
+                _log_normalize(message)
+
+    def _send_from_factor(self, f):
+        probs = self._factor_probs[f]
+        edges = self._factor_edges[f]
+
+        # The incoming messages as scaled probabilities, the scale does not
+        # matter because the outgoing messages are normalised.
+        incoming = []
+        for e in edges:
+            message = self._v2f[e]
+            incoming.append(np.exp(message - message.max()))
+
+        for i, e in enumerate(edges):
+            if self._evidence[self._edge_vars[e]] is not None:
+                # Observed variables ignore the incoming messages.
+                continue
+
+            # Multiply the factor by the messages from the other variables and
+            # sum them out. The axes are contracted from the last one, so that
+            # the indexes of the remaining axes do not change.
+            result = probs
+            for j in range(len(edges) - 1, -1, -1):
+                if j != i:
+                    result = np.tensordot(result, incoming[j], axes=([j], [0]))
+
+            message = self._f2v[e]
+            np.log(result, out=message)
+            _log_normalize(message)
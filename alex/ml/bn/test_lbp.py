@@ -7,7 +7,7 @@ if __name__ == '__main__':
     import autopath
 from alex.ml.bn.factor import Factor
 from alex.ml.bn.node import DiscreteVariableNode, DiscreteFactorNode, DirichletFactorNode, DirichletParameterNode
-from alex.ml.bn.lbp import LBP
+from alex.ml.bn.lbp import LBP, CompiledLBP
 
 
 class TestLBP(unittest.TestCase):
@@ -294,6 +294,82 @@ class TestLBP(unittest.TestCase):
         lbp.run(from_layer='last')
         self.assertAlmostEqual(hid3.belief[('save',)], hid2.belief[('save',)] * 0.9 + hid2.belief[('del',)] * 0.1)
 
+    def _create_chain(self, n):
+        f_h_o = {
+            ("save", "osave"): 0.8,
+            ("del",  "osave"): 0.2,
+            ("save", "odel"): 0.2,
+            ("del",  "odel"): 0.8,
+        }
+
+        f_h_h = {
+            ("save", "save"): 0.9,
+            ("del",  "save"): 0.1,
+            ("save", "del"): 0.1,
+            ("del",  "del"): 0.9
+        }
+
+        nodes = []
+        hids = []
+        obss = []
+        for i in range(n):
+            hid = DiscreteVariableNode("hid%d" % i, ["save", "del"])
+            obs = DiscreteVariableNode("obs%d" % i, ["osave", "odel"])
+            fact_h_o = DiscreteFactorNode("fact_h%d_o%d" % (i, i), Factor(
+                ["hid%d" % i, "obs%d" % i],
+                {
+                    "hid%d" % i: ["save", "del"],
+                    "obs%d" % i: ["osave", "odel"]
+                },
+                f_h_o))
+            obs.connect(fact_h_o)
+            fact_h_o.connect(hid)
+            nodes.extend([obs, fact_h_o, hid])
+
+            if hids:
+                fact_h_h = DiscreteFactorNode("fact_h%d_h%d" % (i - 1, i), Factor(
+                    ["hid%d" % (i - 1), "hid%d" % i],
+                    {
+                        "hid%d" % (i - 1): ["save", "del"],
+                        "hid%d" % i: ["save", "del"],
+                    },
+                    f_h_h))
+                hids[-1].connect(fact_h_h)
+                hid.connect(fact_h_h)
+                nodes.append(fact_h_h)
+
+            hids.append(hid)
+            obss.append(obs)
+
+        return nodes, hids, obss
+
+    def test_compiled(self):
+        nodes, hids, obss = self._create_chain(4)
+        compiled_nodes, compiled_hids, compiled_obss = self._create_chain(4)
+
+        lbp = LBP()
+        lbp.add_nodes(nodes)
+        compiled_lbp = CompiledLBP(compiled_nodes, tolerance=1e-6)
+
+        for observations in [{0: 'osave'}, {0: 'osave', 2: 'odel'}, {3: 'odel'}]:
+            for i in range(4):
+                if i in observations:
+                    obss[i].observed({(observations[i],): 1})
+                    compiled_obss[i].observed({(observations[i],): 1})
+                else:
+                    obss[i].observed(None)
+                    compiled_obss[i].observed(None)
+
+            lbp.init_messages()
+            lbp.run(n_iterations=5)
+            n_iterations = compiled_lbp.run(n_iterations=20)
+
+            # The chain is a tree, so the iterations stop early.
+            self.assertLess(n_iterations, 20)
+            for hid, compiled_hid in zip(hids, compiled_hids):
+                self.assertAlmostEqual(hid.belief[('save',)], compiled_hid.belief[('save',)], places=5)
+                self.assertAlmostEqual(hid.belief[('del',)], compiled_hid.belief[('del',)], places=5)
+
     def test_ep(self):
         # Create nodes.
         hid1 = DiscreteVariableNode("hid1", ["save", "del"])
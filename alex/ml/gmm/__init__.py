@@ -1,3 +1,3 @@
-from gmm import GMM, EPS
+from gmm import GMM, EPS, load_features, save_features
 
-__all__ = ['GMM', 'EPS']
+__all__ = ['GMM', 'EPS', 'load_features', 'save_features']
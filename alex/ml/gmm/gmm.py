@@ -4,6 +4,7 @@
 # This code is based on https://github.com/scikit-learn/scikit-learn/blob/master/sklearn/mixture/gmm.py code
 # which is distributed under the new BSD license.
 
+import multiprocessing
 import numpy as np
 import cPickle as pickle
 
@@ -12,6 +13,53 @@ from sklearn.utils.extmath import logsumexp
 EPS = np.finfo(float).eps
 
 
+def load_features(file_name):
+    """Opens a feature matrix saved by save_features() as a read-only memory map."""
+    return np.load(file_name, mmap_mode='r')
+
+
+def save_features(file_name, X):
+    """Saves the feature vectors as a matrix so that it can be used for out-of-core training."""
+    np.save(file_name, np.asarray(X, dtype=np.float64))
+
+
+def _iter_batches(X, batch_size):
+    """Iterates over batches of the feature vectors as 2D arrays.
+
+    X is either a 2D array (e.g. a memory map) or an iterable of the feature vectors.
+    """
+    if hasattr(X, 'ndim') and X.ndim == 2:
+        for start in xrange(0, X.shape[0], batch_size):
+            yield np.asarray(X[start:start + batch_size], dtype=np.float64)
+    else:
+        batch = []
+        for x in X:
+            batch.append(x)
+            if len(batch) == batch_size:
+                yield np.array(batch, dtype=np.float64)
+                batch = []
+        if batch:
+            yield np.array(batch, dtype=np.float64)
+
+
+def _accumulate_shard(args):
+    """Computes the sufficient statistics of a shard of the data in a worker process.
+
+    The shard is either the vectors of the shard or a name of a feature file with the range of the shard.
+    """
+    (weights, means, covars), X, start, end, batch_size = args
+
+    if isinstance(X, basestring):
+        X = load_features(X)
+    else:
+        start, end = 0, X.shape[0]
+
+    gmm = GMM(n_features=means.shape[1], n_components=means.shape[0])
+    gmm.weights, gmm.means, gmm.covars = weights, means, covars
+
+    return gmm.accumulate(X[start:end], batch_size)
+
+
 class GMM:
     """This is a GMM model of the input data.
     It is memory efficient so that it can process very large input array like objects.
@@ -53,6 +101,108 @@ class GMM:
 
         return lpr
 
+    def log_multivariate_normal_density_diag_block(self, X):
+        """Compute Gaussian log-densities of every component at every row of X for a diagonal model.
+
+        :param X: a matrix of the feature vectors
+        :return: a matrix of log-densities with a row for every vector and a column for every component
+        """
+        X = np.asarray(X, dtype=np.float64)
+        n_dim = X.shape[1]
+        inv_covars = 1.0 / self.covars
+
+        # the squared distance is expanded so that it is computed by matrix products
+        lpr = - 0.5 * (n_dim * np.log(2 * np.pi) + np.sum(np.log(self.covars), 1)
+                       + np.sum(self.means ** 2 * inv_covars, 1)
+                       - 2 * np.dot(X, (self.means * inv_covars).T)
+                       + np.dot(X ** 2, inv_covars.T))
+
+        return lpr
+
+    def expectation_block(self, X):
+        """Evaluate a batch of examples.
+
+        :param X: a matrix of the feature vectors
+        :return: the log probabilities of the vectors and the matrix of the responsibilities of the components
+        """
+        lpr = np.log(self.weights) + self.log_multivariate_normal_density_diag_block(X)
+
+        log_prob = logsumexp(lpr, axis=1)
+        responsibilities = np.exp(lpr - log_prob[:, np.newaxis])
+
+        return log_prob, responsibilities
+
+    def score_block(self, X):
+        """Get the log probs of the rows of X being generated by the mixture."""
+        lpr = np.log(self.weights) + self.log_multivariate_normal_density_diag_block(X)
+
+        return logsumexp(lpr, axis=1)
+
+    def accumulate(self, X, batch_size=10000):
+        """Computes the sufficient statistics of the data for the EM algorithm.
+
+        :param X: a 2D array of the feature vectors or an iterable of them
+        :param batch_size: the number of vectors evaluated at once
+        :return: the number of vectors, the sum of their log probabilities, and the accumulated weights, means and
+                 covariances
+        """
+        n = 0
+        log_prob = 0.0
+        acc_weights = np.zeros(self.n_components)
+        acc_means = np.zeros((self.n_components, self.n_features))
+        acc_covars = np.zeros((self.n_components, self.n_features))
+
+        for X_batch in _iter_batches(X, batch_size):
+            log_prob_x, responsibilities = self.expectation_block(X_batch)
+
+            acc_weights += responsibilities.sum(0)
+            acc_means += np.dot(responsibilities.T, X_batch)
+            # sum of responsibilities * (x - means) ** 2 expanded into matrix products
+            acc_covars += (np.dot(responsibilities.T, X_batch ** 2)
+                           - 2 * self.means * np.dot(responsibilities.T, X_batch)
+                           + self.means ** 2 * responsibilities.sum(0)[:, np.newaxis])
+
+            log_prob += log_prob_x.sum()
+            n += X_batch.shape[0]
+
+        return n, log_prob, acc_weights, acc_means, acc_covars
+
+    def _accumulate_parallel(self, X, batch_size, pool, n_jobs):
+        """Computes the sufficient statistics on shards of the data in the process pool.
+
+        The workers open a feature file by themselves. An array is sliced, so that every worker receives only its
+        shard, still the whole array is sent to the workers in every iteration.
+        """
+        if isinstance(X, basestring):
+            n_vectors = load_features(X).shape[0]
+        else:
+            n_vectors = X.shape[0]
+
+        params = (self.weights, self.means, self.covars)
+        shard_size = (n_vectors + n_jobs - 1) / n_jobs
+        shards = []
+        for start in xrange(0, n_vectors, shard_size):
+            end = min(start + shard_size, n_vectors)
+            if isinstance(X, basestring):
+                shards.append((params, X, start, end, batch_size))
+            else:
+                shards.append((params, X[start:end], start, end, batch_size))
+
+        n = 0
+        log_prob = 0.0
+        acc_weights = np.zeros(self.n_components)
+        acc_means = np.zeros((self.n_components, self.n_features))
+        acc_covars = np.zeros((self.n_components, self.n_features))
+
+        for stats in pool.map(_accumulate_shard, shards):
+            n += stats[0]
+            log_prob += stats[1]
+            acc_weights += stats[2]
+            acc_means += stats[3]
+            acc_covars += stats[4]
+
+        return n, log_prob, acc_weights, acc_means, acc_covars
+
     def expectation(self, x):
         """ Evaluate one example
         """
@@ -112,51 +262,38 @@ class GMM:
 
             self.n_components += 1
 
-    def fit(self, X):
-        # init the algorithm
+    def fit(self, X, batch_size=10000, n_jobs=1):
+        """Trains the model by the EM algorithm.
+
+        The E step is evaluated on batches of the feature vectors. With n_jobs > 1, the sufficient statistics
+        are computed on shards of the data in a pool of processes.
 
+        :param X: a 2D array of the feature vectors, an iterable of them, or a name of a file saved by
+                  save_features() which is memory mapped so that the data do not have to fit into the memory
+        :param batch_size: the number of vectors evaluated at once
+        :param n_jobs: the number of processes computing the statistics, it requires X to be an array or a file name,
+                       the file name is preferred for large data as an array is sent to the processes in every iteration
+        """
+        pool = None
+        if n_jobs > 1:
+            pool = multiprocessing.Pool(n_jobs)
+        elif isinstance(X, basestring):
+            X = load_features(X)
+
+        try:
+            self._fit(X, batch_size, pool, n_jobs)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+    def _fit(self, X, batch_size, pool, n_jobs):
         self.log_probs = []
         for i in range(self.n_iter):
-            log_prob = 0
-            n = 0
-
-            acc_weights = np.zeros(self.n_components)
-            acc_means = np.zeros((self.n_components, self.n_features))
-            acc_covars = np.zeros((self.n_components, self.n_features))
-
-            for x in X:
-                x_m = x.reshape((1, len(x)))
-                #expectation
-                log_prob_x, responsibilities = self.expectation(x_m)
-
-#        print x
-#        print "r", responsibilities
-
-                # maximisation
-                acc_weights += responsibilities
-
-                # make a column matrix from it
-                responsibilities = responsibilities[:, np.newaxis]
-
-#        print responsibilities
-
-                acc_means += np.dot(responsibilities, x_m)
-
-#        print (x_m - self.means)**2
-
-#        print "r", responsibilities.T
-#        print "d", x_m - self.means
-#        print "d**2", (x_m - self.means)**2
-#        print "ac", responsibilities * (x_m - self.means)**2
-
-                acc_covars += responsibilities * (x_m - self.means) ** 2
-
-                log_prob += log_prob_x
-                n += 1
-
-#        print "LP", log_prob_x
-#        if n > 100000:
-#          break
+            if pool is not None:
+                n, log_prob, acc_weights, acc_means, acc_covars = self._accumulate_parallel(X, batch_size, pool, n_jobs)
+            else:
+                n, log_prob, acc_weights, acc_means, acc_covars = self.accumulate(X, batch_size)
 
             self.log_probs.append(log_prob / n)
 
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+if __name__ == "__main__":
+    import autopath
+
+import copy
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from alex.ml.gmm import GMM, save_features
+
+
+def accumulate_per_vector(gmm, X):
+    """Computes the sufficient statistics vector by vector as GMM.fit() used to do."""
+    n = 0
+    log_prob = 0.0
+    acc_weights = np.zeros(gmm.n_components)
+    acc_means = np.zeros((gmm.n_components, gmm.n_features))
+    acc_covars = np.zeros((gmm.n_components, gmm.n_features))
+
+    for x in X:
+        x_m = x.reshape((1, len(x)))
+        log_prob_x, responsibilities = gmm.expectation(x_m)
+
+        acc_weights += responsibilities
+        responsibilities = responsibilities[:, np.newaxis]
+        acc_means += np.dot(responsibilities, x_m)
+        acc_covars += responsibilities * (x_m - gmm.means) ** 2
+
+        log_prob += log_prob_x
+        n += 1
+
+    return n, log_prob, acc_weights, acc_means, acc_covars
+
+
+class TestGMM(unittest.TestCase):
+    def setUp(self):
+        random = np.random.RandomState(0)
+        self.X = np.vstack([random.randn(300, 3) + [3.0, 0.0, -1.0],
+                            0.5 * random.randn(200, 3) - [2.0, 1.0, 0.0]])
+
+        np.random.seed(0)
+        self.gmm = GMM(n_features=3, n_components=1, n_iter=5)
+        self.gmm.fit(self.X)
+        self.gmm.mixup(2)
+
+    def test_accumulate(self):
+        reference = accumulate_per_vector(self.gmm, self.X)
+
+        for batch_size in [1, 7, 10000]:
+            stats = self.gmm.accumulate(self.X, batch_size)
+
+            self.assertEqual(stats[0], reference[0])
+            for acc, ref_acc in zip(stats[1:], reference[1:]):
+                self.assertTrue(np.allclose(acc, ref_acc))
+
+        # the data can be also an iterable of the vectors
+        stats = self.gmm.accumulate(list(self.X), 64)
+        for acc, ref_acc in zip(stats[1:], reference[1:]):
+            self.assertTrue(np.allclose(acc, ref_acc))
+
+    def test_score_block(self):
+        log_probs = self.gmm.score_block(self.X[:10])
+        self.assertTrue(np.allclose(log_probs, [self.gmm.score(x) for x in self.X[:10]]))
+
+    def test_fit(self):
+        gmm = copy.deepcopy(self.gmm)
+        gmm.fit(self.X, batch_size=64)
+
+        directory = tempfile.mkdtemp()
+        try:
+            file_name = os.path.join(directory, 'features.npy')
+            save_features(file_name, self.X)
+
+            for n_jobs in [1, 2]:
+                gmm_file = copy.deepcopy(self.gmm)
+                gmm_file.fit(file_name, batch_size=64, n_jobs=n_jobs)
+
+                self.assertTrue(np.allclose(gmm_file.log_probs, gmm.log_probs))
+                self.assertTrue(np.allclose(gmm_file.weights, gmm.weights))
+                self.assertTrue(np.allclose(gmm_file.means, gmm.means))
+                self.assertTrue(np.allclose(gmm_file.covars, gmm.covars))
+        finally:
+            shutil.rmtree(directory)
+
+        gmm_array = copy.deepcopy(self.gmm)
+        gmm_array.fit(self.X, batch_size=64, n_jobs=2)
+        self.assertTrue(np.allclose(gmm_array.log_probs, gmm.log_probs))
+        self.assertTrue(np.allclose(gmm_array.means, gmm.means))
+
+    def test_accumulate_parallel(self):
+        class RecordingPool(object):
+            def __init__(self):
+                self.shards = []
+
+            def map(self, func, shards):
+                self.shards.extend(shards)
+                return map(func, shards)
+
+        pool = RecordingPool()
+        stats = self.gmm._accumulate_parallel(self.X, 64, pool, 3)
+
+        # every shard carries only its own vectors
+        self.assertEqual([shard[1].shape[0] for shard in pool.shards], [167, 167, 166])
+        self.assertEqual(stats[0], self.X.shape[0])
+        for acc, ref_acc in zip(stats[1:], self.gmm.accumulate(self.X, 64)[1:]):
+            self.assertTrue(np.allclose(acc, ref_acc))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,9 +7,12 @@ value of a base type instance.
 """
 
 from __future__ import unicode_literals
+import heapq
 import operator
+import numpy as np
 
 from collections import namedtuple, OrderedDict
+from math import log
 from alex.ml.exceptions import NBListException
 # from operator import mul
 
@@ -17,6 +20,46 @@ from alex.ml.exceptions import NBListException
 _HypWithEv = namedtuple('HypothesisWithEvidence', ['prob', 'fact', 'evidence'])
 
 
+def gen_nbest_indices(alternatives_probs):
+    """Generates the hypotheses of a sequence of independent positions with alternatives from the most probable
+    to the least probable one.
+
+    A hypothesis is represented by an index which selects one alternative at every position. The probabilities of
+    the alternatives at every position must be sorted from the most probable to the least probable one.
+
+    The hypotheses are expanded lazily from a priority queue keyed by their log probabilities which are updated
+    incrementally when a hypothesis is expanded. Every hypothesis is generated from exactly one parent: its
+    successors use the next worse alternative at one of the positions from the last changed position on.
+    Therefore, the caller can stop after it has got enough hypotheses.
+
+    :param alternatives_probs: a list of lists of the probabilities of the alternatives at every position
+    :return: an iterator over (log probability, hypothesis index) tuples
+    """
+    log_probs = [[log(p) if p > 0.0 else float('-inf') for p in probs] for probs in alternatives_probs]
+    if not all(log_probs):
+        return
+
+    inf = float('inf')
+    # the heap is ordered by the negative log probabilities
+    heap = [(-sum(lp[0] for lp in log_probs), tuple([0] * len(log_probs)), 0)]
+    while heap:
+        neg_log_prob, hyp_index, last = heapq.heappop(heap)
+
+        yield -neg_log_prob, hyp_index
+
+        for i in xrange(last, len(hyp_index)):
+            alt = hyp_index[i] + 1
+            if alt >= len(log_probs[i]):
+                continue
+
+            if neg_log_prob == inf:
+                next_neg_log_prob = inf
+            else:
+                next_neg_log_prob = neg_log_prob + log_probs[i][alt - 1] - log_probs[i][alt]
+
+            heapq.heappush(heap, (next_neg_log_prob, hyp_index[:i] + (alt,) + hyp_index[i + 1:], i))
+
+
 class Hypothesis(object):
     """This is the base class for all forms of probabilistic hypotheses
     representations.
@@ -39,6 +82,9 @@ class NBList(Hypothesis):
     1. add utterances or parse a confusion network
     2. merge and normalise, in either order
 
+    The hypotheses are merged by hashing the keys of their facts, see _fact_key(). The subclasses whose facts do
+    not hash consistently with their equality must override it.
+
     """
     # NOTE the class invariant: self.n_best is always sorted from the most to
     # the least probable hypothesis.
@@ -78,38 +124,51 @@ class NBList(Hypothesis):
         """Returns the most probable value of the object."""
         return self.n_best[0][1]
 
+    def get_probs(self):
+        """Returns the probabilities of the hypotheses as a numpy array in the order of the n-best list."""
+        return np.fromiter((prob for prob, fact in self.n_best), dtype=np.float64, count=len(self.n_best))
+
     def add(self, probability, fact):
         """\
-        Finds the last hypothesis with a lower probability and inserts the
-        new item before that one.  Optimised for adding objects from the
-        highest probability ones to the lowest probability ones.
+        Finds the first hypothesis with a lower probability by bisection and
+        inserts the new item before that one.  Therefore, the new item is
+        inserted after all hypotheses with the same probability.
 
         """
-        insert_idx = len(self.n_best)
-        while insert_idx > 0:
-            insert_idx -= 1
-            if probability <= self.n_best[insert_idx][0]:
-                insert_idx += 1
-                break
-        self.n_best.insert(insert_idx, [probability, fact])
+        lo, hi = 0, len(self.n_best)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if probability <= self.n_best[mid][0]:
+                lo = mid + 1
+            else:
+                hi = mid
+        self.n_best.insert(lo, [probability, fact])
         return self
 
+    def _fact_key(self, fact):
+        """Returns a hashable key of the fact. The facts are equal iff their keys are equal."""
+        return fact
+
+    def _merge_hyp(self, hyp, other_hyp):
+        """Merges the hypothesis other_hyp with the same fact into hyp."""
+        hyp[0] += other_hyp[0]
+
     def merge(self):
         """Adds up probabilities for the same hypotheses. Returns self."""
         if len(self.n_best) <= 1:
-            return
-        else:
-            new_n_best = self.n_best[:1]
-
-            for cur_idx in xrange(1, len(self.n_best)):
-                cur_hyp = self.n_best[cur_idx]
-                for new_idx, new_hyp in enumerate(new_n_best):
-                    if new_hyp[1] == cur_hyp[1]:
-                        # Merge, add the probabilities.
-                        new_hyp[0] += cur_hyp[0]
-                        break
-                else:
-                    new_n_best.append(cur_hyp)
+            return self
+
+        new_n_best = []
+        key2hyp = {}
+        for cur_hyp in self.n_best:
+            key = self._fact_key(cur_hyp[1])
+            new_hyp = key2hyp.get(key)
+            if new_hyp is None:
+                key2hyp[key] = cur_hyp
+                new_n_best.append(cur_hyp)
+            else:
+                # Merge, add the probabilities.
+                self._merge_hyp(new_hyp, cur_hyp)
 
         self.n_best = sorted(new_n_best, reverse=True)
         return self
@@ -131,10 +190,11 @@ class NBList(Hypothesis):
         """
         tot = 0.0
         other_idx = -1
+        other_key = self._fact_key(other)
         for hyp_idx in range(len(self.n_best)):
             tot += self.n_best[hyp_idx][0]
 
-            if self.n_best[hyp_idx][1] == other:
+            if self._fact_key(self.n_best[hyp_idx][1]) == other_key:
                 if other_idx != -1:
                     raise NBListException(
                         'N-best list includes multiple "other" objects: '
@@ -1,6 +1,55 @@
+from itertools import product
 from unittest import TestCase
 
-from alex.ml.hypothesis import ConfusionNetwork
+from alex.ml.hypothesis import ConfusionNetwork, NBList, gen_nbest_indices
+
+
+class TestNBList(TestCase):
+    def test_add(self):
+        nblist = NBList()
+        for prob, fact in [(0.1, 'a'), (0.5, 'b'), (0.1, 'c'), (0.3, 'd'), (0.5, 'e'), (0.0, 'f')]:
+            nblist.add(prob, fact)
+
+        # the hypotheses with the same probability keep the order in which they were added
+        self.assertEqual(nblist.n_best, [[0.5, 'b'], [0.5, 'e'], [0.3, 'd'], [0.1, 'a'], [0.1, 'c'], [0.0, 'f']])
+        self.assertEqual(nblist.get_probs().tolist(), [0.5, 0.5, 0.3, 0.1, 0.1, 0.0])
+
+    def test_merge(self):
+        nblist = NBList()
+        for prob, fact in [(0.1, 'a'), (0.2, 'b'), (0.3, 'a'), (0.05, 'c'), (0.05, 'b')]:
+            nblist.add(prob, fact)
+        nblist.merge()
+
+        self.assertEqual([fact for prob, fact in nblist], ['a', 'b', 'c'])
+        for (prob, fact), expected_prob in zip(nblist, [0.4, 0.25, 0.05]):
+            self.assertAlmostEqual(prob, expected_prob)
+
+        nblist.add_other('other')
+        self.assertEqual(nblist[-1][1], 'other')
+        self.assertAlmostEqual(nblist[-1][0], 0.3)
+
+
+class TestGenNBestIndices(TestCase):
+    def test_order(self):
+        alternatives_probs = [[0.5, 0.3, 0.2], [0.9, 0.1], [0.6, 0.4, 0.0], [1.0]]
+
+        hyps = list(gen_nbest_indices(alternatives_probs))
+
+        # every hypothesis is generated exactly once
+        self.assertEqual(sorted(hyp_index for log_prob, hyp_index in hyps),
+                         list(product(*[range(len(probs)) for probs in alternatives_probs])))
+
+        log_probs = [log_prob for log_prob, hyp_index in hyps]
+        for log_prob, next_log_prob in zip(log_probs, log_probs[1:]):
+            self.assertGreaterEqual(log_prob + 1e-12, next_log_prob)
+
+        self.assertEqual(hyps[0][1], (0, 0, 0, 0))
+        self.assertEqual(hyps[1][1], (0, 0, 1, 0))
+        self.assertEqual(log_probs[-1], float('-inf'))
+
+    def test_no_alternatives(self):
+        self.assertEqual(list(gen_nbest_indices([[1.0], []])), [])
+        self.assertEqual(list(gen_nbest_indices([])), [(0, ())])
 
 class TestConfusionNetwork(TestCase):
     def test_iter(self):
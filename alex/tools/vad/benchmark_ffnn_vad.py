@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+if __name__ == '__main__':
+    import autopath
+
+import argparse
+import time
+import wave
+
+from collections import deque
+from math import log
+
+import numpy as np
+from scipy.misc import logsumexp
+
+from alex.components.vad.ffnn import FFNNVAD
+from alex.utils.config import Config
+
+""" This program measures the CPU time the FFNN VAD needs to process one second of audio.
+
+It compares the batched decisions of FFNNVAD with the original frame by frame processing which scores a single
+frame by the neural network and recomputes the smoothed posterior over the whole filter for every frame.
+
+"""
+
+
+def load_audio(file_name, sample_rate, length):
+    if file_name:
+        wave_in = wave.open(file_name, 'r')
+        return wave_in.readframes(wave_in.getnframes())
+
+    # white noise with random bursts of louder noise
+    random = np.random.RandomState(0)
+    audio = random.randn(int(sample_rate * length)) * 300
+    for start in random.randint(0, len(audio), int(length)):
+        audio[start:start + sample_rate / 2] *= 10
+
+    return np.clip(audio, -32768, 32767).astype(np.int16).tostring()
+
+
+class PerFrameDecider(object):
+    """Reproduces the frame by frame processing of the FFNNVAD before the decisions were batched."""
+
+    def __init__(self, vad):
+        self.vad = vad
+        self.audio_recorded_in = []
+        self.log_probs_speech = deque(maxlen=vad.log_posteriors_speech.maxlen)
+        self.log_probs_sil = deque(maxlen=vad.log_posteriors_speech.maxlen)
+        self.last_decision = 0.0
+
+    def decide(self, data):
+        self.audio_recorded_in.extend(np.frombuffer(data, dtype=np.int16).tolist())
+
+        while len(self.audio_recorded_in) > self.vad.framesize:
+            frame = self.audio_recorded_in[:self.vad.framesize]
+            self.audio_recorded_in = self.audio_recorded_in[self.vad.frameshift:]
+
+            mfcc = self.vad.front_end.param(frame)
+
+            prob_sil, prob_speech = self.vad.ffnn.predict_normalise(mfcc.reshape(1, len(mfcc)))[0]
+
+            self.log_probs_speech.append(log(prob_speech))
+            self.log_probs_sil.append(log(prob_sil))
+
+            log_prob_speech_avg = 0.0
+            for log_prob_speech, log_prob_sil in zip(self.log_probs_speech, self.log_probs_sil):
+                log_prob_speech_avg += log_prob_speech - logsumexp([log_prob_speech, log_prob_sil])
+            log_prob_speech_avg /= len(self.log_probs_speech)
+
+            self.last_decision = np.exp(log_prob_speech_avg)
+
+        return self.last_decision
+
+
+def benchmark(name, decide, audio, chunk_size, audio_length):
+    start = time.clock()
+    for i in range(0, len(audio), chunk_size):
+        decide(audio[i:i + chunk_size])
+    cpu_time = time.clock() - start
+
+    print "  %-40s %8.2f ms CPU per second of audio (real-time factor %.4f)" % \
+          (name, 1000.0 * cpu_time / audio_length, cpu_time / audio_length)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description="Measures the CPU time of the FFNN VAD per second of audio.")
+
+    parser.add_argument('-c', '--configs', nargs='+', default=[],
+                        help='additional configuration files')
+    parser.add_argument('--wav', action="store", default=None,
+                        help='a 16 bit mono wav file with the sample rate from the config, '
+                             'by default a synthetic signal is used')
+    parser.add_argument('--length', action="store", default=60.0, type=float,
+                        help='the length of the synthetic signal in seconds')
+
+    args = parser.parse_args()
+
+    cfg = Config.load_configs(args.configs, log=False)
+
+    sample_rate = cfg['Audio']['sample_rate']
+    audio = load_audio(args.wav, sample_rate, args.length)
+    audio_length = len(audio) / 2.0 / sample_rate
+
+    print "Audio length: %.1f s" % audio_length
+
+    # the VoipIO sends the audio to the VAD in chunks of samples_per_frame samples
+    for chunk_samples in [cfg['Audio']['samples_per_frame'], sample_rate / 10, sample_rate]:
+        print "Chunk: %d samples" % chunk_samples
+        benchmark('per frame decide()', PerFrameDecider(FFNNVAD(cfg)).decide, audio, 2 * chunk_samples, audio_length)
+        benchmark('batched decide()', FFNNVAD(cfg).decide, audio, 2 * chunk_samples, audio_length)
+
+
+if __name__ == '__main__':
+    main()
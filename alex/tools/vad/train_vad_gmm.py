@@ -68,7 +68,7 @@ def mixup(gmm, vta, name):
 
 def train_gmm(name, vta):
 
-    vta = [frame for frame, label in vta if label == name]
+    vta = np.array([frame for frame, label in vta if label == name])
 
     gmm = GMM(n_features=36, n_components=1, n_iter=n_iter)
     gmm.fit(vta)
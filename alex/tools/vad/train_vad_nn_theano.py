@@ -53,6 +53,7 @@ learning_rate = 20e-3 # 5e-2
 learning_rate_decay = 100.0
 weight_l2=1e-6
 batch_size= 500000 
+n_jobs = 4
 
 
 def load_mlf(train_data_sil_aligned, max_files, max_frames_per_segment):
@@ -101,7 +102,10 @@ def gen_features(speech_data, speech_alignment):
     print "The length of sil segments:    ", sil_count
     print "The length of speech segments: ", speech_count
 
-    mfcc = vta.__iter__().next()
+    print "Extracting the features into:", features_store_dir
+    store = MLFFeatureStore.build(vta, features_store_dir, n_jobs=n_jobs)
+
+    mfcc = store.__iter__().next()
 
     print "Features vector length:", len(mfcc[0])
     input_size = len(mfcc[0])
@@ -113,7 +117,7 @@ def gen_features(speech_data, speech_alignment):
     train_y = []
     i = 0
     samplingC = 0
-    for frame, label in vta:
+    for frame, label in store:
         # downcast
         frame = frame.astype(np.float32)
     #        frame = frame - (10.0 if mel_banks_only else 0.0)
@@ -320,6 +324,7 @@ def main():
     global crossvalid_frames, usec0
     global hidden_dropouts, weight_l2
     global mel_banks_only
+    global n_jobs, features_store_dir
     global features_file_name
 
     parser = argparse.ArgumentParser(
@@ -363,6 +368,8 @@ def main():
                         help='proportion of hidden_dropouts: default %d' % hidden_dropouts)
     parser.add_argument('--weight_l2', action="store", default=weight_l2, type=float,
                         help='use weight L2 regularisation: default %d' % weight_l2)
+    parser.add_argument('--n_jobs', action="store", default=n_jobs, type=int,
+                        help='number of processes extracting the features: default %d' % n_jobs)
 
     args = parser.parse_args()
     sys.argv = []
@@ -386,6 +393,7 @@ def main():
     mel_banks_only = args.mel_banks_only
     hidden_dropouts = args.hidden_dropouts
     weight_l2 = args.weight_l2
+    n_jobs = args.n_jobs
 
     # add all the training data
     train_speech = []
@@ -404,6 +412,10 @@ def main():
                              (max_frames, max_files, max_frames_per_segment, trim_segments,
                               usec0, usedelta, useacc, mel_banks_only)
 
+    # the features are extracted only once for all experiments with the same data and front-end settings
+    features_store_dir = "model_voip/vad_sds_mfcc_usec0%d_usedelta%d_useacc%d_mbo%d.store" % \
+                         (usec0, usedelta, useacc, mel_banks_only)
+
     print datetime.datetime.now()
 
     train_nn(train_speech, train_speech_alignment)
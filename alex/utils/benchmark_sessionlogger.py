@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Measures the time the SessionLogger needs to log a synthetic call with 100 turns. It compares the journaled
+session log with rewriting the whole session.xml after every event as the logger used to do.
+"""
+
+if __name__ == "__main__":
+    import autopath
+
+import argparse
+import shutil
+import tempfile
+import time
+
+from alex.utils.sessionlogger import SessionLogger
+
+
+class RewritingSessionLogger(SessionLogger):
+    """Rewrites the whole session.xml after every change of the session document."""
+
+    def _journal_append(self, parent, element, first=False):
+        SessionLogger._journal_append(self, parent, element, first)
+        self._write_session_xml()
+
+    def _journal_set(self, element, name, value):
+        SessionLogger._journal_set(self, element, name, value)
+        self._write_session_xml()
+
+
+def log_call(sl, n_turns):
+    """Logs a call with n_turns system and user turns. Returns the times of logging the individual turns."""
+    sl._config('config = {}')
+    sl._header("Default alex", "1.0")
+    sl._input_source("voip")
+    sl._dialogue_rec_start(None, "both_complete_dialogue.wav")
+
+    turn_times = []
+    for i in range(n_turns):
+        start = time.time()
+
+        sl._turn("system")
+        sl._dialogue_act("system", u"inform(from_stop=\"Anděl\")&request(to_stop)")
+        sl._text("system", u"Z Anděla. Kam chcete jet?", cost=0.5)
+        sl._dialogue_state("system", [[("from_stop", u"Anděl"), ("to_stop", "None"), ("time", "None")]])
+        sl._rec_start("system", "system%d.wav" % i)
+        sl._rec_end("system%d.wav" % i)
+
+        sl._turn("user")
+        sl._rec_start("user", "user%d.wav" % i)
+        for j in range(10):
+            sl._rec_write("user%d.wav" % i, b'\0\0' * 256)
+        sl._rec_end("user%d.wav" % i)
+        sl._asr("user", "user%d.wav" % i, [(0.7, u"na florenc"), (0.2, u"na florencii"), (0.1, u"na floru")])
+        sl._slu("user", "user%d.wav" % i, [(0.8, u"inform(to_stop=\"Florenc\")"), (0.2, "null()")])
+
+        turn_times.append(time.time() - start)
+
+    sl._hangup("user")
+    sl._dialogue_rec_end("both_complete_dialogue.wav")
+    sl._session_end()
+
+    return turn_times
+
+
+def benchmark(name, logger_class, n_turns):
+    sess_dir = tempfile.mkdtemp()
+    try:
+        sl = logger_class()
+        sl.set_cfg({'Audio': {'sample_rate': 16000}})
+        sl._session_start(sess_dir)
+
+        start = time.time()
+        turn_times = log_call(sl, n_turns)
+        total = time.time() - start
+
+        print "  %-12s total: %8.3f s  first turn: %8.2f ms  last turn: %8.2f ms" % \
+              (name, total, 1000.0 * turn_times[0], 1000.0 * turn_times[-1])
+    finally:
+        shutil.rmtree(sess_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures the time of logging a synthetic call.")
+    parser.add_argument('--turns', action="store", default=100, type=int,
+                        help='the number of system and user turns of the call')
+    args = parser.parse_args()
+
+    print "Logging a call with %d turns" % args.turns
+    benchmark('rewriting', RewritingSessionLogger, args.turns)
+    benchmark('journaled', SessionLogger, args.turns)
+
+
+if __name__ == "__main__":
+    main()
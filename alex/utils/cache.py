@@ -11,41 +11,232 @@ import os.path
 import cPickle as pickle
 import fcntl
 import hashlib
+import sqlite3
+import sys
+import threading
+import time
 
-from itertools import ifilterfalse
-from heapq import nsmallest
-from operator import itemgetter
+from alex.utils.exceptions import ConfigException
 
 persistent_cache_directory = '~/.alex_persistent_cache'
 
+# the budget of the SQLite storage of the persistent cache, see configure_persistent_cache()
+persistent_cache_max_entries = 100000
+persistent_cache_max_size = 1024 ** 3       # in bytes
+persistent_cache_ttl = None                 # in seconds, None means that the entries do not expire
 
-class Counter(dict):
-    'Mapping where default values are zero'
-    def __missing__(self, key):
-        return 0
 
+_caches = []
+_caches_lock = threading.Lock()
+_last_cache_report_time = time.time()
 
-def lru_cache(maxsize=100):
-    '''Least-recently-used cache decorator.
 
-    Arguments to the cached function must be hashable.
-    Cache performance statistics stored in f.hits and f.misses.
-    Clear the cache with f.clear().
-    http://en.wikipedia.org/wiki/Cache_algorithms#Least_Recently_Used
+def register_cache(cache):
+    """Registers the cache so that its statistics are included in get_cache_stats() and get_cache_report()."""
+    with _caches_lock:
+        _caches.append(cache)
 
-    '''
-    maxqueue = maxsize * 10
 
-    def decorator(user_function, len=len, iter=iter, tuple=tuple, sorted=sorted, KeyError=KeyError):
-        cache = {}                  # mapping of args to results
-        queue = collections.deque()  # order that keys have been used
-        refcount = Counter()        # times each key is in the queue
-        sentinel = object()         # marker for looping around the queue
-        kwd_mark = object()         # separate positional and keyword args
+def get_caches():
+    """Returns all registered caches in this process."""
+    with _caches_lock:
+        return list(_caches)
+
+
+def get_cache_stats():
+    """Returns a list of the statistics of all registered caches in this process."""
+    return [cache.get_stats() for cache in get_caches()]
+
+
+def get_cache_report():
+    s = []
+    s.append("Cache statistics:")
+    for stats in get_cache_stats():
+        requests = stats['hits'] + stats['misses']
+        s.append("  %-60s hit rate = %6.2f%%  hits = %8d  misses = %8d  evictions = %8d  entries = %7d  size = %d" %
+                 (stats['name'], 100.0 * stats['hits'] / requests if requests else 0.0, stats['hits'],
+                  stats['misses'], stats['evictions'], stats['entries'], stats['size']))
+
+    return '\n'.join(s)
+
+
+def pop_cache_report(report_interval=60.0):
+    """Returns the report of all registered caches if the report interval has elapsed since the last report,
+    otherwise None."""
+    global _last_cache_report_time
+
+    if time.time() - _last_cache_report_time < report_interval:
+        return None
+
+    _last_cache_report_time = time.time()
+    if not get_caches():
+        return None
 
-        # lookup optimizations (ugly but fast)
-        queue_append, queue_popleft = queue.append, queue.popleft
-        queue_appendleft, queue_pop = queue.appendleft, queue.pop
+    return get_cache_report()
+
+
+class LRUCache(object):
+    """Least-recently-used cache with O(1) get, put and eviction.
+
+    The number of entries is bounded by maxsize and the total size of the values by maxbytes. The size of a value
+    is computed by the sizer, sys.getsizeof by default. None means no bound.
+
+    All operations are thread safe.
+    """
+
+    def __init__(self, maxsize=100, maxbytes=None, sizer=None, name=None):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.sizer = sizer or sys.getsizeof
+        self.name = name
+
+        self.lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self._clear()
+            self.size = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def _clear(self):
+        # mapping of keys to (value, size), ordered from the least recently used
+        self.entries = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def _get_size(self, value):
+        if self.maxbytes is None:
+            return 0
+
+        return self.sizer(value)
+
+    def _over_budget(self, new_entries=0, new_size=0):
+        return (self.maxsize is not None and len(self.entries) + new_entries > self.maxsize) or \
+               (self.maxbytes is not None and self.size + new_size > self.maxbytes)
+
+    def get(self, key):
+        """Returns the cached value. Raises KeyError if the key is not cached."""
+        with self.lock:
+            try:
+                value, size = self.entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                raise
+
+            self.entries[key] = (value, size)
+            self.hits += 1
+
+            return value
+
+    def put(self, key, value):
+        size = self._get_size(value)
+
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+
+            self.entries[key] = (value, size)
+            self.size += size
+
+            while self.entries and self._over_budget():
+                self._evict()
+
+    def _evict(self):
+        key, (value, size) = self.entries.popitem(last=False)
+        self.size -= size
+        self.evictions += 1
+
+    def get_stats(self):
+        with self.lock:
+            return {'name': self.name, 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'entries': len(self), 'size': self.size}
+
+
+class LFUCache(LRUCache):
+    """Least-frequently-used cache with O(1) get, put and eviction.
+
+    The entries are kept in buckets by their use count. The least recently used entry of the bucket with
+    the smallest use count is evicted first.
+    """
+
+    def _clear(self):
+        # mapping of keys to (value, size, use count)
+        self.entries = {}
+        # mapping of use counts to the keys ordered from the least recently used
+        self.buckets = collections.defaultdict(collections.OrderedDict)
+        self.min_count = 0
+
+    def _use(self, key, count):
+        bucket = self.buckets[count]
+        del bucket[key]
+        if not bucket:
+            del self.buckets[count]
+            if self.min_count == count:
+                self.min_count = count + 1
+
+        self.buckets[count + 1][key] = None
+
+    def get(self, key):
+        """Returns the cached value. Raises KeyError if the key is not cached."""
+        with self.lock:
+            try:
+                value, size, count = self.entries[key]
+            except KeyError:
+                self.misses += 1
+                raise
+
+            self._use(key, count)
+            self.entries[key] = (value, size, count + 1)
+            self.hits += 1
+
+            return value
+
+    def put(self, key, value):
+        size = self._get_size(value)
+
+        with self.lock:
+            if key in self.entries:
+                old_value, old_size, count = self.entries[key]
+                self.size -= old_size
+                self._use(key, count)
+                self.entries[key] = (value, size, count + 1)
+            else:
+                # make room before the new entry is inserted, otherwise it would be the first to be evicted
+                while self.entries and self._over_budget(1, size):
+                    self._evict()
+
+                self.entries[key] = (value, size, 1)
+                self.buckets[1][key] = None
+                self.min_count = 1
+            self.size += size
+
+            while self.entries and self._over_budget():
+                self._evict()
+
+    def _evict(self):
+        bucket = self.buckets[self.min_count]
+        key, _ = bucket.popitem(last=False)
+        if not bucket:
+            del self.buckets[self.min_count]
+            self.min_count = min(self.buckets) if self.buckets else 0
+
+        value, size, count = self.entries.pop(key)
+        self.size -= size
+        self.evictions += 1
+
+
+def _cache_decorator(cache_class, maxsize, maxbytes, sizer, name):
+    def decorator(user_function):
+        cache = cache_class(maxsize, maxbytes, sizer,
+                            name or '%s.%s' % (user_function.__module__, user_function.__name__))
+        register_cache(cache)
+        kwd_mark = object()         # separate positional and keyword args
 
         @functools.wraps(user_function)
         def wrapper(*args, **kwds):
@@ -54,108 +245,60 @@ def lru_cache(maxsize=100):
             if kwds:
                 key += (kwd_mark,) + tuple(sorted(kwds.items()))
 
-            # record recent use of this key
-            queue_append(key)
-            refcount[key] += 1
-
             # get cache entry or compute if not found
             try:
-                result = cache[key]
-                wrapper.hits += 1
+                result = cache.get(key)
             except KeyError:
                 result = user_function(*args, **kwds)
-                cache[key] = result
-                wrapper.misses += 1
+                cache.put(key, result)
 
-                # purge least recently used cache entry
-                if len(cache) > maxsize:
-                    key = queue_popleft()
-                    refcount[key] -= 1
-                    while refcount[key]:
-                        key = queue_popleft()
-                        refcount[key] -= 1
-                    del cache[key], refcount[key]
-
-            # periodically compact the queue by eliminating duplicate keys
-            # while preserving order of most recent access
-            if len(queue) > maxqueue:
-                refcount.clear()
-                queue_appendleft(sentinel)
-                for key in ifilterfalse(refcount.__contains__,
-                                        iter(queue_pop, sentinel)):
-                    queue_appendleft(key)
-                    refcount[key] = 1
+            wrapper.hits, wrapper.misses = cache.hits, cache.misses
 
             return result
 
         def clear():
             cache.clear()
-            queue.clear()
-            refcount.clear()
             wrapper.hits = wrapper.misses = 0
 
         wrapper.hits = wrapper.misses = 0
         wrapper.clear = clear
+        wrapper.cache = cache
 
         return wrapper
 
     return decorator
 
 
-def lfu_cache(maxsize=100):
-    '''Least-frequently-used cache decorator.
+def lru_cache(maxsize=100, maxbytes=None, sizer=None, name=None):
+    '''Least-recently-used cache decorator.
 
     Arguments to the cached function must be hashable.
     Cache performance statistics stored in f.hits and f.misses.
     Clear the cache with f.clear().
-    http://en.wikipedia.org/wiki/Least_Frequently_Used
+    http://en.wikipedia.org/wiki/Cache_algorithms#Least_Recently_Used
+
+    The cache is registered under the given name or the name of the function, see LRUCache for the other arguments.
 
     '''
-    def decorator(user_function):
-        cache = {}                      # mapping of args to results
-        use_count = Counter()           # times each key has been accessed
-        kwarg_mark = object()           # separate positional and keyword args
+    return _cache_decorator(LRUCache, maxsize, maxbytes, sizer, name)
 
-        @functools.wraps(user_function)
-        def wrapper(*args, **kwargs):
-            key = args
-            if kwargs:
-                key += (kwarg_mark,) + tuple(sorted(kwargs.items()))
 
-            # get cache entry or compute if not found
-            try:
-                result = cache[key]
-                use_count[key] += 1
-                wrapper.hits += 1
-            except KeyError:
-                # need to add something to the cache, make room if necessary
-                if len(cache) == maxsize:
-                    for k, _ in nsmallest(maxsize // 10 or 1,
-                                          use_count.iteritems(),
-                                          key=itemgetter(1)):
-                        del cache[k], use_count[k]
-                cache[key] = user_function(*args, **kwargs)
-                result = cache[key]
-                use_count[key] += 1
-                wrapper.misses += 1
-            return result
-
-        def clear():
-            cache.clear()
-            use_count.clear()
-            wrapper.hits = wrapper.misses = 0
+def lfu_cache(maxsize=100, maxbytes=None, sizer=None, name=None):
+    '''Least-frequently-used cache decorator.
 
-        wrapper.hits = wrapper.misses = 0
-        wrapper.clear = clear
-        wrapper.cache = cache
+    Arguments to the cached function must be hashable.
+    Cache performance statistics stored in f.hits and f.misses.
+    Clear the cache with f.clear().
+    http://en.wikipedia.org/wiki/Least_Frequently_Used
 
-        return wrapper
+    The cache is registered under the given name or the name of the function, see LRUCache for the other arguments.
 
-    return decorator
+    '''
+    return _cache_decorator(LFUCache, maxsize, maxbytes, sizer, name)
 
 
-def get_persitent_cache_content(key):
-    key_name = os.path.join(persistent_cache_directory, '_'.join([str(i) for i in key]).replace(' ', '_'))
+def get_persitent_cache_content(key, directory=None):
+    key_name = os.path.join(directory or persistent_cache_directory, '_'.join([str(i) for i in key]).replace(' ', '_'))
     
     try:
         # you cannot have exlusive lock if you don't ask for writing permissions
@@ -173,8 +316,8 @@ def get_persitent_cache_content(key):
     return data
 
 
-def set_persitent_cache_content(key, value):
-    key_name = os.path.join(persistent_cache_directory,'_'.join([str(i) for i in key]).replace(' ', '_'))
+def set_persitent_cache_content(key, value, directory=None):
+    key_name = os.path.join(directory or persistent_cache_directory,'_'.join([str(i) for i in key]).replace(' ', '_'))
     
     f = open(key_name, 'wb')
     fcntl.lockf(f, fcntl.LOCK_EX)
@@ -185,15 +328,268 @@ def set_persitent_cache_content(key, value):
     f.close()
 
 
-def persistent_cache(method=False, file_prefix='', file_suffix=''):
+class PersistentCacheStorage(object):
+    """The interface of the storages of the persistent_cache decorator.
+
+    The keys are strings. A missing or expired key raises KeyError in get().
+    """
+
+    def get(self, key):
+        raise NotImplementedError()
+
+    def set(self, key, value):
+        raise NotImplementedError()
+
+    def get_stats(self):
+        """Returns a dictionary with the statistics of the storage."""
+        raise NotImplementedError()
+
+
+class FilePersistentCacheStorage(PersistentCacheStorage):
+    """Stores every entry in a separate pickle file. It grows indefinitely."""
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        try:
+            value = get_persitent_cache_content((key,), self.directory)
+        except KeyError:
+            self.misses += 1
+            raise
+
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        set_persitent_cache_content((key,), value, self.directory)
+
+    def get_stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+class SQLitePersistentCacheStorage(PersistentCacheStorage):
+    """Stores all entries in a single SQLite database.
+
+    The number of entries and their total size in bytes are bounded. When the budget is exceeded, the least recently
+    used entries are evicted. If ttl is set, the entries older than ttl seconds expire.
+
+    All changes are done in transactions, so that the storage can be shared by several processes. Every process
+    opens its own connection to the database.
+
+    The access times of the hits are not written one by one, they are kept in the process and written in one
+    transaction when access_batch_size of them are collected or before the entries are evicted.
+    """
+
+    def __init__(self, file_name=None, max_entries=None, max_size=None, ttl=None, access_batch_size=100):
+        """
+        :param file_name: the database file, by default cache.sqlite in the persistent cache directory
+        :param max_entries: the maximum number of entries, None means unbounded
+        :param max_size: the maximum total size of the pickled values in bytes, None means unbounded
+        :param ttl: the time to live of the entries in seconds, None means that the entries do not expire
+        :param access_batch_size: the number of the access times of the hits which are written at once
+        """
+        self.file_name = file_name or os.path.join(persistent_cache_directory, 'cache.sqlite')
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.ttl = ttl
+        self.access_batch_size = access_batch_size
+
+        self.connection = None
+        self.connection_pid = None
+
+        # the access times of the hits which were not written yet and the number of these hits
+        self.accessed = {}
+        self.accessed_hits = 0
+
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def _connect(self):
+        # a connection must not be shared with the forked processes
+        if self.connection is None or self.connection_pid != os.getpid():
+            connection = sqlite3.connect(self.file_name, timeout=60.0, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+                               'size INTEGER NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)')
+            connection.execute('CREATE INDEX IF NOT EXISTS entries_created ON entries (created)')
+            # the number and the total size of the entries so that they do not have to be counted
+            connection.execute('CREATE TABLE IF NOT EXISTS totals (id INTEGER PRIMARY KEY, '
+                               'entries INTEGER NOT NULL, size INTEGER NOT NULL)')
+            connection.execute('INSERT OR IGNORE INTO totals VALUES (0, 0, 0)')
+
+            self.connection = connection
+            self.connection_pid = os.getpid()
+            self.accessed = {}
+            self.accessed_hits = 0
+
+        return self.connection
+
+    def _delete(self, connection, key):
+        row = connection.execute('SELECT size FROM entries WHERE key = ?', (key,)).fetchone()
+        if row:
+            connection.execute('DELETE FROM entries WHERE key = ?', (key,))
+            connection.execute('UPDATE totals SET entries = entries - 1, size = size - ? WHERE id = 0', row)
+
+    def _over_budget(self, entries, size):
+        return (self.max_entries is not None and entries > self.max_entries) or \
+               (self.max_size is not None and size > self.max_size)
+
+    def _write_accessed(self, connection):
+        connection.executemany('UPDATE entries SET accessed = ? WHERE key = ? AND accessed < ?',
+                               [(accessed, key, accessed) for key, accessed in self.accessed.iteritems()])
+        self.accessed = {}
+        self.accessed_hits = 0
+
+    def _evict(self, connection):
+        """Deletes the expired entries and the least recently used entries over the budget."""
+        if self.ttl is not None:
+            expired = connection.execute('SELECT key FROM entries WHERE created < ?',
+                                         (time.time() - self.ttl,)).fetchall()
+            for key, in expired:
+                self._delete(connection, key)
+            self.expirations += len(expired)
+
+        entries, size = connection.execute('SELECT entries, size FROM totals WHERE id = 0').fetchone()
+        while self._over_budget(entries, size):
+            lru = connection.execute('SELECT key, size FROM entries ORDER BY accessed LIMIT 100').fetchall()
+            if not lru:
+                break
+
+            for key, key_size in lru:
+                if not self._over_budget(entries, size):
+                    break
+
+                connection.execute('DELETE FROM entries WHERE key = ?', (key,))
+                entries -= 1
+                size -= key_size
+                self.evictions += 1
+
+            connection.execute('UPDATE totals SET entries = ?, size = ? WHERE id = 0', (entries, size))
+
+    def get(self, key):
+        connection = self._connect()
+        row = connection.execute('SELECT value, created FROM entries WHERE key = ?', (key,)).fetchone()
+
+        now = time.time()
+        if row and self.ttl is not None and now - row[1] > self.ttl:
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                self._delete(connection, key)
+                connection.execute('COMMIT')
+            except:
+                connection.execute('ROLLBACK')
+                raise
+            self.expirations += 1
+            row = None
+
+        if row is None:
+            self.misses += 1
+            raise KeyError(key)
+
+        self.accessed[key] = now
+        self.accessed_hits += 1
+        if self.accessed_hits >= self.access_batch_size:
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                self._write_accessed(connection)
+                connection.execute('COMMIT')
+            except:
+                connection.execute('ROLLBACK')
+                raise
+        self.hits += 1
+
+        return pickle.loads(str(row[0]))
+
+    def set(self, key, value):
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+
+        connection = self._connect()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            self._delete(connection, key)
+            connection.execute('INSERT INTO entries VALUES (?, ?, ?, ?, ?)',
+                               (key, sqlite3.Binary(data), len(data), now, now))
+            connection.execute('UPDATE totals SET entries = entries + 1, size = size + ? WHERE id = 0', (len(data),))
+            self._write_accessed(connection)
+            self._evict(connection)
+            connection.execute('COMMIT')
+        except:
+            connection.execute('ROLLBACK')
+            raise
+
+    def get_stats(self):
+        """Returns the hits, misses, evictions and expirations in this process and the number and the total size
+        of the stored entries."""
+        entries, size = self._connect().execute('SELECT entries, size FROM totals WHERE id = 0').fetchone()
+
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'expirations': self.expirations, 'entries': entries, 'size': size}
+
+
+_persistent_cache_storage = None
+
+
+def get_persistent_cache_storage():
+    """Returns the default storage of the persistent cache.
+
+    By default, it is a FilePersistentCacheStorage in the persistent cache directory, so that the entries cached
+    by the previous versions are found. The SQLite storage is set by configure_persistent_cache().
+    """
+    global _persistent_cache_storage
+
+    if _persistent_cache_storage is None:
+        _persistent_cache_storage = FilePersistentCacheStorage()
+
+    return _persistent_cache_storage
+
+
+def set_persistent_cache_storage(storage):
+    """Sets the default storage of the persistent cache, e.g. FilePersistentCacheStorage()."""
+    global _persistent_cache_storage
+
+    _persistent_cache_storage = storage
+
+
+def configure_persistent_cache(cfg):
+    """Sets the default storage of the persistent cache from cfg['General']['persistent_cache'], e.g.
+
+        'persistent_cache': {
+            'storage': 'sqlite',
+            'max_entries': 100000,
+            'max_size': 1024 ** 3,
+            'ttl': None,
+        },
+
+    The storage is 'file' or 'sqlite', the budget of the SQLite storage defaults to persistent_cache_max_entries,
+    persistent_cache_max_size and persistent_cache_ttl. Without the configuration, the default storage is kept.
+    """
+    cache_cfg = cfg.get('General', {}).get('persistent_cache')
+    if not cache_cfg:
+        return
+
+    storage = cache_cfg.get('storage', 'file')
+    if storage == 'file':
+        set_persistent_cache_storage(FilePersistentCacheStorage())
+    elif storage == 'sqlite':
+        set_persistent_cache_storage(
+            SQLitePersistentCacheStorage(max_entries=cache_cfg.get('max_entries', persistent_cache_max_entries),
+                                         max_size=cache_cfg.get('max_size', persistent_cache_max_size),
+                                         ttl=cache_cfg.get('ttl', persistent_cache_ttl)))
+    else:
+        raise ConfigException('Unsupported persistent cache storage: %s' % storage)
+
+
+def persistent_cache(method=False, file_prefix='', file_suffix='', storage=None):
     '''Persistent cache decorator.
 
-    It grows indefinitely.
+    The results are stored in the given storage or in the default storage returned by get_persistent_cache_storage().
     Arguments to the cached function must be hashable.
     Cache performance statistics stored in f.hits and f.misses.
 
     '''
-    sha = hashlib.sha1()
     def decorator(user_function):
         @functools.wraps(user_function)
         def wrapper(*args, **kwds):
@@ -209,17 +605,18 @@ def persistent_cache(method=False, file_prefix='', file_suffix=''):
 
             key += (file_suffix,)
 
-            key = (hashlib.sha224(str(key)).hexdigest(),)
+            key = hashlib.sha224(str(key)).hexdigest()
 
+            key_storage = storage or get_persistent_cache_storage()
             try:
-                result = get_persitent_cache_content(key)
+                result = key_storage.get(key)
                 wrapper.hits += 1
             except KeyError:
                 result = user_function(*args, **kwds)
                 wrapper.misses += 1
 
                 # record this key
-                set_persitent_cache_content(key, result)         
+                key_storage.set(key, result)
 
             return result
 
@@ -4,13 +4,18 @@
 
 import numpy
 import re
+import os
+import copy
 import glob
 import wave
+import hashlib
+import multiprocessing
+import cPickle as pickle
 
 from struct import unpack, pack
 
 from alex.utils.cache import lru_cache
-from alex.utils.mfcc import MFCCFrontEnd
+from alex.utils.mfcc import MFCCFrontEnd, frame_signal
 
 """
 The htk module implements classes for manipulation with the MLF files.
@@ -311,6 +316,7 @@ class MLFFeaturesAlignedArray:
         self.filter = filter
         self.mlfs = []
         self.trns = []
+        self.trn_index = {}
         self.last_file_name = None
         self.last_param_file_features = None
 
@@ -342,13 +348,47 @@ class MLFFeaturesAlignedArray:
 #    print "TF", trn_files
         self.trns.extend(trn_files)
 
+        for trn_file in trn_files:
+            self.trn_index.setdefault(os.path.splitext(os.path.basename(trn_file))[0], trn_file)
+
     @lru_cache(maxsize=100000)
     def get_param_file_name(self, file_name):
-        """Returns the matching param file name."""
+        """Returns the matching param file name.
+
+        The param files are looked up by their base names first, other file names are searched for in the paths
+        of all param files.
+        """
+        if file_name in self.trn_index:
+            return self.trn_index[file_name]
+
         for trn in self.trns:
             if file_name in trn:
                 return trn
 
+    def get_signature(self):
+        """Returns a hash of the alignments and the param files the frames are read from."""
+        h = hashlib.md5()
+        for mlf in self.mlfs:
+            h.update(pickle.dumps(sorted(mlf.mlf.items()), pickle.HIGHEST_PROTOCOL))
+        h.update(pickle.dumps(self.trns, pickle.HIGHEST_PROTOCOL))
+
+        return h.hexdigest()
+
+    def get_utterance_frames(self, file_name, transcription):
+        """Returns the frames of all aligned segments of a file and the labels of the segments.
+
+        :param file_name: a file name from a MLF
+        :param transcription: the aligned segments of the file
+        :return: a 2D array of the frames and a list of (the number of frames, the label) of the segments
+        """
+        frames = []
+        segments = []
+        for s, e, l in transcription:
+            frames.extend(self.get_frame(file_name, i) for i in range(s, e))
+            segments.append((e - s, l))
+
+        return numpy.array(frames), segments
+
     def get_frame(self, file_name, frame_id):
         """Returns a frame from a specific param file."""
         if self.last_file_name != file_name:
@@ -373,15 +413,20 @@ class MLFMFCCOnlineAlignedArray(MLFFeaturesAlignedArray):
 
     The experience suggests that our MFFC features are worse than the features generated by HCopy.
 
+    If block is set, the features of all frames of a wav file are computed at once by MFCCFrontEnd.param_block()
+    when the file is opened. This is much faster and it gives the same features as computing them one by one
+    as long as the frames of each file are requested in order and without gaps.
+
     """
 
     def __init__(self, windowsize=250000, targetrate=100000, filter=None,
                  usec0=False, usedelta=True, useacc=True,
-                 n_last_frames=0, mel_banks_only = False):
+                 n_last_frames=0, mel_banks_only = False, block=False):
         """Initialise the MFCC front-end.
 
         windowsize - defines the length of the window (frame) in the HTK's 100ns units
         targetrate - defines the period with which new coefficients should be generated (again in 100ns units)
+        block - compute the features of whole files at once
         """
         MLFFeaturesAlignedArray.__init__(self, filter)
 
@@ -392,8 +437,10 @@ class MLFMFCCOnlineAlignedArray(MLFFeaturesAlignedArray):
         self.useacc = useacc
         self.n_last_frames = n_last_frames
         self.mel_banks_only = mel_banks_only
+        self.block = block
 
         self.mfcc_front_end = None
+        self.last_file_mfcc = None
 
     def get_frame(self, file_name, frame_id):
         """Returns a frame from a specific param file."""
@@ -438,6 +485,16 @@ class MLFMFCCOnlineAlignedArray(MLFFeaturesAlignedArray):
                                                usedelta=self.usedelta, useacc=self.useacc,
                                                n_last_frames=self.n_last_frames, mel_banks_only = self.mel_banks_only)
 
+            if self.block:
+                self.last_file_mfcc = self.param_file()
+
+        if self.block:
+            if frame_id >= len(self.last_file_mfcc):
+                print file_name, frame_id, len(self.last_file_mfcc)
+                raise ValueError("MLFMFCCOnlineAlignedArray: the frame is not complete")
+
+            return self.last_file_mfcc[frame_id]
+
         # print "FS", self.frame_size
         self.last_param_file_features.setpos(max(frame_id * self.frame_shift - int(self.frame_size / 2), 0))
         frame = self.last_param_file_features.readframes(self.frame_size)
@@ -452,3 +509,227 @@ class MLFMFCCOnlineAlignedArray(MLFFeaturesAlignedArray):
             raise
             
         return mfcc_params
+
+    def get_signature(self):
+        """Returns a hash of the alignments, the param files and the settings of the front-end."""
+        h = hashlib.md5(MLFFeaturesAlignedArray.get_signature(self))
+        # the block mode gives different delta features when the aligned frames have gaps
+        h.update(repr((self.windowsize, self.targetrate, self.usec0, self.usedelta, self.useacc,
+                       self.n_last_frames, self.mel_banks_only, self.block)))
+
+        return h.hexdigest()
+
+    def param_file(self):
+        """Computes the features of all complete frames of the currently opened wav file.
+
+        The frames are at the same positions as in get_frame(), so the frames at the beginning of the file
+        which would start before the first sample start at the first sample.
+        """
+        self.last_param_file_features.rewind()
+        samples = self.last_param_file_features.readframes(self.last_param_file_features.getnframes())
+        samples = numpy.frombuffer(samples, dtype=numpy.int16)
+
+        if len(samples) < self.frame_size:
+            return self.mfcc_front_end.param_block([])
+
+        half_frame_size = int(self.frame_size / 2)
+        n_first_frames = half_frame_size // self.frame_shift + 1
+        first_frames = numpy.tile(samples[:self.frame_size], (n_first_frames, 1))
+        frames = frame_signal(samples[n_first_frames * self.frame_shift - half_frame_size:],
+                              self.frame_size, self.frame_shift)
+
+        return numpy.vstack([self.mfcc_front_end.param_block(first_frames),
+                             self.mfcc_front_end.param_block(frames)])
+
+
+_store_vta = None
+
+
+def _init_store_worker(vta):
+    global _store_vta
+    _store_vta = vta
+
+
+def _extract_utterance(args):
+    file_name, transcription = args
+    return _store_vta.get_utterance_frames(file_name, transcription)
+
+
+class MLFFeatureStore:
+
+    """Stores the aligned frames of MLFFeaturesAlignedArray precomputed on disk.
+
+    The features are extracted once by build() and saved in chunks of whole utterances. Every chunk is a pair of
+    npy files with the features and the label indexes which are memory mapped when the store is opened. The index
+    of the store maps the utterances to their positions in the chunks.
+
+    Iterating over the store gives the same frames and labels as iterating over the original array.
+    """
+
+    index_file_name = 'index.pickle'
+
+    def __init__(self, directory, filter=None):
+        self.directory = directory
+        self.filter = filter
+
+        f = open(os.path.join(directory, self.index_file_name), 'rb')
+        index = pickle.load(f)
+        f.close()
+
+        self.signature = index['signature']
+        self.labels = index['labels']
+        self.utterances = index['utterances']
+        self.utterance_index = dict((file_name, i) for i, (file_name, chunk, start, end) in enumerate(self.utterances))
+
+        self.chunks = []
+        for i in range(index['n_chunks']):
+            self.chunks.append((numpy.load(self.get_chunk_file_name(directory, i, 'x'), mmap_mode='r'),
+                                numpy.load(self.get_chunk_file_name(directory, i, 'y'), mmap_mode='r')))
+
+    def __len__(self):
+        return sum(len(y) for x, y in self.chunks)
+
+    def __iter__(self):
+        """Iterates over the frames as MLFFeaturesAlignedArray does."""
+        label_index = self.labels.index(self.filter) if self.filter in self.labels else None
+
+        for x, y in self.chunks:
+            for frame, label in zip(x, y):
+                if self.filter:
+                    if label == label_index:
+                        yield frame
+                else:
+                    yield [frame, self.labels[label]]
+
+    @staticmethod
+    def get_chunk_file_name(directory, i, name):
+        return os.path.join(directory, 'chunk%05d_%s.npy' % (i, name))
+
+    @classmethod
+    def build(cls, vta, directory, n_jobs=1, chunk_size=100000, dtype=numpy.float32):
+        """Extracts the features of the array into a store in the directory and opens it.
+
+        If the directory already contains a store built from the same data with the same settings,
+        the extraction is skipped.
+
+        :param vta: an instance of MLFFeaturesAlignedArray
+        :param directory: the directory of the store
+        :param n_jobs: the number of processes extracting the features
+        :param chunk_size: the minimal number of frames in a chunk, chunks end at the ends of utterances
+        :param dtype: the type the features are stored as
+        """
+        signature = vta.get_signature()
+
+        try:
+            store = cls(directory, filter=vta.filter)
+            if store.signature == signature:
+                return store
+        except IOError:
+            pass
+
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+        # the workers do not need the alignments as they get the segments of the utterances as arguments
+        worker_vta = copy.copy(vta)
+        worker_vta.mlfs = []
+        worker_vta.last_file_name = None
+        worker_vta.last_param_file_features = None
+        worker_vta.last_file_mfcc = None
+
+        tasks = [(file_name, mlf[file_name]) for mlf in vta.mlfs for file_name in mlf]
+
+        if n_jobs > 1:
+            pool = multiprocessing.Pool(n_jobs, _init_store_worker, (worker_vta, ))
+            results = pool.imap(_extract_utterance, tasks, chunksize=16)
+        else:
+            pool = None
+            _init_store_worker(worker_vta)
+            results = (_extract_utterance(task) for task in tasks)
+
+        labels = []
+        label_indexes = {}
+        utterances = []
+        n_chunks = 0
+        chunk_x = []
+        chunk_y = []
+        chunk_length = 0
+
+        try:
+            for (file_name, transcription), (frames, segments) in zip(tasks, results):
+                y = []
+                for n, l in segments:
+                    if l not in label_indexes:
+                        label_indexes[l] = len(labels)
+                        labels.append(l)
+                    y.extend([label_indexes[l]] * n)
+
+                if not y:
+                    continue
+
+                utterances.append((file_name, n_chunks, chunk_length, chunk_length + len(y)))
+                chunk_x.append(frames.astype(dtype))
+                chunk_y.append(numpy.array(y, dtype=numpy.int32))
+                chunk_length += len(y)
+
+                if chunk_length >= chunk_size:
+                    numpy.save(cls.get_chunk_file_name(directory, n_chunks, 'x'), numpy.vstack(chunk_x))
+                    numpy.save(cls.get_chunk_file_name(directory, n_chunks, 'y'), numpy.concatenate(chunk_y))
+                    n_chunks += 1
+                    chunk_x, chunk_y, chunk_length = [], [], 0
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        if chunk_length:
+            numpy.save(cls.get_chunk_file_name(directory, n_chunks, 'x'), numpy.vstack(chunk_x))
+            numpy.save(cls.get_chunk_file_name(directory, n_chunks, 'y'), numpy.concatenate(chunk_y))
+            n_chunks += 1
+
+        # the index is written last, so an interrupted extraction is not mistaken for a complete store
+        index_file_name = os.path.join(directory, cls.index_file_name)
+        f = open(index_file_name + '.tmp', 'wb')
+        pickle.dump({'signature': signature, 'labels': labels, 'utterances': utterances, 'n_chunks': n_chunks},
+                    f, pickle.HIGHEST_PROTOCOL)
+        f.close()
+        os.rename(index_file_name + '.tmp', index_file_name)
+
+        return cls(directory, filter=vta.filter)
+
+    def get_utterance(self, file_name):
+        """Returns the features and the label indexes of the frames of an utterance."""
+        file_name, chunk, start, end = self.utterances[self.utterance_index[file_name]]
+        x, y = self.chunks[chunk]
+
+        return x[start:end], y[start:end]
+
+    def get_data(self):
+        """Returns the features and the label indexes of all frames as arrays in the memory."""
+        return numpy.vstack([x for x, y in self.chunks]), numpy.concatenate([y for x, y in self.chunks])
+
+    def gen_batches(self, batch_size, shuffle=True, random=None):
+        """Generates mini-batches of the features and the label indexes.
+
+        With shuffle, the chunks are visited in a random order and the frames of each chunk are permuted, so only
+        one chunk is read into the memory at a time. A batch does not span over two chunks.
+
+        :param batch_size: the number of frames in a batch
+        :param shuffle: whether to shuffle the frames
+        :param random: an instance of numpy.random.RandomState
+        """
+        if random is None:
+            random = numpy.random
+
+        chunk_order = range(len(self.chunks))
+        if shuffle:
+            random.shuffle(chunk_order)
+
+        for i in chunk_order:
+            x, y = self.chunks[i]
+            if shuffle:
+                permutation = random.permutation(len(y))
+                x, y = x[permutation], y[permutation]
+
+            for start in range(0, len(y), batch_size):
+                yield numpy.asarray(x[start:start + batch_size]), numpy.asarray(y[start:start + batch_size])
@@ -3,10 +3,29 @@
 
 import numpy as np
 
+from numpy.lib.stride_tricks import as_strided
 from scipy.fftpack import dct
 from collections import deque
 
 
+def frame_signal(signal, framesize, frameshift):
+    """Splits the signal into overlapping frames without copying it.
+
+    It returns a read-only strided view with one frame per row. The frame k starts at the sample k * frameshift
+    and only the frames which fit completely into the signal are returned.
+    """
+    signal = np.ascontiguousarray(signal)
+    if len(signal) < framesize:
+        return signal[:0].reshape((0, framesize))
+
+    n_frames = (len(signal) - framesize) // frameshift + 1
+    frames = as_strided(signal, shape=(n_frames, framesize),
+                        strides=(signal.strides[0] * frameshift, signal.strides[0]))
+    frames.flags.writeable = False
+
+    return frames
+
+
 class MFCCKaldi:
     '''
     TODO port Kaldi mfcc to Python. Use similar parameters as
@@ -236,3 +255,124 @@ class MFCCFrontEnd:
                 mfcc = np.append(mfcc, np.zeros_like(self.mfcc_queue[-1]))
 
         return mfcc.astype(np.float32)
+
+    def get_feature_size(self):
+        """Returns the length of the feature vectors returned by param() and param_block()."""
+        if self.mel_banks_only:
+            size = self.numchans
+            return size * (1 + self.n_last_frames)
+
+        size = self.numceps + (1 if self.usec0 else 0)
+        return size * (1 + (1 if self.usedelta else 0) + (1 if self.useacc else 0) + self.n_last_frames)
+
+    def _delta_block(self, history, ends):
+        """Computes the delta coefficients in the same way as param() for a block of frames.
+
+        The delta for the frame ending at the index e of the history is computed from the last maxlen items of
+        the history up to and including the item e. If there are less than two such items, the delta is zero.
+        """
+        maxlen = self.mfcc_queue.maxlen
+        lengths = np.minimum(maxlen, ends + 1)
+
+        # the differences are padded with zeros so that all frames can sum the same number of differences
+        # in the same order as param() does
+        diffs = np.zeros((maxlen - 1 + len(history), history.shape[1]))
+        diffs[maxlen:] = history[1:] - history[:-1]
+
+        delta = np.zeros((len(ends), history.shape[1]))
+        for k in range(maxlen - 1):
+            delta += diffs[ends + 1 + k]
+
+        valid = lengths >= 2
+        delta[valid] /= (lengths[valid] - 1)[:, np.newaxis]
+
+        return delta, valid
+
+    def param_block(self, frames):
+        """Compute the MFCC coefficients for a block of consecutive frames at once.
+
+        The frames are the rows of a 2D array, e.g. as returned by frame_signal(). The result is a 2D array with
+        one feature vector per row. It is identical to the result of calling param() on the frames one by one,
+        including the state carried between the calls. Therefore, both methods can be freely mixed on one stream.
+        """
+        frames = np.asarray(frames)
+        n_frames = len(frames)
+        if n_frames == 0:
+            return np.zeros((0, self.get_feature_size()), dtype=np.float32)
+
+        # zero mean
+        if self.zmeansource:
+            frames = frames - np.mean(frames, axis=1)[:, np.newaxis]
+        elif frames.dtype.kind in 'iu':
+            frames = frames.astype(np.int64)
+        # preemphasis, the prior of each frame is the last sample of the previous frame
+        priors = np.empty(n_frames)
+        priors[0] = self.prior
+        priors[1:] = frames[:-1, -1]
+        emphasised = np.empty_like(frames)
+        emphasised[:, 0] = frames[:, 0] - self.preemcoef * priors
+        emphasised[:, 1:] = frames[:, 1:] - self.preemcoef * frames[:, :-1]
+        self.prior = frames[-1, -1]
+        frames = emphasised
+        # apply hamming window
+        if self.usehamming:
+            frames = self.hamming * frames
+
+        complex_spectrum = np.fft.rfft(frames, axis=1)
+        power_spectrum = complex_spectrum.real * complex_spectrum.real + \
+            complex_spectrum.imag * complex_spectrum.imag
+        # compute only power spectrum if required
+        if not self.usepower:
+            power_spectrum = np.sqrt(power_spectrum)
+
+        # the product is computed row by row since a matrix product does not have to round the same way
+        mel_spectrum = np.empty((n_frames, self.mel_filter_bank.shape[1]))
+        for i in range(n_frames):
+            mel_spectrum[i] = np.dot(power_spectrum[i], self.mel_filter_bank)
+        # apply mel floor
+        mel_spectrum = np.log(np.maximum(mel_spectrum, 1.0))
+
+        if self.mel_banks_only:
+            mfcc = mel_spectrum
+        else:
+            cepstrum = dct(mel_spectrum, type=2, norm='ortho', axis=1)
+            c0 = cepstrum[:, 0]
+            htk_cepstrum = cepstrum[:, 1:self.numceps + 1]
+            # cepstral liftering
+            mfcc = self.cep_lift_weights * htk_cepstrum
+
+            if self.usec0:
+                mfcc = np.hstack([mfcc, c0[:, np.newaxis]])
+
+        # the history of the static coefficients, the new frames are the last n_frames rows
+        history = np.array(list(self.mfcc_queue) + list(mfcc)).reshape((-1, mfcc.shape[1]))
+        ends = np.arange(len(self.mfcc_queue), len(history))
+        lengths = np.minimum(self.mfcc_queue.maxlen, ends + 1)
+        features = [mfcc, ]
+
+        if not self.mel_banks_only:
+            # compute delta and acceleration coefficients if requested
+            if self.usedelta:
+                delta, appended = self._delta_block(history, ends)
+            else:
+                delta, appended = np.zeros_like(mfcc), np.zeros(n_frames, dtype=bool)
+
+            if self.useacc:
+                delta_history = np.array(list(self.mfcc_delta_queue) + list(delta[appended])).reshape((-1, mfcc.shape[1]))
+                delta_ends = len(self.mfcc_delta_queue) + np.cumsum(appended) - 1
+                acc, _ = self._delta_block(delta_history, delta_ends)
+
+            if self.usedelta:
+                features.append(delta)
+                self.mfcc_delta_queue.extend(delta[appended][-self.mfcc_delta_queue.maxlen:].copy())
+            if self.useacc:
+                features.append(acc)
+
+        for i in range(self.n_last_frames):
+            last = history[np.maximum(ends - 1 - i, 0)]
+            last[lengths <= i + 1] = 0.0
+            features.append(last)
+
+        self.mfcc_queue.extend(mfcc[-self.mfcc_queue.maxlen:].copy())
+
+        return np.hstack(features).astype(np.float32)
@@ -18,7 +18,10 @@ import sys
 import re
 import codecs
 import traceback
+import select
+import errno
 
+from collections import defaultdict
 from datetime import datetime
 
 
@@ -127,6 +130,88 @@ def etime(name="Time",min_t=0.300):
 
     return decorator
 
+def wait_for_input(connections, timeout=None):
+    """Blocks until at least one of the connections has data to be received or until the timeout expires.
+
+    It replaces sleeping and polling of the input connections in the main loops of the processes so that a process
+    wakes up as soon as a message arrives and it does not consume CPU when idle.
+
+    :param connections: ends of pipes (multiprocessing.Pipe) or queues (multiprocessing.Queue)
+    :param timeout: the maximum time to wait in seconds, None means wait forever
+    :return: a list of the connections with data ready to be received
+    """
+    readers = {}
+    for conn in connections:
+        # a multiprocessing.Queue receives its data through a pipe
+        reader = conn._reader if hasattr(conn, '_reader') else conn
+        readers[reader.fileno()] = conn
+
+    try:
+        ready, _, _ = select.select(list(readers), [], [], timeout)
+    except select.error as e:
+        if e.args[0] != errno.EINTR:
+            raise
+        ready = []
+
+    return [readers[fd] for fd in ready]
+
+
+class LatencyStats(object):
+    """
+    Collects the queueing latency of the messages received by a process, i.e. the time between sending a message
+    and its processing by the receiving process. The latencies are accumulated separately for each hop.
+
+    It can also collect other durations, e.g. the processing time of the individual commands.
+    """
+
+    def __init__(self, name, report_interval=60.0, title='Queueing latency'):
+        """
+        :param name: the name of the receiving process used in the reports
+        :param report_interval: the minimal time in seconds between two reports
+        :param title: the title of the reports
+        """
+        self.name = name
+        self.report_interval = report_interval
+        self.title = title
+        self.last_report_time = time.time()
+        self.reset()
+
+    def reset(self):
+        self.count = defaultdict(int)
+        self.total = defaultdict(float)
+        self.max = defaultdict(float)
+
+    def add(self, hop, latency):
+        """Records the latency in seconds of one message received through the hop."""
+        self.count[hop] += 1
+        self.total[hop] += latency
+        if latency > self.max[hop]:
+            self.max[hop] = latency
+
+    def get_report(self):
+        s = []
+        s.append("%s: %s" % (self.title, self.name))
+        for hop in sorted(self.count):
+            s.append("  %-20s n = %7d  mean = %8.2f ms  max = %8.2f ms" %
+                     (hop, self.count[hop], 1000.0 * self.total[hop] / self.count[hop], 1000.0 * self.max[hop]))
+
+        return '\n'.join(s)
+
+    def pop_report(self):
+        """Returns the report and resets the statistics if the report interval has elapsed, otherwise None."""
+        if time.time() - self.last_report_time < self.report_interval:
+            return None
+
+        self.last_report_time = time.time()
+        if not self.count:
+            return None
+
+        report = self.get_report()
+        self.reset()
+
+        return report
+
+
 class InstanceID(object):
     """
     This class provides unique ids to all instances of objects inheriting
@@ -3,7 +3,9 @@
 # This code is mostly PEP8-compliant. See
 # http://www.python.org/dev/peps/pep-0008.
 
+import glob
 import multiprocessing
+import sys
 import time
 import os
 import os.path
@@ -15,12 +17,103 @@ import wave
 from datetime import datetime
 from collections import deque
 
-from alex.utils.mproc import etime
+from alex.utils.mproc import etime, wait_for_input, LatencyStats
 from alex.utils.exdec import catch_ioerror
 from alex.utils.exceptions import SessionLoggerException, SessionClosedException
 from alex.utils.procname import set_proc_name
 
 
+SESSION_XML_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<dialogue>
+</dialogue>
+"""
+
+JOURNAL_HEADER = """<?xml version="1.0" encoding="UTF-8"?>
+<journal>
+"""
+
+JOURNAL_FOOTER = """</journal>
+"""
+
+
+def format_session_xml(doc):
+    """Serializes the session document into the format of the session.xml file."""
+    x = doc.toprettyxml(encoding='utf-8')
+
+    for i in range(5):
+        x = re.sub(r'\n\t*\n', '\n', x)
+        x = re.sub(r'\n *\n', '\n', x)
+    x = re.sub(r'\t', '    ', x)
+
+    return x
+
+
+def compact_session_journal(session_dir_name):
+    """Rebuilds the session.xml file from the session journal in the given directory.
+
+    The journal of a session which was not properly finished (e.g. the logger was killed) does not have
+    the closing tag, so it is added before the journal is parsed.
+
+    Returns the rebuilt session document.
+    """
+    with open(os.path.join(session_dir_name, 'session.journal.xml'), "r") as f:
+        data = f.read()
+
+    if not data.rstrip().endswith(JOURNAL_FOOTER.strip()):
+        data += JOURNAL_FOOTER
+
+    journal = xml.dom.minidom.parseString(data)
+    doc = xml.dom.minidom.parseString(SESSION_XML_TEMPLATE)
+    elements = {'0': doc.documentElement}
+
+    for op in journal.documentElement.childNodes:
+        if op.nodeType != op.ELEMENT_NODE:
+            continue
+
+        if op.tagName == 'append':
+            parent = elements[op.getAttribute("parent")]
+            el = doc.importNode([n for n in op.childNodes if n.nodeType == n.ELEMENT_NODE][0], True)
+            if op.getAttribute("first") and parent.firstChild:
+                parent.insertBefore(el, parent.firstChild)
+            else:
+                parent.appendChild(el)
+            elements[op.getAttribute("id")] = el
+        elif op.tagName == 'set':
+            elements[op.getAttribute("id")].setAttribute(op.getAttribute("name"), op.getAttribute("value"))
+
+    with open(os.path.join(session_dir_name, 'session.xml'), "w") as f:
+        f.write(format_session_xml(doc))
+
+    return doc
+
+
+def recover_session_journals(call_log_dir, min_age=3600.0):
+    """Rebuilds the session.xml files of the sessions in the call log directory which were left only
+    in their journals, e.g. because the hub was killed, and removes the journals.
+
+    The journals modified in the last min_age seconds are skipped because they can belong to running sessions.
+
+    Returns the list of the recovered session directories.
+    """
+    recovered = []
+
+    for journal_file_name in sorted(glob.glob(os.path.join(call_log_dir, '*', 'session.journal.xml'))):
+        if time.time() - os.path.getmtime(journal_file_name) < min_age:
+            continue
+
+        session_dir_name = os.path.dirname(journal_file_name)
+        try:
+            compact_session_journal(session_dir_name)
+        except Exception as e:
+            print "SessionLogger: cannot recover the session log in %s: %s" % (session_dir_name, e)
+            continue
+
+        os.remove(journal_file_name)
+        recovered.append(session_dir_name)
+
+    return recovered
+
+
 class SessionLogger(multiprocessing.Process):
     """
     This is a multiprocessing-safe logger. It should be used by Alex to log
@@ -30,6 +123,18 @@ class SessionLogger(multiprocessing.Process):
 
     Times should be in seconds from the beginning of the dialogue.
 
+    The changes of the session log are appended to the session.journal.xml file as they come so that the cost
+    of logging an event does not grow with the length of the dialogue. The session.xml file is written from the whole
+    document only when the session is finished. If the logger does not finish the session, the session.xml file can be
+    rebuilt from the journal by compact_session_journal().
+
+    When the logger process starts, it recovers the session.xml files of the stale journals in the call log directory
+    of the system logger by recover_session_journals().
+
+    The logger process applies all queued events at once whenever it wakes up and it flushes the journal to the disk
+    at most once per the session_logger_flush_interval. The number of the events waiting in the queue is available
+    in all processes through get_queue_depth().
+
     """
 
     def __init__(self):
@@ -40,12 +145,19 @@ class SessionLogger(multiprocessing.Process):
         self._is_open = False   # whether the session is started
         self._doc = None
 
+        # the open journal file and the ids of the journaled elements
+        self._journal = None
+        self._journal_ids = {}
+
         # filename of the started recording
         self._rec_started = {}
 
         self.queue = multiprocessing.Queue()
         self._queue = deque()
 
+        # the number of the events waiting for processing at the last wake up of the logger process
+        self._queue_depth = multiprocessing.Value('i', 0, lock=False)
+
     def set_close_event(self, close_event):
         self.close_event = close_event
 
@@ -58,6 +170,10 @@ class SessionLogger(multiprocessing.Process):
     def __repr__(self):
         return "SessionLogger()"
 
+    def get_queue_depth(self):
+        """Returns the number of the events which were waiting for processing when the logger last woke up."""
+        return self._queue_depth.value
+
     def __getattr__(self, key):
         """Queue all method calls for methods not known, Later the process will try to call these functions
         asynchronously.
@@ -93,18 +209,20 @@ class SessionLogger(multiprocessing.Process):
         """ Records the target directory and creates the template call log.
         """
 
+        if self._is_open:
+            # the previous session was not ended
+            self._close_session_xml()
+
         self._session_dir_name = output_dir
 
         f = open(os.path.join(self._session_dir_name, 'session.xml'), "w", 0)
-        f.write("""<?xml version="1.0" encoding="UTF-8"?>
-<dialogue>
-</dialogue>
-""")
+        f.write(SESSION_XML_TEMPLATE)
         f.write('\n')
         f.close()
 
         self._session_start_time = time.time()
         self._read_session_xml()
+        self._open_journal()
         self._is_open = True
 
     def _flush(self):
@@ -126,7 +244,7 @@ class SessionLogger(multiprocessing.Process):
         """
 
         self._flush()
-        self._write_session_xml()
+        self._close_session_xml()
         self._session_dir_name = ''
         self._doc = None
         self._is_open = False
@@ -152,22 +270,66 @@ class SessionLogger(multiprocessing.Process):
     def _write_session_xml(self):
         """Saves the self._doc self._document into the session xml file.
         """
-        with open(os.path.join(self._session_dir_name, 'session.xml'), "r+", 0) as f:
+        with open(os.path.join(self._session_dir_name, 'session.xml'), "w", 0) as f:
             # fcntl.lockf(self._f, fcntl.LOCK_EX)
-            f.seek(0)
-            f.truncate(0)
+            f.write(format_session_xml(self._doc))
+            # fcntl.lockf(f, fcntl.LOCK_UN)
 
-            x = self._doc.toprettyxml(encoding='utf-8')
+    def _open_journal(self):
+        """Creates the journal of the session. The root dialogue element has the id 0."""
+        self._journal = open(os.path.join(self._session_dir_name, 'session.journal.xml'), "w")
+        self._journal_ids = {self._doc.documentElement: 0}
+        self._write_journal(JOURNAL_HEADER)
 
-            for i in range(5):
-                x = re.sub(r'\n\t*\n', '\n', x)
-                x = re.sub(r'\n *\n', '\n', x)
-    #            x = re.sub(r'>\n\t*(\w)', r'>\1', x)
-            x = re.sub(r'\t', '    ', x)
-    #        x = unicode(x, encoding='utf-8')
+    def _write_journal(self, data):
+        """Writes the data into the journal. The data is written to the disk by _flush_journal()."""
+        self._journal.write(data)
 
-            f.write(x)
-            # fcntl.lockf(f, fcntl.LOCK_UN)
+    def _flush_journal(self):
+        if self._journal:
+            self._journal.flush()
+
+    def _drain_queue(self):
+        while not self.queue.empty():
+            self._queue.append(self.queue.get())
+
+    def _journal_append(self, parent, element, first=False):
+        """Appends the element newly added to the parent, including all its children, to the journal.
+
+        It must be called after the element is complete. The later changes of its attributes must be journaled
+        by _journal_set() and the later added children by _journal_append().
+        """
+        el_id = len(self._journal_ids)
+        self._journal_ids[element] = el_id
+
+        self._write_journal('<append id="%d" parent="%d"%s>%s</append>\n' %
+                            (el_id, self._journal_ids[parent], ' first="1"' if first else '',
+                             element.toxml(encoding='utf-8')))
+
+    def _journal_set(self, element, name, value):
+        """Sets the attribute of the element and journals the change."""
+        element.setAttribute(name, value)
+
+        op = self._doc.createElement("set")
+        op.setAttribute("id", unicode(self._journal_ids[element]))
+        op.setAttribute("name", name)
+        op.setAttribute("value", value)
+        self._write_journal(op.toxml(encoding='utf-8') + '\n')
+
+    def _close_session_xml(self):
+        """Finishes the journal of the open session and writes the complete session.xml file.
+
+        The journal is removed afterwards because session.xml contains all its information.
+        """
+        if not self._journal:
+            return
+
+        self._write_journal(JOURNAL_FOOTER)
+        self._journal.close()
+        self._journal = None
+
+        self._write_session_xml()
+        os.remove(os.path.join(self._session_dir_name, 'session.journal.xml'))
 
     @etime('seslog_config')
     @catch_ioerror
@@ -182,8 +344,7 @@ class SessionLogger(multiprocessing.Process):
             else:
                 config = els[0].appendChild(self._doc.createElement("config"))
             config.appendChild(self._doc.createComment(self._cfg_formatter(cfg)))
-
-        self._write_session_xml()
+            self._journal_append(els[0], config, first=True)
 
     @etime('seslog_header')
     @catch_ioerror
@@ -204,8 +365,7 @@ class SessionLogger(multiprocessing.Process):
             system.appendChild(self._doc.createTextNode(system_txt))
             version = header.appendChild(self._doc.createElement("version"))
             version.appendChild(self._doc.createTextNode(version_txt))
-
-        self._write_session_xml()
+            self._journal_append(els[0], header)
 
     @etime('seslog_input_source')
     @catch_ioerror
@@ -216,8 +376,7 @@ class SessionLogger(multiprocessing.Process):
         if els:
             i_s = els[0].appendChild(self._doc.createElement("input_source"))
             i_s.setAttribute("type", input_source)
-
-        self._write_session_xml()
+            self._journal_append(els[0], i_s)
 
     @etime('seslog_dialogue_rec_start')
     # @catch_ioerror - do not add! VIO catches the IOError
@@ -237,12 +396,10 @@ class SessionLogger(multiprocessing.Process):
                 da.setAttribute("speaker", speaker)
             da.setAttribute("fname", fname)
             da.setAttribute("starttime", self._get_time_str())
+            self._journal_append(els[0], da)
         else:
-            self._write_session_xml()
             raise SessionLoggerException(("Missing dialogue element for %s speaker") % speaker)
 
-        self._write_session_xml()
-
     @etime('seslog_dialogue_rec_end')
     # @catch_ioerror - do not add! VIO catches the IOError
     def _dialogue_rec_end(self, fname):
@@ -252,14 +409,11 @@ class SessionLogger(multiprocessing.Process):
 
         for i in range(els.length - 1, -1, -1):
             if els[i].getAttribute("fname") == fname:
-                els[i].setAttribute("endtime", self._get_time_str())
+                self._journal_set(els[i], "endtime", self._get_time_str())
                 break
         else:
-            self._write_session_xml()
             raise SessionLoggerException("Missing dialogue_rec element for %s fname" % fname)
 
-        self._write_session_xml()
-
     @etime('seslog_evaluation')
     @catch_ioerror
     def _evaluation(self, num_turns, task_success, user_sat, score):
@@ -294,8 +448,7 @@ class SessionLogger(multiprocessing.Process):
             turn.setAttribute("speaker", speaker)
             turn.setAttribute("turn_number", unicode(turn_number))
             turn.setAttribute("time", self._get_time_str())
-
-        self._write_session_xml()
+            self._journal_append(els[0], turn)
 
     @etime('seslog_dialogue_act')
     @catch_ioerror
@@ -309,13 +462,11 @@ class SessionLogger(multiprocessing.Process):
                 da = els[i].appendChild(self._doc.createElement("dialogue_act"))
                 da.setAttribute("time", self._get_time_str())
                 da.appendChild(self._doc.createTextNode(unicode(dialogue_act)))
+                self._journal_append(els[i], da)
                 break
         else:
-            self._write_session_xml()
             raise SessionLoggerException(("Missing turn element for %s speaker") % speaker)
 
-        self._write_session_xml()
-
     @etime('seslog_text')
     @catch_ioerror
     def _text(self, speaker, text, cost=None):
@@ -330,13 +481,11 @@ class SessionLogger(multiprocessing.Process):
                 if cost:
                     da.setAttribute("cost", unicode(cost))
                 da.appendChild(self._doc.createTextNode(unicode(text)))
+                self._journal_append(els[i], da)
                 break
         else:
-            self._write_session_xml()
             raise SessionLoggerException("Missing turn element for {spkr} speaker".format(spkr=speaker))
 
-        self._write_session_xml()
-
     @etime('seslog_rec_start')
     @catch_ioerror
     def _rec_start(self, speaker, fname):
@@ -351,13 +500,11 @@ class SessionLogger(multiprocessing.Process):
                 da = els[i].appendChild(self._doc.createElement("rec"))
                 da.setAttribute("fname", fname)
                 da.setAttribute("starttime", self._get_time_str())
+                self._journal_append(els[i], da)
                 break
         else:
-            self._write_session_xml()
             raise SessionLoggerException(("Missing turn element for the {spkr} speaker".format(spkr=speaker)))
 
-        self._write_session_xml()
-
         self._rec_started[fname] = wave.open(os.path.join(self._session_dir_name, fname), 'w')
         self._rec_started[fname].setnchannels(1)
         self._rec_started[fname].setsampwidth(2)
@@ -383,12 +530,11 @@ class SessionLogger(multiprocessing.Process):
 
             for i in range(els.length - 1, -1, -1):
                 if els[i].getAttribute("fname") == fname:
-                    els[i].setAttribute("endtime", self._get_time_str())
+                    self._journal_set(els[i], "endtime", self._get_time_str())
                     break
             else:
                 raise SessionLoggerException(("Missing rec element for the {fname} fname.".format(fname=fname)))
 
-            self._write_session_xml()
             self._rec_started[fname].close()
             self._rec_started[fname] = None
         except KeyError:
@@ -436,13 +582,11 @@ class SessionLogger(multiprocessing.Process):
                             wa.setAttribute("p", "{0:.3f}".format(prob))
                             wa.appendChild(self._doc.createTextNode(unicode(word)))
 
+                self._journal_append(els[el_idx], asr)
                 break
         else:
-            self._write_session_xml()
             raise SessionLoggerException(("Missing turn element for %s speaker") % speaker)
 
-        self._write_session_xml()
-
     @etime('seslog_slu')
     @catch_ioerror
     def _slu(self, speaker, fname, nblist, confnet=None):
@@ -477,13 +621,11 @@ class SessionLogger(multiprocessing.Process):
                         daia.setAttribute("p", "%.3f" % (1 - p))
                         daia.appendChild(self._doc.createTextNode("null()"))
 
+                self._journal_append(els[i], asr)
                 break
         else:
-            self._write_session_xml()
             raise SessionLoggerException(("Missing turn element for %s speaker") % speaker)
 
-        self._write_session_xml()
-
     @etime('seslog_barge_in')
     @catch_ioerror
     def _barge_in(self, speaker, tts_time=False, asr_time=False):
@@ -498,12 +640,11 @@ class SessionLogger(multiprocessing.Process):
                     da.setAttribute("tts_time", self._get_time_str())
                 if asr_time:
                     da.setAttribute("asr_time", self._get_time_str())
+                self._journal_append(els[i], da)
                 break
         else:
             raise SessionLoggerException(("Missing turn element for %s speaker") % speaker)
 
-        self._write_session_xml()
-
     @etime('seslog_hangup')
     @catch_ioerror
     def _hangup(self, speaker):
@@ -513,14 +654,12 @@ class SessionLogger(multiprocessing.Process):
 
         for i in range(els.length - 1, -1, -1):
             if els[i].getAttribute("speaker") == speaker:
-                els[i].appendChild(self._doc.createElement("hangup"))
+                hangup = els[i].appendChild(self._doc.createElement("hangup"))
+                self._journal_append(els[i], hangup)
                 break
         else:
-            self._write_session_xml()
             raise SessionLoggerException(("Missing turn element for %s speaker") % speaker)
 
-        self._write_session_xml()
-
     ########################################################################
     ## The following functions define functionality above what was set in ##
     ## SDC 2010 XML logging format.                                       ##
@@ -530,7 +669,7 @@ class SessionLogger(multiprocessing.Process):
         """ Finds the XML element in the given open XML session
         which corresponds to the last turn for the given speaker.
 
-        Closes the XML and throws an exception if the element cannot be found.
+        Throws an exception if the element cannot be found.
         """
         els = self._doc.getElementsByTagName("turn")
 
@@ -538,7 +677,6 @@ class SessionLogger(multiprocessing.Process):
             if els[i].getAttribute("speaker") == speaker:
                 return els[i]
         else:
-            self._write_session_xml()
             raise SessionLoggerException(("Missing turn element for %s speaker") % speaker)
 
     @etime('seslog_dialogue_state')
@@ -565,7 +703,7 @@ class SessionLogger(multiprocessing.Process):
                 sl.setAttribute("name", "%s" % slot_name)
                 sl.appendChild(self._doc.createTextNode(unicode(slot_value)))
 
-        self._write_session_xml()
+            self._journal_append(turn, ds)
 
     @etime('seslog_external_data_file')
     @catch_ioerror
@@ -582,7 +720,7 @@ class SessionLogger(multiprocessing.Process):
         el = turn.appendChild(self._doc.createElement("external"))
         el.setAttribute("type", ftype)
         el.setAttribute("fname", os.path.basename(fname))
-        self._write_session_xml()
+        self._journal_append(turn, el)
         # write the file data
         if data is not None:
             with open(fname, 'w') as fh:
@@ -594,21 +732,40 @@ class SessionLogger(multiprocessing.Process):
             last_session_start_time = 0
             last_session_end_time = 0
 
+            latency_stats = LatencyStats('SessionLogger', self.cfg['Hub']['latency_report_interval'])
+            processing_stats = LatencyStats('SessionLogger', self.cfg['Hub']['latency_report_interval'],
+                                            title='Processing time')
+            queue_depth_max = 0
+            last_flush_time = time.time()
+
+            # the sessions of a crashed logger have only their journals
+            system_logger = self.cfg.get('Logging', {}).get('system_logger')
+            if getattr(system_logger, 'output_dir', None) and os.path.isdir(system_logger.output_dir):
+                for session_dir_name in recover_session_journals(system_logger.output_dir):
+                    print "SessionLogger: recovered the session log in %s" % session_dir_name
+
             while 1:
                 # Check the close event.
                 if self.close_event.is_set():
                     print 'Received close event in: %s' % multiprocessing.current_process().name
+                    self._close_session_xml()
                     return
 
-                time.sleep(self.cfg['Hub']['main_loop_sleep_time'])
+                if not self._queue:
+                    # Wait until a new command is queued.
+                    wait_for_input([self.queue], self.cfg['Hub']['main_loop_max_wait_time'])
 
                 s = (time.time(), time.clock())
 
-                while not self.queue.empty():
-                    self._queue.append(self.queue.get())
+                # process all queued commands at once
+                self._drain_queue()
+                self._queue_depth.value = len(self._queue)
+                queue_depth_max = max(queue_depth_max, len(self._queue))
 
-                if len(self._queue):
+                while self._queue:
                     cmd, args, kw, cmd_time = self._queue.popleft()
+                    latency_stats.add(cmd, time.time() - cmd_time)
+                    cmd_start_time = time.time()
 
                     attr = '_'+cmd
                     try:
@@ -630,7 +787,8 @@ class SessionLogger(multiprocessing.Process):
                                         session_start_found = True
                                         break
                                 else:
-                                    time.sleep(self.cfg['Hub']['main_loop_sleep_time'])
+                                    wait_for_input([self.queue], self.cfg['Hub']['main_loop_sleep_time'])
+                                    self._drain_queue()
 
                             if not session_start_found and (last_session_end_time - cmd_time < 2.0):
                                 # just silently ignore because these are likely the be commands for the already
@@ -665,18 +823,42 @@ class SessionLogger(multiprocessing.Process):
                         print "Exception when logging:", cmd, args, kw
                         print e
 
+                    processing_stats.add(cmd, time.time() - cmd_start_time)
+
+                # write the whole batch to the disk at once
+                if time.time() - last_flush_time >= self.cfg['Hub']['session_logger_flush_interval']:
+                    self._flush_journal()
+                    last_flush_time = time.time()
+
+                report = latency_stats.pop_report()
+                if report:
+                    print report
+
+                report = processing_stats.pop_report()
+                if report:
+                    print report
+                    print "Queue depth: SessionLogger max = %d" % queue_depth_max
+                    queue_depth_max = 0
+
                 d = (time.time() - s[0], time.clock() - s[1])
                 if d[0] > 0.200:
                     print "EXEC Time inner loop: SessionLogger t = {t:0.4f} c = {c:0.4f}\n".format(t=d[0], c=d[1])
 
         except KeyboardInterrupt:
             print 'KeyboardInterrupt exception in: %s' % multiprocessing.current_process().name
+            self._close_session_xml()
             self.close_event.set()
             return
         except:
             print 'Uncaught exception in the SessionLogger process.'
+            exc_info = sys.exc_info()
+            try:
+                self._close_session_xml()
+            except Exception as e:
+                # the journal is left for recover_session_journals()
+                print 'Cannot write the session log:', e
             self.close_event.set()
-            raise
+            raise exc_info[0], exc_info[1], exc_info[2]
 
         print 'Exiting: %s. Setting close event' % multiprocessing.current_process().name
         self.close_event.set()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+if __name__ == "__main__":
+    import autopath
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from alex.utils.cache import lru_cache, lfu_cache, LRUCache, LFUCache, get_cache_stats, get_cache_report, \
+    persistent_cache, SQLitePersistentCacheStorage, FilePersistentCacheStorage, get_persistent_cache_storage, \
+    set_persistent_cache_storage, configure_persistent_cache
+from alex.utils.exceptions import ConfigException
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_eviction(self):
+        cache = LRUCache(maxsize=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertIn('c', cache)
+        self.assertEqual(cache.get_stats()['evictions'], 1)
+
+    def test_size_budget(self):
+        cache = LRUCache(maxsize=None, maxbytes=10, sizer=len)
+        cache.put('a', 'xxxx')
+        cache.put('b', 'xxxx')
+        cache.put('c', 'xxxx')
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.size, 8)
+        self.assertRaises(KeyError, cache.get, 'a')
+
+    def test_decorator(self):
+        calls = []
+
+        @lru_cache(maxsize=2)
+        def f(x, y=0):
+            calls.append(x)
+            return x + y
+
+        self.assertEqual([f(1), f(2), f(1), f(3), f(2), f(1, y=1)], [1, 2, 1, 3, 2, 2])
+        self.assertEqual(calls, [1, 2, 3, 2, 1])
+        self.assertEqual((f.hits, f.misses), (1, 5))
+
+        f.clear()
+        self.assertEqual((f.hits, f.misses), (0, 0))
+        self.assertEqual(len(f.cache), 0)
+
+    def test_registry(self):
+        @lru_cache(maxsize=10, name='test_registry_cache')
+        def f(x):
+            return x
+
+        f(1)
+        f(1)
+
+        stats = [stats for stats in get_cache_stats() if stats['name'] == 'test_registry_cache']
+        self.assertEqual(len(stats), 1)
+        self.assertEqual((stats[0]['hits'], stats[0]['misses']), (1, 1))
+        self.assertIn('test_registry_cache', get_cache_report())
+
+
+class TestLFUCache(unittest.TestCase):
+    def test_eviction(self):
+        cache = LFUCache(maxsize=3)
+        for key in 'abc':
+            cache.put(key, key)
+        cache.get('a')
+        cache.get('a')
+        cache.get('b')
+
+        # 'c' is the least frequently used
+        cache.put('d', 'd')
+        self.assertNotIn('c', cache)
+        # the new entry is not evicted first even if it has the smallest use count
+        cache.put('e', 'e')
+        self.assertNotIn('d', cache)
+        self.assertEqual(sorted(cache.entries), ['a', 'b', 'e'])
+
+    def test_decorator(self):
+        @lfu_cache(maxsize=2)
+        def f(x):
+            return 2 * x
+
+        self.assertEqual([f(1), f(1), f(2), f(3), f(1)], [2, 2, 4, 6, 2])
+        self.assertEqual((f.hits, f.misses), (2, 3))
+
+
+class TestPersistentCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def get_storage(self, **kwargs):
+        return SQLitePersistentCacheStorage(os.path.join(self.directory, 'cache.sqlite'), **kwargs)
+
+    def test_decorator(self):
+        for storage in [self.get_storage(), FilePersistentCacheStorage(self.directory)]:
+            calls = []
+
+            @persistent_cache(False, 'f', storage=storage)
+            def f(x, y=1):
+                calls.append((x, y))
+                return {'x': x, 'y': y}
+
+            self.assertEqual(f(1), {'x': 1, 'y': 1})
+            self.assertEqual(f(1), {'x': 1, 'y': 1})
+            self.assertEqual(f(1, y=2), {'x': 1, 'y': 2})
+            self.assertEqual(calls, [(1, 1), (1, 2)])
+            self.assertEqual((f.hits, f.misses), (1, 2))
+            self.assertEqual(storage.get_stats()['hits'], 1)
+
+    def test_lru_eviction(self):
+        storage = self.get_storage(max_entries=3)
+
+        for key in 'abc':
+            storage.set(key, key)
+        # make 'a' the most recently used entry
+        storage.get('a')
+        storage.set('d', 'd')
+
+        self.assertRaises(KeyError, storage.get, 'b')
+        self.assertEqual([storage.get(key) for key in 'acd'], ['a', 'c', 'd'])
+
+        stats = storage.get_stats()
+        self.assertEqual(stats['entries'], 3)
+        self.assertEqual(stats['evictions'], 1)
+
+    def test_size_budget(self):
+        storage = self.get_storage(max_size=2500)
+
+        for i in range(10):
+            storage.set(str(i), 'x' * 1000)
+            self.assertLessEqual(storage.get_stats()['size'], 2500)
+
+        self.assertEqual(storage.get_stats()['entries'], 2)
+
+        # replacing an entry does not change the number of entries
+        storage.set('9', 'y')
+        self.assertEqual(storage.get_stats()['entries'], 2)
+        self.assertEqual(storage.get('9'), 'y')
+
+    def test_ttl(self):
+        storage = self.get_storage(ttl=0.05)
+
+        storage.set('a', 1)
+        self.assertEqual(storage.get('a'), 1)
+        time.sleep(0.1)
+        self.assertRaises(KeyError, storage.get, 'a')
+
+        stats = storage.get_stats()
+        self.assertEqual(stats['expirations'], 1)
+        self.assertEqual(stats['entries'], 0)
+
+    def test_shared_file(self):
+        storage = self.get_storage()
+        storage.set('a', [1, 2, 3])
+
+        self.assertEqual(self.get_storage().get('a'), [1, 2, 3])
+
+    def test_access_batch(self):
+        storage = self.get_storage(access_batch_size=3)
+        storage.set('a', 1)
+
+        def get_accessed():
+            return self.get_storage()._connect().execute('SELECT accessed FROM entries').fetchone()[0]
+
+        accessed = get_accessed()
+        storage.get('a')
+        storage.get('a')
+        self.assertEqual(get_accessed(), accessed)
+
+        # the access times are written by the batch
+        storage.get('a')
+        self.assertGreater(get_accessed(), accessed)
+        self.assertEqual(storage.accessed, {})
+
+    def test_configure(self):
+        default_storage = get_persistent_cache_storage()
+        try:
+            set_persistent_cache_storage(None)
+            # the entries cached in the files by the previous versions are kept by default
+            configure_persistent_cache({'General': {}})
+            self.assertIsInstance(get_persistent_cache_storage(), FilePersistentCacheStorage)
+
+            configure_persistent_cache({'General': {'persistent_cache': {'storage': 'sqlite', 'max_entries': 10}}})
+            storage = get_persistent_cache_storage()
+            self.assertIsInstance(storage, SQLitePersistentCacheStorage)
+            self.assertEqual((storage.max_entries, storage.ttl), (10, None))
+
+            self.assertRaises(ConfigException, configure_persistent_cache,
+                              {'General': {'persistent_cache': {'storage': 'memcached'}}})
+        finally:
+            set_persistent_cache_storage(default_storage)
+
+
+if __name__ == '__main__':
+    unittest.main()
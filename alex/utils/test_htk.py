@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+if __name__ == "__main__":
+    import autopath
+
+import os
+import shutil
+import tempfile
+import unittest
+import wave
+
+import numpy as np
+
+from alex.utils.htk import MLF, MLFMFCCOnlineAlignedArray, MLFFeatureStore
+
+
+class TestMLFFeatureStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+        random = np.random.RandomState(0)
+        mlf_file_name = os.path.join(self.directory, 'aligned.mlf')
+        mlf = open(mlf_file_name, 'w')
+        mlf.write('#!MLF!#\n')
+        for i in range(3):
+            wav = wave.open(os.path.join(self.directory, 'utt%d.wav' % i), 'w')
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(8000)
+            wav.writeframes((random.randn(8000) * 1000).astype(np.int16).tostring())
+            wav.close()
+
+            # the times are in 100ns units, a frame is 10ms
+            mlf.write('"*/utt%d.rec"\n' % i)
+            mlf.write('0 %d sil\n' % (20 * 100000))
+            mlf.write('%d %d speech\n' % (20 * 100000, (50 + 10 * i) * 100000))
+            mlf.write('%d %d sil\n' % ((50 + 10 * i) * 100000, 90 * 100000))
+            mlf.write('.\n')
+        mlf.close()
+
+        self.mlf = MLF(mlf_file_name)
+        self.mlf.times_to_frames()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def get_vta(self, filter=None, block=True):
+        vta = MLFMFCCOnlineAlignedArray(block=block, filter=filter)
+        vta.append_mlf(self.mlf)
+        vta.append_trn(os.path.join(self.directory, '*.wav'))
+        return vta
+
+    def test_build(self):
+        store_directory = os.path.join(self.directory, 'store')
+
+        for n_jobs in [1, 2]:
+            store = MLFFeatureStore.build(self.get_vta(), store_directory, n_jobs=n_jobs, chunk_size=100)
+            shutil.rmtree(store_directory)
+
+            frames = list(self.get_vta())
+            self.assertEqual(len(store), len(frames))
+            self.assertEqual(len(store.chunks), 2)
+            for (frame, label), (store_frame, store_label) in zip(frames, store):
+                self.assertEqual(label, store_label)
+                self.assertTrue(np.allclose(frame, store_frame, rtol=1e-5, atol=1e-4))
+
+        sil_frames = list(self.get_vta(filter='sil'))
+        store = MLFFeatureStore.build(self.get_vta(filter='sil'), store_directory)
+        self.assertEqual(len(list(store)), len(sil_frames))
+
+        x, y = store.get_utterance('utt1')
+        self.assertEqual(list(y), [store.labels.index(l)
+                                   for s, e, l in self.mlf['utt1'] for i in range(s, e)])
+
+    def test_skip_extraction(self):
+        store_directory = os.path.join(self.directory, 'store')
+        MLFFeatureStore.build(self.get_vta(), store_directory)
+
+        # the same data are not extracted again, but different data are
+        os.utime(os.path.join(store_directory, MLFFeatureStore.index_file_name), (0, 0))
+        MLFFeatureStore.build(self.get_vta(), store_directory)
+        self.assertEqual(os.path.getmtime(os.path.join(store_directory, MLFFeatureStore.index_file_name)), 0)
+
+        self.mlf.trim_segments(2)
+        store = MLFFeatureStore.build(self.get_vta(), store_directory)
+        self.assertNotEqual(os.path.getmtime(os.path.join(store_directory, MLFFeatureStore.index_file_name)), 0)
+        self.assertEqual(len(store), len(list(self.get_vta())))
+
+        # the features of the block mode are not reused for the frame by frame mode
+        self.assertNotEqual(self.get_vta(block=False).get_signature(), self.get_vta().get_signature())
+
+    def test_gen_batches(self):
+        store = MLFFeatureStore.build(self.get_vta(), os.path.join(self.directory, 'store'), chunk_size=100)
+        x, y = store.get_data()
+
+        batches = list(store.gen_batches(32, random=np.random.RandomState(0)))
+        self.assertTrue(all(len(batch_y) <= 32 for batch_x, batch_y in batches))
+
+        shuffled_x = np.vstack([batch[0] for batch in batches])
+        shuffled_y = np.concatenate([batch[1] for batch in batches])
+        self.assertEqual(sorted(map(tuple, np.column_stack([x, y]))),
+                         sorted(map(tuple, np.column_stack([shuffled_x, shuffled_y]))))
+
+
+if __name__ == '__main__':
+    unittest.main()
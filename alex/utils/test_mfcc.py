@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+if __name__ == "__main__":
+    import autopath
+
+import unittest
+
+import numpy as np
+
+from alex.utils.mfcc import MFCCFrontEnd, frame_signal
+
+
+class TestFrameSignal(unittest.TestCase):
+    def test_frames(self):
+        signal = np.arange(10, dtype=np.int16)
+
+        frames = frame_signal(signal, 4, 3)
+        self.assertEqual(frames.tolist(), [[0, 1, 2, 3], [3, 4, 5, 6], [6, 7, 8, 9]])
+
+        self.assertEqual(frame_signal(signal, 11, 3).shape, (0, 11))
+
+
+class TestMFCCFrontEnd(unittest.TestCase):
+    def setUp(self):
+        random = np.random.RandomState(0)
+        self.signal = (random.randn(8000) * 3000).astype(np.int16)
+
+    def assert_param_block(self, **kwargs):
+        front_end = MFCCFrontEnd(16000, 512, **kwargs)
+        block_front_end = MFCCFrontEnd(16000, 512, **kwargs)
+        frames = frame_signal(self.signal, 512, 160)
+
+        mfcc = np.array([front_end.param(list(frame)) for frame in frames])
+        # the block front end must keep the state between the blocks
+        block_mfcc = np.vstack([block_front_end.param_block(frames[:1]),
+                                block_front_end.param_block(frames[1:10]),
+                                block_front_end.param_block(frames[10:])])
+
+        self.assertEqual(mfcc.shape, block_mfcc.shape)
+        self.assertEqual(mfcc.shape[1], block_front_end.get_feature_size())
+        self.assertTrue(np.array_equal(mfcc, block_mfcc))
+
+    def test_param_block(self):
+        self.assert_param_block()
+        self.assert_param_block(usec0=False, n_last_frames=3)
+        self.assert_param_block(usedelta=False, zmeansource=False)
+
+    def test_param_block_mel_banks_only(self):
+        self.assert_param_block(mel_banks_only=True, n_last_frames=2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+if __name__ == "__main__":
+    import autopath
+
+import multiprocessing
+import time
+import unittest
+
+from alex.utils.mproc import wait_for_input, LatencyStats
+
+
+class TestWaitForInput(unittest.TestCase):
+    def test_pipe(self):
+        a_in, a_out = multiprocessing.Pipe()
+        b_in, b_out = multiprocessing.Pipe()
+
+        self.assertEqual(wait_for_input([a_in, b_in], 0.01), [])
+
+        b_out.send('data')
+        self.assertEqual(wait_for_input([a_in, b_in], 0.01), [b_in, ])
+
+        b_in.recv()
+        self.assertEqual(wait_for_input([a_in, b_in], 0.01), [])
+
+    def test_queue(self):
+        q = multiprocessing.Queue()
+        q.put('data')
+
+        self.assertEqual(wait_for_input([q], 1.0), [q, ])
+        self.assertEqual(q.get(), 'data')
+
+
+class TestLatencyStats(unittest.TestCase):
+    def test_report(self):
+        stats = LatencyStats('Test', report_interval=0.0)
+        stats.add('A->B', 0.002)
+        stats.add('A->B', 0.004)
+
+        self.assertEqual(stats.count['A->B'], 2)
+        self.assertAlmostEqual(stats.max['A->B'], 0.004)
+
+        report = stats.pop_report()
+        self.assertTrue('A->B' in report)
+        self.assertTrue('3.00 ms' in report)
+
+        # the statistics are reset after the report
+        self.assertEqual(stats.pop_report(), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+if __name__ == "__main__":
+    import autopath
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from alex.utils.sessionlogger import SessionLogger, format_session_xml, compact_session_journal, \
+    recover_session_journals
+
+
+def wait_until(condition, timeout=10.0):
+    """Waits until the condition holds and returns its last value."""
+    start = time.time()
+    while not condition() and time.time() - start < timeout:
+        time.sleep(0.01)
+    return condition()
+
+
+class TestSessionLoggerJournal(unittest.TestCase):
+    def setUp(self):
+        self.sess_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.sess_dir)
+
+    def read_file(self, file_name):
+        with open(os.path.join(self.sess_dir, file_name)) as f:
+            return f.read()
+
+    def test_journal_compaction(self):
+        sl = SessionLogger()
+        sl.set_cfg({'Audio': {'sample_rate': 16000}})
+
+        sl._session_start(self.sess_dir)
+        sl._config('config = {\n  "a": 1 }')
+        sl._header("Default alex", "1.0")
+        sl._input_source("voip")
+        sl._dialogue_rec_start(None, "both_complete_dialogue.wav")
+
+        sl._turn("system")
+        sl._dialogue_act("system", "hello()")
+        sl._text("system", u"Hello & welcome <back>.", cost=1.0)
+        sl._rec_start("system", "system1.wav")
+        sl._rec_end("system1.wav")
+
+        sl._turn("user")
+        sl._rec_start("user", "user1.wav")
+        sl._rec_write("user1.wav", b'\0\0' * 160)
+        sl._rec_end("user1.wav")
+        sl._asr("user", "user1.wav", [(0.8, u"dobrý den"), (0.2, u"dobrou noc")])
+        sl._slu("user", "user1.wav", [(0.9, "hello()"), (0.1, "null()")])
+        sl._dialogue_state("system", [[("from_stop", u"Anděl"), ("to_stop", "None")]])
+        sl._barge_in("system", tts_time=True)
+        sl._hangup("user")
+        sl._dialogue_rec_end("both_complete_dialogue.wav")
+
+        session_xml = format_session_xml(sl._doc)
+
+        # the journal of an unfinished session can be compacted into the same session.xml
+        sl._flush_journal()
+        compact_session_journal(self.sess_dir)
+        self.assertEqual(self.read_file('session.xml'), session_xml)
+
+        sl._session_end()
+        self.assertEqual(self.read_file('session.xml'), session_xml)
+        self.assertFalse(os.path.exists(os.path.join(self.sess_dir, 'session.journal.xml')))
+
+    def test_run(self):
+        sl = SessionLogger()
+        # the logger sleeps until a command is queued
+        sl.set_cfg({'Audio': {'sample_rate': 16000},
+                    'Hub': {'main_loop_sleep_time': 0.001, 'main_loop_max_wait_time': 60.0,
+                            'latency_report_interval': 60.0, 'session_logger_flush_interval': 0.5}})
+        close_event = multiprocessing.Event()
+        sl.set_close_event(close_event)
+
+        # the commands queued before the process starts are processed in one batch
+        sl.session_start(self.sess_dir)
+        for i in range(20):
+            sl.turn("system")
+            sl.text("system", "Turn %d." % i)
+        sl.start()
+
+        try:
+            self.assertEqual(wait_until(lambda: sl.get_queue_depth() > 0), True)
+            self.assertEqual(sl.get_queue_depth(), 41)
+
+            # the journal is flushed by the first batch processed after the flush interval
+            time.sleep(0.6)
+            sl.text("system", "Last.")
+            self.assertTrue(wait_until(lambda: 'Last.' in self.read_file('session.journal.xml')))
+            self.assertEqual(sl.get_queue_depth(), 1)
+            self.assertEqual(self.read_file('session.journal.xml').count('<turn '), 20)
+        finally:
+            close_event.set()
+            # wake the logger up so that it notices the close event
+            sl.turn("system")
+            sl.join(10.0)
+
+        self.assertFalse(sl.is_alive())
+        session_xml = self.read_file('session.xml')
+        self.assertEqual(session_xml.count('<turn '), 21)
+        self.assertIn('Turn 19.', session_xml)
+        self.assertIn('Last.', session_xml)
+
+    def test_recover_session_journals(self):
+        # a crashed session with only its journal and a running session
+        session_xmls = {}
+        for session in ['crashed', 'running']:
+            sess_dir = os.path.join(self.sess_dir, session)
+            os.mkdir(sess_dir)
+
+            sl = SessionLogger()
+            sl.set_cfg({'Audio': {'sample_rate': 16000}})
+            sl._session_start(sess_dir)
+            sl._turn("system")
+            sl._text("system", "Hello from the %s session." % session)
+            sl._flush_journal()
+            session_xmls[session] = format_session_xml(sl._doc)
+        os.utime(os.path.join(self.sess_dir, 'crashed', 'session.journal.xml'), (0, 0))
+
+        self.assertEqual(recover_session_journals(self.sess_dir), [os.path.join(self.sess_dir, 'crashed')])
+        self.assertEqual(self.read_file(os.path.join('crashed', 'session.xml')), session_xmls['crashed'])
+        self.assertFalse(os.path.exists(os.path.join(self.sess_dir, 'crashed', 'session.journal.xml')))
+        self.assertTrue(os.path.exists(os.path.join(self.sess_dir, 'running', 'session.journal.xml')))
+
+    def test_run_failure(self):
+        sl = SessionLogger()
+        sl.set_cfg({'Audio': {'sample_rate': 16000},
+                    'Hub': {'main_loop_sleep_time': 0.001, 'main_loop_max_wait_time': 0.1,
+                            'latency_report_interval': 60.0, 'session_logger_flush_interval': 0.5}})
+        close_event = multiprocessing.Event()
+        sl.set_close_event(close_event)
+
+        sl.session_start(self.sess_dir)
+        sl.turn("system")
+        sl.text("system", "Hello.")
+        # an unknown method kills the logger process
+        sl.no_such_method()
+        sl.start()
+        sl.join(10.0)
+
+        self.assertFalse(sl.is_alive())
+        self.assertTrue(close_event.is_set())
+        self.assertIn('Hello.', self.read_file('session.xml'))
+        self.assertFalse(os.path.exists(os.path.join(self.sess_dir, 'session.journal.xml')))
+
+
+if __name__ == '__main__':
+    unittest.main()
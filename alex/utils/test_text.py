@@ -6,6 +6,8 @@ if __name__ == "__main__":
 
 import unittest
 
+from random import Random
+
 import alex.utils.text
 
 class TestString(unittest.TestCase):
@@ -31,5 +33,22 @@ class TestString(unittest.TestCase):
         r = alex.utils.text.parse_command('call(destination="1245",opt="X")')
         self.assertEqual(r, {"__name__": "call", "destination": "1245", "opt": "X"})
 
+    def test_min_edit_alignment(self):
+        t = 'i want a chinese food in the centre'.split()
+        r = 'i want chinese fud in centre please'.split()
+
+        i, d, s, alignment = alex.utils.text.min_edit_alignment(t, r)
+        self.assertEqual((i, d, s), alex.utils.text.min_edit_ops(t, r))
+        self.assertEqual((i, d, s), (2, 1, 1))
+        self.assertEqual(alignment, [('i', 'i'), ('want', 'want'), ('a', None), ('chinese', 'chinese'),
+                                     ('food', 'fud'), ('in', 'in'), ('the', None), ('centre', 'centre'),
+                                     (None, 'please')])
+
+        random = Random(0)
+        for n in range(200):
+            t = [random.choice('abc') for i in range(random.randint(0, 8))]
+            r = [random.choice('abc') for i in range(random.randint(0, 8))]
+            self.assertEqual(alex.utils.text.min_edit_alignment(t, r)[:3], alex.utils.text.min_edit_ops(t, r))
+
 if __name__ == '__main__':
     unittest.main()
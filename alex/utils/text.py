@@ -202,6 +202,70 @@ def min_edit_ops(target, source, cost=lambda insertions, deletions, substitution
                 raise Exception("min_edit_ops unexpected state")
     return ops[n][m]
 
+
+def min_edit_alignment(target, source):
+    """ Computes the min edit operations from target to source and the alignment they define.
+
+    The operations are the same as those computed by min_edit_ops() with the default cost. The cells of the
+    dynamic programming table hold only integer costs and back pointers, which is much faster.
+
+    :param target: a target sequence
+    :param source: a source sequence
+    :return: a tuple of (insertions, deletions, substitutions, alignment) where the alignment is a list of pairs
+        of aligned items of the target and the source, None stands for a missing item
+
+    """
+    if target == source:
+        return 0, 0, 0, zip(target, source)
+
+    n = len(target)
+    m = len(source)
+
+    # back pointers: 0 - match or substitution, 1 - insertion (target item), 2 - deletion (source item)
+    back = [[2] * (m + 1)]
+    prev_costs = range(m + 1)
+    for i in range(1, n + 1):
+        t = target[i - 1]
+        costs = [i] + [0] * m
+        back_row = [1] + [0] * m
+        for j in range(1, m + 1):
+            substitution = prev_costs[j - 1] if source[j - 1] == t else prev_costs[j - 1] + 2
+            insertion = prev_costs[j] + 1
+            deletion = costs[j - 1] + 1
+
+            if substitution <= insertion and substitution <= deletion:
+                costs[j] = substitution
+            elif insertion <= deletion:
+                costs[j] = insertion
+                back_row[j] = 1
+            else:
+                costs[j] = deletion
+                back_row[j] = 2
+        back.append(back_row)
+        prev_costs = costs
+
+    insertions, deletions, substitutions = 0, 0, 0
+    alignment = []
+    i, j = n, m
+    while i or j:
+        if i and j and back[i][j] == 0:
+            i -= 1
+            j -= 1
+            if target[i] != source[j]:
+                substitutions += 1
+            alignment.append((target[i], source[j]))
+        elif i and back[i][j] == 1:
+            i -= 1
+            insertions += 1
+            alignment.append((target[i], None))
+        else:
+            j -= 1
+            deletions += 1
+            alignment.append((None, source[j]))
+    alignment.reverse()
+
+    return insertions, deletions, substitutions, alignment
+
 class Escaper(object):
     """
     Creates a customised escaper for strings.  The characters that need
@@ -15,6 +15,33 @@ def split_to_bins(A, S=4):
     return [A[i * S:(i + 1) * S] for i in range(m + bool(n))]
 
 
+def gen_bins(iterable, S=4):
+    """Generate lists of size S from the items of the iterable, the last one may be shorter."""
+    bin_ = []
+    for item in iterable:
+        bin_.append(item)
+        if len(bin_) == S:
+            yield bin_
+            bin_ = []
+    if bin_:
+        yield bin_
+
+
+def gen_last_items(gen_items):
+    """Generate the items of a sequence of (key, ...) tuples without the items whose key repeats later, so that
+    the last item of every key wins as in a dictionary built from the sequence.
+
+    The sequence is generated twice by calling gen_items, the first time only the keys are kept.
+    """
+    last = {}
+    for i, item in enumerate(gen_items()):
+        last[item[0]] = i
+
+    for i, item in enumerate(gen_items()):
+        if last[item[0]] == i:
+            yield item
+
+
 def flatten(list_, ltypes=(list, tuple)):
     """Flatten nested list into a simple list."""
     # Iterate `list_' from the beginning.